@@ -0,0 +1,47 @@
+"""
+Compares full attention with sliding-window attention as the sequence
+grows to 16k tokens. Full attention scores every (query, key) pair, so its
+time grows with seq^2; the windowed pattern scores only 2 * window + 1 keys
+per query and grows linearly. Full attention is skipped past
+DENSE_LIMIT tokens, where it takes minutes on the pure-Python backend.
+
+Run from the repository root:
+    python benchmarks/attention_benchmark.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from tools.matrix import AttentionPattern, Generator, MatrixAttention, MatrixRandom  # noqa: E402
+
+SEQ_LENS = (1024, 2048, 4096, 8192, 16384)
+DEPTH = 32
+WINDOW = 64
+DENSE_LIMIT = 2048
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    generator = Generator(seed=0)
+    pattern = AttentionPattern.sliding_window(WINDOW)
+    print("depth {}, window {} per side".format(DEPTH, WINDOW))
+    print("{:>8} {:>12} {:>12} {:>9}".format("seq", "full (s)", "window (s)", "speedup"))
+    for seq_len in SEQ_LENS:
+        q, k, v = (MatrixRandom.normal(seq_len, DEPTH, generator=generator) for _ in range(3))
+        sparse = timed(lambda: MatrixAttention.sparse(q, k, v, pattern))
+        if seq_len <= DENSE_LIMIT:
+            dense = timed(lambda: MatrixAttention.scaled_dot_product(q, k, v))
+            print("{:>8} {:>12.3f} {:>12.3f} {:>8.2f}x".format(seq_len, dense, sparse, dense / sparse))
+        else:
+            print("{:>8} {:>12} {:>12.3f} {:>9}".format(seq_len, "-", sparse, "-"))
+
+
+if __name__ == '__main__':
+    main()
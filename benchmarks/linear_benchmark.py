@@ -0,0 +1,58 @@
+"""
+Compares the fused linear kernel (matmul + bias + activation in the output
+loop) against the unfused matmul, bias add and activation passes of a
+feed-forward block at typical (seq_len, d_model, d_ff) shapes.
+
+Run from the repository root:
+    python benchmarks/linear_benchmark.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from tools.matrix import Generator, MatrixRandom  # noqa: E402
+
+SHAPES = ((32, 128, 512), (64, 256, 1024), (128, 256, 1024))
+
+
+def best_of(fn, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def unfused(x, w1, b1, w2, b2):
+    # the previous FeedForwardLayer.forward: one allocation per step
+    h = x * w1
+    h = h + b1
+    h = h.relu()
+    out = h * w2
+    return out + b2
+
+
+def fused(x, w1, b1, w2, b2):
+    return x.linear(w1, b1, 'relu').linear(w2, b2)
+
+
+def main():
+    generator = Generator(seed=0)
+    print("{:>18} {:>12} {:>12} {:>9}".format("(seq, d, d_ff)", "unfused (s)", "fused (s)", "speedup"))
+    for seq_len, d_model, d_ff in SHAPES:
+        x = MatrixRandom.normal(seq_len, d_model, generator=generator)
+        w1 = MatrixRandom.normal(d_model, d_ff, generator=generator)
+        b1 = MatrixRandom.normal(1, d_ff, generator=generator)
+        w2 = MatrixRandom.normal(d_ff, d_model, generator=generator)
+        b2 = MatrixRandom.normal(1, d_model, generator=generator)
+
+        slow = best_of(lambda: unfused(x, w1, b1, w2, b2))
+        fast = best_of(lambda: fused(x, w1, b1, w2, b2))
+        print("{:>18} {:>12.4f} {:>12.4f} {:>8.2f}x".format(str((seq_len, d_model, d_ff)), slow, fast, slow / fast))
+
+
+if __name__ == '__main__':
+    main()
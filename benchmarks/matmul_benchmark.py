@@ -0,0 +1,49 @@
+"""
+Compares the blocked matmul kernel against the previous nested-generator
+implementation on (seq_len, d_model) x (d_model, d_model) projections.
+
+Run from the repository root:
+    python benchmarks/matmul_benchmark.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from tools.matrix.matrix import Matrix  # noqa: E402
+
+SEQ_LEN = 16
+D_MODELS = (256, 512, 1024)
+
+
+def naive_multiply(a, b):
+    # the original Matrix.__mul__, walking B column-wise through nested lists
+    rows, inner, cols = len(a), len(b), len(b[0])
+    return [[sum(a[i][k] * b[k][j] for k in range(inner)) for j in range(cols)] for i in range(rows)]
+
+
+def best_of(fn, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    print("{:>8} {:>12} {:>12} {:>9}".format("d_model", "naive (s)", "blocked (s)", "speedup"))
+    for d_model in D_MODELS:
+        x = [[random.gauss(0, 1) for _ in range(d_model)] for _ in range(SEQ_LEN)]
+        w = [[random.gauss(0, 1) for _ in range(d_model)] for _ in range(d_model)]
+        x_matrix, w_matrix = Matrix(x), Matrix(w)
+
+        naive = best_of(lambda: naive_multiply(x, w))
+        blocked = best_of(lambda: x_matrix * w_matrix)
+        print("{:>8} {:>12.4f} {:>12.4f} {:>8.1f}x".format(d_model, naive, blocked, naive / blocked))
+
+
+if __name__ == '__main__':
+    main()
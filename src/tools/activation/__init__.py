@@ -0,0 +1,3 @@
+from .activation import ELU, GELU, Activation, LeakyReLU, ReLU, SiLU, Sigmoid, Tanh
+
+__all__ = ['Activation', 'ELU', 'GELU', 'LeakyReLU', 'ReLU', 'SiLU', 'Sigmoid', 'Tanh']
@@ -1,36 +1,61 @@
 from tools.matrix import Matrix
-from tools.utils import exp  
-class ReLU:
-    def __init__(self):
-        pass
-    
-    def forward(self, x):
-        return Matrix([[max(0, value) for value in row] for row in x.data])
-
-class Sigmoid:
-    def __init__(self):
-        pass
-    
-    def forward(self, x):
-        return Matrix([[1 / (1 + exp(-value)) for value in row] for row in x.data])
-
-class Tanh:
-    def __init__(self):
-        pass
-    
-    def forward(self, x):
-        return Matrix([[(exp(value) - exp(-value)) / (exp(value) + exp(-value)) for value in row] for row in x.data])
-
-class LeakyReLU:
-    def __init__(self, alpha=0.01):
+
+# Each activation runs in one pass over the matrix buffer through the active
+# backend, so batched (..., rows, cols) inputs work like 2D ones. With
+# inplace=True the input is overwritten instead of allocating the result.
+
+
+class Activation:
+    def __init__(self, inplace=False):
+        self.inplace = inplace
+
+    def _out(self, x):
+        return x if self.inplace else None
+
+
+class ReLU(Activation):
+    def forward(self, x: Matrix):
+        return x.relu(out=self._out(x))
+
+
+class Sigmoid(Activation):
+    def forward(self, x: Matrix):
+        return x.sigmoid(out=self._out(x))
+
+
+class Tanh(Activation):
+    def forward(self, x: Matrix):
+        return x.tanh(out=self._out(x))
+
+
+class LeakyReLU(Activation):
+    def __init__(self, alpha=0.01, inplace=False):
+        super().__init__(inplace)
         self.alpha = alpha
-    
-    def forward(self, x):
-        return Matrix([[value if value > 0 else self.alpha * value for value in row] for row in x.data])
 
-class ELU:
-    def __init__(self, alpha=1.0):
+    def forward(self, x: Matrix):
+        return x.leaky_relu(self.alpha, out=self._out(x))
+
+
+class ELU(Activation):
+    def __init__(self, alpha=1.0, inplace=False):
+        super().__init__(inplace)
         self.alpha = alpha
-    
-    def forward(self, x):
-        return Matrix([[value if value > 0 else self.alpha * (exp(value) - 1) for value in row] for row in x.data])
+
+    def forward(self, x: Matrix):
+        return x.elu(self.alpha, out=self._out(x))
+
+
+class GELU(Activation):
+    # approximate=True selects the tanh approximation
+    def __init__(self, approximate=False, inplace=False):
+        super().__init__(inplace)
+        self.approximate = approximate
+
+    def forward(self, x: Matrix):
+        return x.gelu(self.approximate, out=self._out(x))
+
+
+class SiLU(Activation):
+    def forward(self, x: Matrix):
+        return x.silu(out=self._out(x))
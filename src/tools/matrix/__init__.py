@@ -0,0 +1,19 @@
+from .matrix import Matrix
+from .algebra import LUDecomposition, MatrixAlgebra
+from .attention import AttentionMask, AttentionPattern, KVCache, MatrixAttention
+from .packing import PackedSequence
+from .random import MatrixRandom
+from .quantization import MatrixQuantization, PostTrainingQuantizer, QuantizedMatrix
+from .sparse import SparseMatrix
+from .statistics import MatrixStatistics, RunningStatistics
+from .storage import MatrixStorage
+from .rng import Generator, manual_seed
+from .utils import MatrixUtils
+from .lazy import Expression, lazy
+from .backend import available_backends, get_backend, register_backend, set_backend, use_backend
+
+__all__ = [
+    'AttentionMask', 'AttentionPattern', 'Expression', 'Generator', 'KVCache', 'LUDecomposition', 'Matrix', 'MatrixAlgebra', 'MatrixAttention', 'MatrixQuantization', 'MatrixRandom', 'MatrixStatistics', 'MatrixStorage', 'MatrixUtils', 'PackedSequence', 'PostTrainingQuantizer', 'QuantizedMatrix', 'RunningStatistics', 'SparseMatrix',
+
+    'available_backends', 'get_backend', 'lazy', 'manual_seed', 'register_backend', 'set_backend', 'use_backend',
+]
@@ -1,40 +1,122 @@
+import operator
+from array import array
+from itertools import repeat
+
+from .kernels import TYPECODE
 from .matrix import Matrix
+
+
+class LUDecomposition:
+    """
+    LU factorization with partial pivoting, ``P A = L U``.
+
+    The factorization costs O(n^3) once; afterwards ``determinant`` is O(n)
+    and ``solve`` is O(n^2) per right-hand side, so one object can serve many
+    solves against the same matrix. ``L`` (unit diagonal) and ``U`` are
+    stored together in one row-major table.
+
+    Args:
+        matrix (Matrix): Square matrix with a batch size of 1.
+    """
+
+    def __init__(self, matrix):
+        if matrix.rows != matrix.cols or matrix.batch_size != 1:
+            raise ValueError("LU decomposition requires a single square matrix.")
+        n = matrix.rows
+        flat = matrix._flat()
+        lu = [list(flat[i * n:(i + 1) * n]) for i in range(n)]
+        perm = list(range(n))
+        sign = 1
+        singular = False
+        for k in range(n):
+            pivot = max(range(k, n), key=lambda i: abs(lu[i][k]))
+            if lu[pivot][k] == 0:
+                singular = True
+                continue
+            if pivot != k:
+                lu[k], lu[pivot] = lu[pivot], lu[k]
+                perm[k], perm[pivot] = perm[pivot], perm[k]
+                sign = -sign
+            pivot_row = lu[k]
+            tail = pivot_row[k + 1:]
+            for i in range(k + 1, n):
+                row = lu[i]
+                factor = row[k] / pivot_row[k]
+                row[k] = factor
+                if factor:
+                    # row[k+1:] -= factor * pivot_row[k+1:]
+                    row[k + 1:] = map(operator.sub, row[k + 1:], map(operator.mul, tail, repeat(factor)))
+        self.n = n
+        self.lu = lu
+        self.perm = perm
+        self.sign = sign
+        self.singular = singular
+
+    def determinant(self):
+        determinant = float(self.sign)
+        for i in range(self.n):
+            determinant *= self.lu[i][i]
+        return determinant
+
+    def solve(self, rhs):
+        """
+        Solves ``A X = B`` for every column of ``B`` at once.
+
+        Args:
+            rhs (Matrix): Right-hand sides with shape (n, m).
+
+        Returns:
+            Matrix: The solution ``X`` with shape (n, m).
+        """
+        if self.singular:
+            raise ValueError("Matrix is singular and cannot be inverted.")
+        if rhs.rows != self.n or rhs.batch_size != 1:
+            raise ValueError("Right-hand side must have {} rows.".format(self.n))
+        n, m = self.n, rhs.cols
+        flat = rhs._flat()
+        x = [list(flat[p * m:(p + 1) * m]) for p in self.perm]
+        sub, mul = operator.sub, operator.mul
+        # forward substitution with the unit lower triangle
+        for k in range(n):
+            x_k = x[k]
+            for i in range(k + 1, n):
+                factor = self.lu[i][k]
+                if factor:
+                    x[i] = list(map(sub, x[i], map(mul, x_k, repeat(factor))))
+        # back substitution with the upper triangle
+        for k in reversed(range(n)):
+            x_k = x[k] = [val / self.lu[k][k] for val in x[k]]
+            for i in range(k):
+                factor = self.lu[i][k]
+                if factor:
+                    x[i] = list(map(sub, x[i], map(mul, x_k, repeat(factor))))
+        return Matrix.from_buffer(array(TYPECODE, [val for row in x for val in row]), (1, n, m))
+
+    def inverse(self):
+        return self.solve(Matrix.identity(self.n))
+
+
 class MatrixAlgebra:
+    @staticmethod
+    def lu(matrix):
+        # reusable factorization for repeated determinant/solve/inverse calls
+        return LUDecomposition(matrix)
+
     @staticmethod
     def determinant(matrix):
-        # Base case for 2x2 matrix
-        if len(matrix.data) == 2 and len(matrix.data[0]) == 2:
-            return matrix.data[0][0] * matrix.data[1][1] - matrix.data[0][1] * matrix.data[1][0]
-        
-        # Recursive case for larger matrices
-        determinant = 0
-        for c in range(len(matrix.data)):
-            determinant += ((-1)**c) * matrix.data[0][c] * MatrixAlgebra.determinant(MatrixAlgebra.minor(matrix, 0, c))
-        return determinant
+        return LUDecomposition(matrix).determinant()
 
     @staticmethod
     def minor(matrix, row, col):
         # Return the minor of a matrix
-        return Matrix([row[:col] + row[col+1:] for row in (matrix.data[:row] + matrix.data[row+1:])])
+        rows = matrix.data[0] if matrix.batch_size == 1 else matrix.data
+        return Matrix([r[:col] + r[col+1:] for r in (rows[:row] + rows[row+1:])])
 
     @staticmethod
     def inverse(matrix):
-        determinant = MatrixAlgebra.determinant(matrix)
-        if determinant == 0:
-            raise ValueError("Matrix is singular and cannot be inverted.")
+        return LUDecomposition(matrix).inverse()
 
-        # Special case for 2x2 matrix
-        if len(matrix.data) == 2 and len(matrix.data[0]) == 2:
-            return Matrix([[matrix.data[1][1], -1*matrix.data[0][1]], 
-                           [-1*matrix.data[1][0], matrix.data[0][0]]]) * (1/determinant)
-
-        # General case for larger matrices
-        cofactors = []
-        for r in range(len(matrix.data)):
-            cofactorRow = []
-            for c in range(len(matrix.data)):
-                minor = MatrixAlgebra.minor(matrix, r, c)
-                cofactorRow.append(((-1)**(r+c)) * MatrixAlgebra.determinant(minor))
-            cofactors.append(cofactorRow)
-        cofactors = Matrix(cofactors).transpose()
-        return cofactors * (1/determinant)
+    @staticmethod
+    def solve(matrix, rhs):
+        # solve A X = B for many right-hand sides with one factorization
+        return LUDecomposition(matrix).solve(rhs)
@@ -0,0 +1,422 @@
+import math
+from array import array
+from bisect import bisect_right
+
+from .backend import get_backend
+from .kernels import ATTENTION_BLOCK_SIZE, TYPECODE
+from .matrix import Matrix
+from .sparse import SparseMatrix
+
+
+class AttentionMask:
+    """
+    Implicit attention mask, applied while the softmax is computed.
+
+    Unlike a dense mask matrix nothing of size (seq, seq) is stored: causal
+    and padding masks are described by a flag and one length per sequence.
+
+    Args:
+        causal (bool, optional): Query ``i`` only sees keys ``j <= i + start``.
+        lengths (sequence, optional): Unpadded key length of every sequence,
+            one per entry of the leading (batch) axis; later keys are padding.
+        bias (Matrix, optional): Additive score bias of shape (..., m, n) or
+            (..., 1, n), e.g. a relative position bias. Use ``-inf`` entries
+            for arbitrary blocked positions.
+        start (int, optional): Key position of the first query under
+            ``causal``. Defaults to ``n - m``, i.e. the ``m`` queries are the
+            last positions of the ``n`` keys.
+    """
+
+    def __init__(self, causal=False, lengths=None, bias=None, start=None):
+        if lengths is not None and any(length < 0 for length in lengths):
+            raise ValueError("Sequence lengths must be non-negative.")
+        self.causal = causal
+        self.lengths = None if lengths is None else [int(length) for length in lengths]
+        self.bias = bias
+        self.start = start
+
+    def _arguments(self):
+        # causal, start, lengths, bias buffer and bias shape as the backends take them
+        if self.bias is None:
+            return self.causal, self.start, self.lengths, None, None
+        return self.causal, self.start, self.lengths, self.bias._flat(), self.bias.shape()
+
+
+class AttentionPattern:
+    """
+    Sparse attention pattern: which keys every query may see.
+
+    The parts below are combined by union, so e.g. a sliding window with a
+    few global tokens is one pattern. Only allowed pairs are ever computed
+    (see ``MatrixAttention.sparse``), so a window of ``w`` costs
+    O(seq * w) instead of O(seq^2).
+
+    Args:
+        window (int, optional): Local attention: query ``i`` sees keys
+            ``i + t * dilation`` for ``|t| <= window``.
+        dilation (int, optional): Step between the keys of the window; with
+            ``dilation > 1`` the same number of keys covers a wider span.
+        global_tokens (sequence, optional): Positions that see every key and
+            that every query sees, e.g. a CLS token or task prompt.
+        block_size (int, optional): Block size of ``layout``.
+        layout (sequence or dict, optional): Fixed block-sparse layout;
+            ``layout[b]`` lists the key blocks query block ``b`` attends to.
+        causal (bool, optional): Drop every key after the query.
+        segments (sequence, optional): Cumulative offsets ``[0, l1, l1 + l2,
+            ...]`` of packed sequences (see ``PackedSequence``). Queries then
+            only see keys of their own sequence, and the parts above apply
+            to positions counted from the start of that sequence.
+
+    A pattern without window, global tokens or layout is full attention,
+    which with ``segments`` is block-diagonal attention over packed
+    sequences.
+    """
+
+    def __init__(self, window=None, dilation=1, global_tokens=(), block_size=None, layout=None, causal=False,
+                 segments=None):
+        if window is not None and window < 0:
+            raise ValueError("Window must be non-negative, got {}.".format(window))
+        if dilation < 1:
+            raise ValueError("Dilation must be at least 1, got {}.".format(dilation))
+        if (layout is None) != (block_size is None) or (block_size is not None and block_size <= 0):
+            raise ValueError("A block-sparse layout needs a positive block size and vice versa.")
+        self.window = window
+        self.dilation = dilation
+        self.global_tokens = tuple(sorted(set(global_tokens)))
+        self._global = frozenset(self.global_tokens)
+        self.block_size = block_size
+        self.layout = layout
+        self.causal = causal
+        if segments is not None and (not segments or segments[0] != 0 or
+                                     any(a > b for a, b in zip(segments, segments[1:]))):
+            raise ValueError("Segment offsets must start at 0 and never decrease, got {}.".format(segments))
+        self.segments = None if segments is None else list(segments)
+
+    @staticmethod
+    def sliding_window(window, causal=False):
+        return AttentionPattern(window=window, causal=causal)
+
+    @staticmethod
+    def dilated(window, dilation, causal=False):
+        return AttentionPattern(window=window, dilation=dilation, causal=causal)
+
+    @staticmethod
+    def block_sparse(block_size, layout, causal=False):
+        return AttentionPattern(block_size=block_size, layout=layout, causal=causal)
+
+    def _key_blocks(self, block):
+        if isinstance(self.layout, dict):
+            return self.layout.get(block, ())
+        return self.layout[block] if block < len(self.layout) else ()
+
+    def within(self, segments):
+        # the same parts applied inside every packed sequence of ``segments``
+        return AttentionPattern(self.window, self.dilation, self.global_tokens, self.block_size, self.layout,
+                                self.causal, segments)
+
+    def as_causal(self):
+        # the same parts without any key after the query, as decoding requires
+        if self.causal:
+            return self
+        return AttentionPattern(self.window, self.dilation, self.global_tokens, self.block_size, self.layout,
+                                True, self.segments)
+
+    def keys(self, position, n):
+        """
+        Sorted key positions the query at ``position`` sees among ``n`` keys.
+        """
+        if self.segments is None:
+            return self._keys(position, n)
+        index = bisect_right(self.segments, position) - 1
+        if index >= len(self.segments) - 1:
+            return ()
+        start, end = self.segments[index], min(n, self.segments[index + 1])
+        keys = self._keys(position - start, end - start)
+        if isinstance(keys, range):
+            return range(keys.start + start, keys.stop + start, keys.step)
+        return [start + key for key in keys]
+
+    def _keys(self, position, n):
+        end = min(n, position + 1) if self.causal else n
+        if position in self._global or (self.window is None and self.layout is None and not self.global_tokens):
+            return range(end)
+        if self.window is not None:
+            reach = self.window * self.dilation
+            # the window keeps the query's residue modulo the dilation
+            first = position - reach if position >= reach else position % self.dilation
+            local = range(first, min(end, position + reach + 1), self.dilation)
+            if not self.global_tokens and self.layout is None:
+                return local
+        else:
+            local = ()
+        keys = set(local)
+        keys.update(token for token in self.global_tokens if token < end)
+        if self.layout is not None:
+            size = self.block_size
+            for block in self._key_blocks(position // size):
+                keys.update(range(block * size, min(end, (block + 1) * size)))
+        return sorted(keys)
+
+
+def _mask_arguments(mask):
+    return (False, None, None, None, None) if mask is None else mask._arguments()
+
+
+class MatrixAttention:
+
+    @staticmethod
+    def softmax(scores, mask=None, out=None):
+        """
+        Softmax over the last axis with an implicit mask fused in.
+
+        Masked positions are skipped while the max, exponentials and sum are
+        computed instead of being written as ``-inf`` into a copy of the
+        scores first; they come out as 0.
+
+        Args:
+            scores (Matrix): Scores of shape (..., m, n).
+            mask (AttentionMask, optional): Mask to apply.
+            out (Matrix, optional): Matrix receiving the result; ``out=scores``
+                normalizes in place.
+
+        Returns:
+            Matrix: The probabilities, or ``out``. Fully masked rows are 0.
+        """
+        return MatrixAttention._softmax(scores, mask, out, log=False)
+
+    @staticmethod
+    def log_softmax(scores, mask=None, out=None):
+        # log-probabilities computed as x - max - log(sum(exp(x - max))); masked positions are -inf
+        return MatrixAttention._softmax(scores, mask, out, log=True)
+
+    @staticmethod
+    def _softmax(scores, mask, out, log):
+        causal, start, lengths, bias, bias_shape = _mask_arguments(mask)
+        a = scores._flat()
+        buffer, offset = scores._destination(out)
+        result = get_backend().softmax(a, scores.shape(), causal, start, lengths, bias, bias_shape, log, buffer,
+                                       offset)
+        return scores._result(result, out)
+
+    @staticmethod
+    def scaled_dot_product(q, k, v, mask=None, causal=False, scale=None, block_size=ATTENTION_BLOCK_SIZE,
+                           heads_last=False):
+        """
+        Computes ``softmax(q @ k^T * scale) @ v`` without materializing the scores.
+
+        Keys are processed in blocks with an online softmax (see
+        ``kernels.attention``), so peak memory grows linearly with the
+        sequence length instead of quadratically.
+
+        Args:
+            q (Matrix): Queries of shape (..., m, d), e.g. (batch, heads, m, d).
+            k (Matrix): Keys of shape (..., n, d).
+            v (Matrix): Values of shape (..., n, dv).
+            mask (AttentionMask, Matrix or SparseMatrix, optional): An implicit
+                mask, or a keep-mask of shape (..., m, n) broadcast over the
+                leading dimensions whose zeros block attention.
+            causal (bool, optional): Mask future keys without building a mask.
+                The queries are taken to be the last ``m`` of the ``n``
+                positions.
+            scale (float, optional): Score scale. Defaults to ``1 / sqrt(d)``.
+            block_size (int, optional): Keys per block.
+            heads_last (bool, optional): For (batch, heads, m, d) inputs,
+                return (batch, m, heads, dv), so merging the heads for the
+                output projection is a free reshape instead of a transpose.
+
+        Returns:
+            Matrix: Attention output of shape (..., m, dv), or (..., m, heads,
+            dv) with ``heads_last``. Rows with every key masked are zero.
+        """
+        start = lengths = bias = bias_shape = None
+        if isinstance(mask, AttentionMask):
+            spec_causal, start, lengths, bias, bias_shape = mask._arguments()
+            causal, mask = causal or spec_causal, None
+        elif isinstance(mask, SparseMatrix):
+            mask = mask.to_dense()
+        scale = 1.0 / math.sqrt(q.cols) if scale is None else scale
+        mask_buffer, mask_shape = (None, None) if mask is None else (mask._flat(), mask.shape())
+        result, shape = get_backend().attention(q._flat(), q.shape(), k._flat(), k.shape(), v._flat(), v.shape(),
+                                                scale, causal, start, mask_buffer, mask_shape, lengths, bias,
+                                                bias_shape, block_size, heads_last)
+        return Matrix.from_buffer(result, shape)
+
+    @staticmethod
+    def sparse(q, k, v, pattern, scale=None, start=None, length=None, heads_last=False):
+        """
+        Attention restricted to an ``AttentionPattern``.
+
+        Only the allowed (query, key) pairs are scored, so memory and time
+        grow with the number of allowed pairs instead of with ``m * n``.
+
+        Args:
+            q (Matrix): Queries of shape (..., m, d).
+            k (Matrix): Keys of shape (..., n, d).
+            v (Matrix): Values of shape (..., n, dv).
+            pattern (AttentionPattern): Allowed keys of every query.
+            scale (float, optional): Score scale. Defaults to ``1 / sqrt(d)``.
+            start (int, optional): Key position of the first query. Defaults
+                to ``length - m``.
+            length (int, optional): Keys in use, e.g. the filled part of a
+                cache. Defaults to all of ``k``.
+            heads_last (bool, optional): See ``scaled_dot_product``.
+
+        Returns:
+            Matrix: Attention output of shape (..., m, dv), or (..., m, heads,
+            dv) with ``heads_last``.
+        """
+        scale = 1.0 / math.sqrt(q.cols) if scale is None else scale
+        result, shape = get_backend().sparse_attention(q._flat(), q.shape(), k._flat(), k.shape(), v._flat(),
+                                                       v.shape(), scale, pattern.keys, start, length, heads_last)
+        return Matrix.from_buffer(result, shape)
+
+
+class KVCache:
+    """
+    Preallocated key/value cache for incremental decoding.
+
+    Keys and values of every processed position are kept per sequence and
+    head in (batch, heads, max_length, depth) buffers, so a decoding step
+    only projects its new tokens, appends them and attends to the cached
+    prefix: the per-token cost grows with the sequence instead of its
+    square. Appending writes into the preallocated buffers in place.
+    ``keys`` and ``values`` are views of the filled positions and keep
+    their contents when the cache is later truncated and appended to.
+
+    Args:
+        batch_size (int): Number of sequences decoded together.
+        num_heads (int): Attention heads.
+        max_length (int): Capacity in positions.
+        depth (int): Size of every key and value vector.
+    """
+
+    def __init__(self, batch_size, num_heads, max_length, depth):
+        if min(batch_size, num_heads, max_length, depth) <= 0:
+            raise ValueError("Cache dimensions must be positive.")
+        self.batch_size = batch_size
+        self.num_heads = num_heads
+        self.max_length = max_length
+        self.depth = depth
+        self.length = 0
+        self._shared = False
+        size = batch_size * num_heads * max_length * depth
+        self._keys = array(TYPECODE, bytes(8 * size))
+        self._values = array(TYPECODE, bytes(8 * size))
+
+    def _capacity_shape(self):
+        return self.batch_size, self.num_heads, self.max_length, self.depth
+
+    def _prefix(self, buffer):
+        # (batch, heads, length, depth) view of the filled positions; views are
+        # copy-on-write, so writing to one never touches the cache, and
+        # truncate copies the buffers before positions a view covers are reused
+        self._shared = True
+        capacity = Matrix.from_buffer(buffer, self._capacity_shape())
+        return capacity._view((self.batch_size, self.num_heads, self.length, self.depth), capacity.strides, 0)
+
+    @property
+    def keys(self):
+        return self._prefix(self._keys)
+
+    @property
+    def values(self):
+        return self._prefix(self._values)
+
+    def append(self, k, v):
+        """
+        Writes the keys and values of new positions after the cached ones.
+
+        Args:
+            k (Matrix): Keys of shape (batch, heads, m, depth).
+            v (Matrix): Values of shape (batch, heads, m, depth).
+
+        Returns:
+            int: The new length.
+        """
+        m = k.shape()[-2]
+        expected = (self.batch_size, self.num_heads, m, self.depth)
+        if k.shape() != expected or v.shape() != expected:
+            raise ValueError("Expected keys and values of shape {}, got {} and {}.".format(expected, k.shape(), v.shape()))
+        if self.length + m > self.max_length:
+            raise ValueError("Cache of {} positions cannot hold {} more after {}.".format(self.max_length, m, self.length))
+        rows, step = m * self.depth, self.max_length * self.depth
+        for source, buffer in ((k._flat(), self._keys), (v._flat(), self._values)):
+            for index in range(self.batch_size * self.num_heads):
+                dest = index * step + self.length * self.depth
+                buffer[dest:dest + rows] = source[index * rows:(index + 1) * rows]
+        self.length += m
+        return self.length
+
+    def truncate(self, length):
+        # drops every position from ``length`` on, e.g. rejected draft tokens
+        if not 0 <= length <= self.length:
+            raise ValueError("Cannot truncate a cache of length {} to {}.".format(self.length, length))
+        if self._shared and length < self.length:
+            self._keys, self._values = array(TYPECODE, self._keys), array(TYPECODE, self._values)
+            self._shared = False
+        self.length = length
+
+    def select(self, indices):
+        """
+        Keeps the sequences at ``indices`` of the batch axis, in that order.
+
+        Indices may repeat, so beam search can reorder and duplicate its
+        hypotheses. Only the filled positions are copied.
+
+        Args:
+            indices (sequence): Batch entries to keep.
+        """
+        if any(not 0 <= index < self.batch_size for index in indices):
+            raise ValueError("Batch indices must lie in [0, {}).".format(self.batch_size))
+        block = self.num_heads * self.max_length * self.depth
+        rows, step = self.length * self.depth, self.max_length * self.depth
+        buffers = []
+        for buffer in (self._keys, self._values):
+            selected = array(TYPECODE, bytes(8 * len(indices) * block))
+            for target, index in enumerate(indices):
+                for head in range(self.num_heads):
+                    source = index * block + head * step
+                    dest = target * block + head * step
+                    selected[dest:dest + rows] = buffer[source:source + rows]
+            buffers.append(selected)
+        self._keys, self._values = buffers
+        self._shared = False
+        self.batch_size = len(indices)
+
+    def attend(self, q, scale=None, block_size=ATTENTION_BLOCK_SIZE, heads_last=False, pattern=None):
+        """
+        Attention of the newest ``m`` positions to everything cached.
+
+        The queries are the last ``m`` appended positions and attend
+        causally: query ``i`` sees the cached prefix and the new positions up
+        to its own. The capacity buffers are passed as they are, and the
+        causal start keeps the kernels from reading past the filled keys, so
+        nothing is copied.
+
+        Args:
+            q (Matrix): Queries of shape (batch, heads, m, depth), appended
+                with ``append`` before this call.
+            scale (float, optional): Score scale. Defaults to ``1 / sqrt(depth)``.
+            block_size (int, optional): Keys per block.
+            heads_last (bool, optional): Return (batch, m, heads, depth), see
+                ``MatrixAttention.scaled_dot_product``.
+            pattern (AttentionPattern, optional): Restrict every query to
+                the pattern's keys among the cached ones, e.g. a sliding
+                window, so a step costs O(window). The pattern is made
+                causal, so the result does not depend on how the sequence
+                was split into appended chunks.
+
+        Returns:
+            Matrix: Attention output of shape (batch, heads, m, depth).
+        """
+        m = q.shape()[-2]
+        if m > self.length:
+            raise ValueError("Append the keys and values of the {} queries before attending.".format(m))
+        keys = Matrix.from_buffer(self._keys, self._capacity_shape())
+        values = Matrix.from_buffer(self._values, self._capacity_shape())
+        if pattern is not None:
+            return MatrixAttention.sparse(q, keys, values, pattern.as_causal(), scale, self.length - m, self.length,
+                                          heads_last)
+        mask = AttentionMask(causal=True, start=self.length - m)
+        return MatrixAttention.scaled_dot_product(q, keys, values, mask, scale=scale, block_size=block_size,
+                                                  heads_last=heads_last)
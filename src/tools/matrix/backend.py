@@ -0,0 +1,454 @@
+import os
+from array import array
+from contextlib import contextmanager
+
+from . import kernels
+
+# name of the environment variable that picks the default backend
+BACKEND_ENV_VAR = 'METAFORM_BACKEND'
+DEFAULT_BACKEND = 'python'
+
+
+class PythonBackend:
+    """
+    Reference backend running the pure-Python kernels in ``kernels``.
+
+    Every backend works on flat row-major buffers plus shapes and returns
+    new ``array('d')`` buffers, so Matrix never needs to know which engine
+    produced a result.
+    """
+
+    name = 'python'
+
+    def matmul(self, a, a_shape, b, b_shape, a_strides=None, a_offset=0, b_strides=None, b_offset=0):
+        return kernels.matmul(a, a_shape, b, b_shape, a_strides=a_strides, a_offset=a_offset,
+                              b_strides=b_strides, b_offset=b_offset)
+
+    def linear(self, a, a_shape, b, b_shape, bias=None, activation=None, a_strides=None, a_offset=0,
+               b_strides=None, b_offset=0):
+        step = kernels.epilogue(bias, activation)
+        return kernels.matmul(a, a_shape, b, b_shape, a_strides=a_strides, a_offset=a_offset,
+                              b_strides=b_strides, b_offset=b_offset, step=step)
+
+    def softmax(self, a, shape, causal=False, start=None, lengths=None, bias=None, bias_shape=None, log=False,
+                out=None, out_offset=0):
+        return kernels.softmax(a, shape, causal, start, lengths, bias, bias_shape, log, out, out_offset)
+
+    def norm(self, a, n, gamma=None, beta=None, epsilon=1e-5, rms=False, out=None, out_offset=0):
+        return kernels.norm(a, n, gamma, beta, epsilon, rms, out, out_offset)
+
+    def attention(self, q, q_shape, k, k_shape, v, v_shape, scale, causal=False, start=None, mask=None,
+                  mask_shape=None, lengths=None, bias=None, bias_shape=None, block_size=kernels.ATTENTION_BLOCK_SIZE,
+                  heads_last=False):
+        return kernels.attention(q, q_shape, k, k_shape, v, v_shape, scale, causal, start, mask, mask_shape,
+                                 lengths, bias, bias_shape, block_size, heads_last)
+
+    def sparse_attention(self, q, q_shape, k, k_shape, v, v_shape, scale, row_keys, start=None, n=None,
+                         heads_last=False):
+        return kernels.sparse_attention(q, q_shape, k, k_shape, v, v_shape, scale, row_keys, start, n, heads_last)
+
+    def int8_matmul(self, a, a_shape, b, b_shape):
+        # contiguous int8 operands; widened to doubles, whose sums of int8
+        # products stay exact integers far beyond the int32 range, so the
+        # float kernels give the int32 accumulator without boxing Python ints
+        return self.matmul(array(kernels.TYPECODE, a), a_shape, array(kernels.TYPECODE, b), b_shape)
+
+    def elementwise(self, op, a, b, out=None, out_offset=0):
+        return kernels.elementwise(op, a, b, out, out_offset)
+
+    def broadcast_elementwise(self, op, a, a_shape, b, b_shape, out=None, out_offset=0):
+        return kernels.broadcast_elementwise(op, a, a_shape, b, b_shape, out, out_offset)
+
+    def unary(self, op, a, out=None, out_offset=0, alpha=None):
+        return kernels.unary(op, a, out, out_offset, alpha)
+
+    def axpy(self, alpha, x, y, out=None, out_offset=0):
+        return kernels.axpy(alpha, x, y, out, out_offset)
+
+    def addcmul(self, t, value, t1, t2, out=None, out_offset=0):
+        return kernels.addcmul(t, value, t1, t2, out, out_offset)
+
+    def addcdiv(self, t, value, t1, t2, out=None, out_offset=0):
+        return kernels.addcdiv(t, value, t1, t2, out, out_offset)
+
+    def reduce(self, op, a, shape, axis=None, keepdims=False):
+        if axis is not None:
+            axis = kernels.normalize_axis(axis, len(shape))
+        return kernels.reduce(op, a, shape, axis), kernels.reduced_shape(shape, axis, keepdims)
+
+
+class NumpyBackend:
+    """
+    Vectorized backend built on NumPy.
+
+    Buffers are wrapped with ``numpy.frombuffer`` without copying; results are
+    copied back into ``array('d')`` so they interoperate with the reference
+    backend. Requires NumPy to be installed.
+    """
+
+    name = 'numpy'
+
+    def __init__(self):
+        import numpy
+        self.np = numpy
+        self._binary = {
+            'add': numpy.add,
+            'sub': numpy.subtract,
+            'mul': numpy.multiply,
+            'truediv': numpy.true_divide,
+            'pow': numpy.power,
+            'maximum': numpy.maximum,
+            'minimum': numpy.minimum,
+        }
+        self._unary = {
+            'exp': numpy.exp,
+            'log': numpy.log,
+            'sqrt': numpy.sqrt,
+            'neg': numpy.negative,
+            'abs': numpy.abs,
+            'relu': lambda x, out=None: numpy.maximum(x, 0.0, out=out),
+            'tanh': numpy.tanh,
+            # exp(-softplus(-x)) never overflows
+            'sigmoid': lambda x, out=None: numpy.exp(-numpy.logaddexp(0.0, -x), out=out),
+            'silu': lambda x, out=None: numpy.multiply(x, numpy.exp(-numpy.logaddexp(0.0, -x)), out=out),
+            'gelu_tanh': lambda x, out=None: numpy.multiply(
+                0.5 * x, 1.0 + numpy.tanh(kernels.SQRT_2_OVER_PI * (x + kernels.GELU_TANH_COEFFICIENT * x ** 3)), out=out),
+        }
+        self._parametric = {
+            'leaky_relu': lambda x, alpha: numpy.where(x > 0.0, x, alpha * x),
+            'elu': lambda x, alpha: numpy.where(x > 0.0, x, alpha * numpy.expm1(numpy.minimum(x, 0.0))),
+        }
+
+    def _wrap(self, buffer, shape=None, strides=None, offset=0):
+        values = self.np.frombuffer(buffer, dtype=self.np.float64)
+        if shape is None:
+            return values
+        if strides is None:
+            return values[offset:offset + self.np.prod(shape, dtype=int)].reshape(shape)
+        return self.np.lib.stride_tricks.as_strided(values[offset:], shape=shape, strides=[8 * s for s in strides],
+                                                     writeable=False)
+
+    def _unwrap(self, values):
+        return array(kernels.TYPECODE, self.np.ascontiguousarray(values, dtype=self.np.float64).tobytes())
+
+    def _destination(self, out, out_offset, n):
+        # writable NumPy view onto a slice of an array('d'); None when a new buffer is wanted
+        if out is None:
+            return None
+        return self.np.frombuffer(out, dtype=self.np.float64)[out_offset:out_offset + n]
+
+    def _finish(self, values, out, dest):
+        if out is None:
+            return self._unwrap(values)
+        if values is not dest:
+            dest[...] = values
+        return out
+
+    def matmul(self, a, a_shape, b, b_shape, a_strides=None, a_offset=0, b_strides=None, b_offset=0):
+        if a_shape[-1] != b_shape[-2]:
+            raise ValueError("Matrices must have appropriate dimensions for multiplication.")
+        result = self.np.matmul(self._wrap(a, a_shape, a_strides, a_offset), self._wrap(b, b_shape, b_strides, b_offset))
+        return self._unwrap(result), tuple(result.shape)
+
+    def linear(self, a, a_shape, b, b_shape, bias=None, activation=None, a_strides=None, a_offset=0,
+               b_strides=None, b_offset=0):
+        if a_shape[-1] != b_shape[-2]:
+            raise ValueError("Matrices must have appropriate dimensions for multiplication.")
+        result = self.np.matmul(self._wrap(a, a_shape, a_strides, a_offset), self._wrap(b, b_shape, b_strides, b_offset))
+        if bias is not None:
+            result += self._wrap(bias)
+        shape = tuple(result.shape)
+        if activation is None:
+            return self._unwrap(result), shape
+        if activation not in self._unary:
+            values = self._unwrap(result)
+            return kernels.unary(activation, values, values), shape
+        return self._unwrap(self._unary[activation](result, out=result)), shape
+
+    def _lengths(self, lengths, batch_shape):
+        # per-sequence key counts shaped to broadcast against (batch, ..., rows, keys)
+        if not batch_shape or len(lengths) != batch_shape[0]:
+            raise ValueError("Expected one length per sequence of a batch of shape {}, got {}.".format(batch_shape, len(lengths)))
+        return self.np.asarray(lengths).reshape((len(lengths),) + (1,) * (len(batch_shape) + 1))
+
+    def softmax(self, a, shape, causal=False, start=None, lengths=None, bias=None, bias_shape=None, log=False,
+                out=None, out_offset=0):
+        np = self.np
+        m, n = shape[-2], shape[-1]
+        shift = n - m if start is None else start
+        dest = self._destination(out, out_offset, len(a))
+        result = np.empty(shape) if dest is None else dest.reshape(shape)
+        if bias is None:
+            np.copyto(result, self._wrap(a, shape))
+        else:
+            np.add(self._wrap(a, shape), self._wrap(bias, bias_shape), out=result)
+        # masked positions are overwritten one row or sequence at a time, so no mask array is built
+        if causal:
+            for i in range(m):
+                result[..., i, max(0, i + shift + 1):] = -np.inf
+        if lengths is not None:
+            for index, length in enumerate(self._lengths(lengths, tuple(shape[:-2])).ravel()):
+                result[index, ..., max(0, length):] = -np.inf
+        peak = result.max(axis=-1, keepdims=True)
+        np.subtract(result, np.where(np.isfinite(peak), peak, 0.0), out=result)
+        if log:
+            total = np.exp(result).sum(axis=-1, keepdims=True)
+            with np.errstate(divide='ignore'):
+                np.subtract(result, np.where(total > 0, np.log(total), 0.0), out=result)
+        else:
+            np.exp(result, out=result)
+            total = result.sum(axis=-1, keepdims=True)
+            np.divide(result, np.where(total > 0, total, 1.0), out=result)
+        return out if dest is not None else self._unwrap(result)
+
+    def norm(self, a, n, gamma=None, beta=None, epsilon=1e-5, rms=False, out=None, out_offset=0):
+        np = self.np
+        dest = self._destination(out, out_offset, len(a))
+        x = self._wrap(a).reshape(-1, n)
+        result = np.empty(x.shape) if dest is None else dest.reshape(x.shape)
+        if rms:
+            scale = 1.0 / np.sqrt(np.einsum('ij,ij->i', x, x) / n + epsilon)
+            np.multiply(x, scale[:, None], out=result)
+        else:
+            np.subtract(x, x.mean(axis=-1, keepdims=True), out=result)
+            scale = 1.0 / np.sqrt(np.einsum('ij,ij->i', result, result) / n + epsilon)
+            result *= scale[:, None]
+        if gamma is not None:
+            result *= self._wrap(gamma)
+        if beta is not None:
+            result += self._wrap(beta)
+        return out if dest is not None else self._unwrap(result)
+
+    def attention(self, q, q_shape, k, k_shape, v, v_shape, scale, causal=False, start=None, mask=None,
+                  mask_shape=None, lengths=None, bias=None, bias_shape=None, block_size=kernels.ATTENTION_BLOCK_SIZE,
+                  heads_last=False):
+        # the same online softmax, vectorized over every query row of every batch per key block
+        np = self.np
+        m, n = q_shape[-2], k_shape[-2]
+        if k_shape[-1] != q_shape[-1] or v_shape[-2] != n:
+            raise ValueError("Attention operands {}, {} and {} do not match.".format(q_shape, k_shape, v_shape))
+        if mask is not None and tuple(mask_shape[-2:]) != (m, n):
+            raise ValueError("Mask of shape {} does not match {} queries and {} keys.".format(mask_shape, m, n))
+        queries = self._wrap(q, q_shape) * scale
+        keys, values = self._wrap(k, k_shape), self._wrap(v, v_shape)
+        keep = None if mask is None else self._wrap(mask, mask_shape) != 0
+        scores_bias = None if bias is None else self._wrap(bias, bias_shape)
+        batch_shape = ()
+        for shape in (q_shape, k_shape, v_shape) + (() if mask is None else (mask_shape,)):
+            batch_shape = kernels.broadcast_shapes(batch_shape, shape[:-2])
+        valid = None if lengths is None else self._lengths(lengths, batch_shape)
+        shift = n - m if start is None else start
+        rows = np.arange(m)[:, None] + shift
+        # key blocks no query can see are skipped
+        used = max(0, min(n, shift + m)) if causal else n
+        if lengths is not None:
+            used = min(used, max(lengths, default=0))
+        peak = total = acc = None
+        for b0 in range(0, used, block_size):
+            b1 = min(b0 + block_size, used)
+            scores = np.matmul(queries, np.swapaxes(keys[..., b0:b1, :], -1, -2))
+            if scores_bias is not None:
+                scores = scores + scores_bias[..., b0:b1]
+            if valid is not None:
+                scores = np.where(np.arange(b0, b1) < valid, scores, -np.inf)
+            if keep is not None:
+                scores = np.where(keep[..., b0:b1], scores, -np.inf)
+            if causal:
+                scores = np.where(np.arange(b0, b1)[None, :] <= rows, scores, -np.inf)
+            block_peak = scores.max(axis=-1, keepdims=True)
+            new_peak = block_peak if peak is None else np.maximum(peak, block_peak)
+            # fully masked rows keep a finite reference so exp() sees no inf - inf
+            safe = np.where(np.isfinite(new_peak), new_peak, 0.0)
+            weights = np.exp(scores - safe)
+            block_acc = np.matmul(weights, values[..., b0:b1, :])
+            if peak is None:
+                total, acc = weights.sum(axis=-1, keepdims=True), block_acc
+            else:
+                alpha = np.exp(peak - safe)
+                total = total * alpha + weights.sum(axis=-1, keepdims=True)
+                acc = acc * alpha + block_acc
+            peak = new_peak
+        if acc is None:
+            batch_shape = ()
+            for shape in (q_shape, k_shape, v_shape) + (() if mask is None else (mask_shape,)):
+                batch_shape = kernels.broadcast_shapes(batch_shape, shape[:-2])
+            result = np.zeros(tuple(batch_shape) + (m, v_shape[-1]))
+        else:
+            result = np.where(total > 0, acc / np.where(total > 0, total, 1.0), 0.0)
+        if heads_last and result.ndim > 2:
+            result = np.swapaxes(result, -2, -3)
+        return self._unwrap(result), tuple(result.shape)
+
+    def sparse_attention(self, q, q_shape, k, k_shape, v, v_shape, scale, row_keys, start=None, n=None,
+                         heads_last=False, rows_per_chunk=256):
+        # query rows are processed in chunks; each chunk gathers its allowed
+        # keys into a (..., rows, width, d) block padded to the widest row
+        np = self.np
+        m, capacity = q_shape[-2], k_shape[-2]
+        if k_shape[-1] != q_shape[-1] or v_shape[-2] != capacity:
+            raise ValueError("Attention operands {}, {} and {} do not match.".format(q_shape, k_shape, v_shape))
+        n = capacity if n is None else n
+        if not 0 <= n <= capacity:
+            raise ValueError("Cannot use {} of {} keys.".format(n, capacity))
+        shift = n - m if start is None else start
+        queries = self._wrap(q, q_shape) * scale
+        keys, values = self._wrap(k, k_shape), self._wrap(v, v_shape)
+        batch_shape = kernels.broadcast_shapes(kernels.broadcast_shapes(q_shape[:-2], k_shape[:-2]), v_shape[:-2])
+        result = np.zeros(tuple(batch_shape) + (m, v_shape[-1]))
+        for i0 in range(0, m, rows_per_chunk):
+            i1 = min(i0 + rows_per_chunk, m)
+            rows = [row_keys(shift + i, n) for i in range(i0, i1)]
+            width = max(map(len, rows))
+            if not width:
+                continue
+            index = np.zeros((i1 - i0, width), dtype=np.intp)
+            valid = np.zeros((i1 - i0, width), dtype=bool)
+            for r, row in enumerate(rows):
+                index[r, :len(row)] = row
+                valid[r, :len(row)] = True
+            scores = np.einsum('...rd,...rwd->...rw', queries[..., i0:i1, :], keys[..., index, :])
+            scores = np.where(valid, scores, -np.inf)
+            peak = scores.max(axis=-1, keepdims=True)
+            weights = np.exp(scores - np.where(np.isfinite(peak), peak, 0.0))
+            total = weights.sum(axis=-1, keepdims=True)
+            weights /= np.where(total > 0, total, 1.0)
+            result[..., i0:i1, :] = np.einsum('...rw,...rwd->...rd', weights, values[..., index, :])
+        if heads_last and result.ndim > 2:
+            result = np.swapaxes(result, -2, -3)
+        return self._unwrap(result), tuple(result.shape)
+
+    def int8_matmul(self, a, a_shape, b, b_shape):
+        if a_shape[-1] != b_shape[-2]:
+            raise ValueError("Matrices must have appropriate dimensions for multiplication.")
+        np = self.np
+        # widen before multiplying so the products and sums cannot wrap in int8
+        a = np.frombuffer(a, dtype=np.int8).reshape(a_shape).astype(np.int32)
+        b = np.frombuffer(b, dtype=np.int8).reshape(b_shape).astype(np.int32)
+        result = np.matmul(a, b)
+        return self._unwrap(result), tuple(result.shape)
+
+    def elementwise(self, op, a, b, out=None, out_offset=0):
+        if not isinstance(b, (int, float)):
+            b = self._wrap(b)
+        dest = self._destination(out, out_offset, len(a))
+        return self._finish(self._binary[op](self._wrap(a), b, out=dest), out, dest)
+
+    def broadcast_elementwise(self, op, a, a_shape, b, b_shape, out=None, out_offset=0):
+        out_shape = kernels.broadcast_shapes(a_shape, b_shape)
+        dest = self._destination(out, out_offset, int(self.np.prod(out_shape)))
+        if dest is not None:
+            dest = dest.reshape(out_shape)
+        return self._finish(self._binary[op](self._wrap(a, a_shape), self._wrap(b, b_shape), out=dest), out, dest)
+
+    def unary(self, op, a, out=None, out_offset=0, alpha=None):
+        if op not in self._unary and op not in self._parametric:
+            # NumPy has no erf; the exact GELU runs on the reference kernel
+            return kernels.unary(op, a, out, out_offset, alpha)
+        dest = self._destination(out, out_offset, len(a))
+        if alpha is not None:
+            return self._finish(self._parametric[op](self._wrap(a), alpha), out, dest)
+        return self._finish(self._unary[op](self._wrap(a), out=dest), out, dest)
+
+    def axpy(self, alpha, x, y, out=None, out_offset=0):
+        dest = self._destination(out, out_offset, len(x))
+        return self._finish(alpha * self._wrap(x) + self._wrap(y), out, dest)
+
+    def addcmul(self, t, value, t1, t2, out=None, out_offset=0):
+        dest = self._destination(out, out_offset, len(t))
+        return self._finish(self._wrap(t) + value * self._wrap(t1) * self._wrap(t2), out, dest)
+
+    def addcdiv(self, t, value, t1, t2, out=None, out_offset=0):
+        dest = self._destination(out, out_offset, len(t))
+        return self._finish(self._wrap(t) + value * self._wrap(t1) / self._wrap(t2), out, dest)
+
+    def _logsumexp(self, x, axis, keepdims):
+        peak = self.np.max(x, axis=axis, keepdims=True)
+        shift = self.np.where(self.np.isfinite(peak), peak, 0.0)
+        with self.np.errstate(divide='ignore'):
+            result = self.np.log(self.np.sum(self.np.exp(x - shift), axis=axis, keepdims=True)) + shift
+        result = self.np.where(self.np.isinf(peak), peak, result)
+        return result if keepdims else self.np.squeeze(result, axis=axis)
+
+    def reduce(self, op, a, shape, axis=None, keepdims=False):
+        if op not in kernels.REDUCTIONS:
+            raise ValueError("Unsupported reduction '{}'.".format(op))
+        if axis is not None:
+            axis = kernels.normalize_axis(axis, len(shape))
+        x = self._wrap(a, shape)
+        if op == 'logsumexp':
+            result = self._logsumexp(x, axis, keepdims)
+        elif op == 'argmax':
+            result = self.np.argmax(x, axis=axis, keepdims=keepdims).astype(self.np.float64)
+        else:
+            result = getattr(self.np, op)(x, axis=axis, keepdims=keepdims)
+        return self._unwrap(result), kernels.reduced_shape(shape, axis, keepdims)
+
+
+_registry = {
+    'python': PythonBackend,
+    'numpy': NumpyBackend,
+}
+_instances = {}
+_active = None
+
+
+def register_backend(name, factory):
+    """
+    Registers a backend under ``name``.
+
+    Args:
+        name (str): Name used by ``set_backend``, ``use_backend`` and the
+            ``METAFORM_BACKEND`` environment variable.
+        factory (callable): Zero-argument callable returning the backend.
+    """
+    _registry[name] = factory
+    _instances.pop(name, None)
+
+
+def available_backends():
+    return sorted(_registry)
+
+
+def _resolve(name):
+    if name not in _registry:
+        raise ValueError("Unknown backend '{}'. Available backends: {}.".format(name, ', '.join(available_backends())))
+    if name not in _instances:
+        _instances[name] = _registry[name]()
+    return _instances[name]
+
+
+def get_backend():
+    """
+    Returns the active backend, reading ``METAFORM_BACKEND`` on first use.
+    """
+    global _active
+    if _active is None:
+        _active = _resolve(os.environ.get(BACKEND_ENV_VAR, DEFAULT_BACKEND))
+    return _active
+
+
+def set_backend(name):
+    """
+    Makes ``name`` the active backend for the rest of the process.
+    """
+    global _active
+    _active = _resolve(name)
+    return _active
+
+
+@contextmanager
+def use_backend(name):
+    """
+    Temporarily switches the active backend.
+
+    Example:
+        with use_backend('numpy'):
+            scores = q.matmul(k.transpose())
+    """
+    global _active
+    previous = get_backend()
+    _active = _resolve(name)
+    try:
+        yield _active
+    finally:
+        _active = previous
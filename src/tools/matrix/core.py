@@ -1,3 +1,6 @@
+from .kernels import matmul
+
+
 class Matrix:
     def __init__(self, data):
         self.data = data
@@ -18,8 +21,10 @@ class Matrix:
         return Matrix(result)
 
     def __mul__(self, other):
-        # Matrix multiplication
-        result = [[sum(self.data[i][k] * other.data[k][j] for k in range(self.cols)) for j in range(other.cols)] for i in range(self.rows)]
+        # Matrix multiplication through the shared blocked kernel
+        flat, _ = matmul([val for row in self.data for val in row], (self.rows, self.cols),
+                         [val for row in other.data for val in row], (other.rows, other.cols))
+        result = [flat[i * other.cols:(i + 1) * other.cols].tolist() for i in range(self.rows)]
         return Matrix(result)
 
     def transpose(self):
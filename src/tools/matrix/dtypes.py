@@ -0,0 +1,121 @@
+import math
+import struct
+import sys
+from array import array
+
+from .kernels import TYPECODE
+
+# storage typecode of each dtype; float16 and bfloat16 keep their raw bit patterns
+STORAGE = {
+    'float64': 'd',
+    'float32': 'f',
+    'float16': 'H',
+    'bfloat16': 'H',
+    'int8': 'b',
+}
+
+# one-character code per dtype, as written to matrix file headers
+CODES = {
+    'float64': 'd',
+    'float32': 'f',
+    'float16': 'e',
+    'bfloat16': 'E',
+    'int8': 'b',
+}
+
+DEFAULT_DTYPE = 'float64'
+
+# largest finite float16 and the point from which values round to infinity
+FLOAT16_MAX = 65504.0
+_FLOAT16_OVERFLOW = 65520.0
+
+
+def check_dtype(dtype):
+    if dtype not in STORAGE:
+        raise ValueError("Unsupported dtype '{}'; expected one of {}.".format(dtype, tuple(STORAGE)))
+    return dtype
+
+
+def dtype_from_code(code):
+    for dtype, dtype_code in CODES.items():
+        if dtype_code == code:
+            return dtype
+    raise ValueError("Unknown dtype code '{}'.".format(code))
+
+
+def _float16_bits(values):
+    try:
+        packed = struct.pack('={}e'.format(len(values)), *values)
+    except OverflowError:
+        # struct refuses out-of-range values; IEEE rounding sends them to infinity
+        values = [math.copysign(math.inf, v) if abs(v) >= _FLOAT16_OVERFLOW else v for v in values]
+        packed = struct.pack('={}e'.format(len(values)), *values)
+    result = array('H')
+    result.frombytes(packed)
+    return result
+
+
+def _bfloat16_bits(values):
+    # upper half of the float32 pattern, rounded to nearest even; NaNs stay quiet NaNs
+    bits = array('I')
+    bits.frombytes(array('f', values).tobytes())
+    return array('H', [0x7FC0 if b & 0x7FFFFFFF > 0x7F800000 else (b + 0x7FFF + ((b >> 16) & 1)) >> 16 for b in bits])
+
+
+def _bfloat16_values(raw):
+    # each 16-bit pattern becomes the high half of a float32, written with strided byte copies
+    halves = raw.tobytes()
+    words = bytearray(2 * len(halves))
+    high = 2 if sys.byteorder == 'little' else 0
+    words[high::4] = halves[0::2]
+    words[high + 1::4] = halves[1::2]
+    result = array('f')
+    result.frombytes(bytes(words))
+    return array(TYPECODE, result)
+
+
+def encode(values, dtype):
+    """
+    Converts float values to the storage of ``dtype``.
+
+    float32 and float16 round to nearest, bfloat16 rounds to nearest even,
+    and int8 rounds half to even and saturates to [-128, 127], with
+    infinities clamped like any other out-of-range value and NaN stored as 0.
+
+    Args:
+        values (sequence): Float values.
+        dtype (str): Target dtype.
+
+    Returns:
+        array: Values in the dtype's storage typecode.
+    """
+    if dtype == 'float64':
+        return array(TYPECODE, values)
+    if dtype == 'float32':
+        return array('f', values)
+    if dtype == 'float16':
+        return _float16_bits(values)
+    if dtype == 'bfloat16':
+        return _bfloat16_bits(values)
+    if dtype == 'int8':
+        # clamp before rounding: round() rejects inf and nan (v != v)
+        return array('b', [0 if v != v else round(min(127.0, max(-128.0, v))) for v in values])
+    raise ValueError("Unsupported dtype '{}'.".format(dtype))
+
+
+def decode(raw, dtype):
+    """
+    Expands stored values of ``dtype`` to float64 for computation.
+
+    Args:
+        raw (sequence): Values in the dtype's storage typecode.
+        dtype (str): Dtype of ``raw``.
+
+    Returns:
+        array: ``array('d')`` of the values.
+    """
+    if dtype == 'float16':
+        return array(TYPECODE, struct.unpack('={}e'.format(len(raw)), raw))
+    if dtype == 'bfloat16':
+        return _bfloat16_values(array('H', raw))
+    return array(TYPECODE, raw)
@@ -0,0 +1,1075 @@
+import math
+import operator
+import random
+import time
+from array import array
+from itertools import product, repeat
+
+TYPECODE = 'd'
+
+# tile sizes for the blocked matmul; rows/cols of C per tile and depth per k panel
+BLOCK_SIZE = 64
+K_BLOCK_SIZE = 512
+
+# elements written per step by in-place kernels; bounds their temporaries
+CHUNK_SIZE = 4096
+
+# keys per block of the online-softmax attention kernel
+ATTENTION_BLOCK_SIZE = 128
+
+# sizes tried when calibrating where Strassen starts beating the blocked kernel
+STRASSEN_CANDIDATES = (64, 128, 256, 512)
+# rows of A used for the timing probes; matmul cost is affine in this dimension
+CALIBRATION_ROWS = (8, 16)
+_strassen_crossover = None
+
+
+BINARY_OPS = {
+    'add': operator.add,
+    'sub': operator.sub,
+    'mul': operator.mul,
+    'truediv': operator.truediv,
+    'pow': operator.pow,
+    'maximum': max,
+    'minimum': min,
+}
+
+SQRT_2_OVER_PI = math.sqrt(2.0 / math.pi)
+GELU_TANH_COEFFICIENT = 0.044715
+
+
+def relu(x):
+    return x if x > 0.0 else 0.0
+
+
+def _relu_chunk(chunk):
+    # inlined comparison; a list comprehension beats a call per element here
+    return [v if v > 0.0 else 0.0 for v in chunk]
+
+
+def sigmoid(x):
+    # only ever exponentiates a non-positive number, so neither branch overflows
+    if x >= 0.0:
+        return 1.0 / (1.0 + math.exp(-x))
+    z = math.exp(x)
+    return z / (1.0 + z)
+
+
+def silu(x):
+    # x * sigmoid(x), with the same overflow-free split
+    if x >= 0.0:
+        return x / (1.0 + math.exp(-x))
+    z = math.exp(x)
+    return x * z / (1.0 + z)
+
+
+def gelu(x):
+    # exact GELU, x * Phi(x)
+    return 0.5 * x * (1.0 + math.erf(x * 0.7071067811865476))
+
+
+def gelu_tanh(x):
+    # tanh approximation of GELU used by GPT-2 and BERT
+    return 0.5 * x * (1.0 + math.tanh(SQRT_2_OVER_PI * (x + GELU_TANH_COEFFICIENT * x * x * x)))
+
+
+def leaky_relu(x, alpha):
+    return x if x > 0.0 else alpha * x
+
+
+def elu(x, alpha):
+    # expm1 keeps precision for small negative x
+    return x if x > 0.0 else alpha * math.expm1(x)
+
+
+UNARY_OPS = {
+    'exp': math.exp,
+    'log': math.log,
+    'sqrt': math.sqrt,
+    'neg': operator.neg,
+    'abs': abs,
+    'relu': relu,
+    'sigmoid': sigmoid,
+    'tanh': math.tanh,
+    'gelu': gelu,
+    'gelu_tanh': gelu_tanh,
+    'silu': silu,
+}
+
+# whole-chunk implementations that unary prefers over mapping UNARY_OPS
+CHUNK_OPS = {
+    'relu': _relu_chunk,
+}
+
+# unary operators with one scalar parameter
+PARAMETRIC_OPS = {
+    'leaky_relu': leaky_relu,
+    'elu': elu,
+}
+
+
+def _dot(x, y):
+    return sum(map(operator.mul, x, y))
+
+
+# math.sumprod (Python 3.12+) runs the inner product in C
+dot = getattr(math, 'sumprod', _dot)
+
+
+def broadcast_shapes(shape_a, shape_b):
+    """
+    Computes the NumPy-style broadcast of two shapes.
+
+    Args:
+        shape_a (tuple): First shape.
+        shape_b (tuple): Second shape.
+
+    Returns:
+        tuple: The broadcast shape.
+    """
+    ndim = max(len(shape_a), len(shape_b))
+    padded_a = (1,) * (ndim - len(shape_a)) + tuple(shape_a)
+    padded_b = (1,) * (ndim - len(shape_b)) + tuple(shape_b)
+    shape = []
+    for dim_a, dim_b in zip(padded_a, padded_b):
+        if dim_a != dim_b and dim_a != 1 and dim_b != 1:
+            raise ValueError("Shapes {} and {} cannot be broadcast together.".format(tuple(shape_a), tuple(shape_b)))
+        shape.append(max(dim_a, dim_b))
+    return tuple(shape)
+
+
+def normalize_axis(axis, ndim):
+    if not -ndim <= axis < ndim:
+        raise ValueError("Axis {} is out of range for {} dimensions.".format(axis, ndim))
+    return axis % ndim
+
+
+def reduced_shape(shape, axis, keepdims):
+    # shape left after reducing ``axis``; results always keep at least two dimensions
+    if axis is None:
+        shape = (1,) * len(shape) if keepdims else ()
+    elif keepdims:
+        shape = shape[:axis] + (1,) + shape[axis + 1:]
+    else:
+        shape = shape[:axis] + shape[axis + 1:]
+    return (1,) * (2 - len(shape)) + shape if len(shape) < 2 else shape
+
+
+def _chunk(x, start, end):
+    # [start, end) of a buffer operand without copying when it is all of it,
+    # or a scalar repeated over the chunk
+    if isinstance(x, (int, float)):
+        return repeat(x, end - start)
+    if start == 0 and end == len(x):
+        return x
+    return x[start:end]
+
+
+def _apply(build, n, out=None, out_offset=0):
+    # evaluates build(start, end) over [0, n); with ``out`` the values are
+    # written in CHUNK_SIZE pieces, so no temporary grows with n
+    if out is None:
+        return array(TYPECODE, build(0, n))
+    for start in range(0, n, CHUNK_SIZE):
+        end = min(start + CHUNK_SIZE, n)
+        out[out_offset + start:out_offset + end] = array(TYPECODE, build(start, end))
+    return out
+
+
+def elementwise(op, a, b, out=None, out_offset=0):
+    """
+    Applies a binary operator to two equally sized buffers, or a buffer and a scalar.
+
+    Args:
+        op (str): Key of ``BINARY_OPS``.
+        a (array): Flat left operand.
+        b (array or float): Flat right operand or scalar.
+        out (array, optional): Buffer receiving the result in place.
+        out_offset (int, optional): Index in ``out`` of the first result.
+
+    Returns:
+        array: The flat result, or ``out``.
+    """
+    fn = BINARY_OPS[op]
+    return _apply(lambda start, end: map(fn, _chunk(a, start, end), _chunk(b, start, end)), len(a), out, out_offset)
+
+
+def _broadcast_strides(shape, out_shape):
+    # contiguous strides of ``shape`` aligned to ``out_shape``, 0 along broadcast dimensions
+    pad = len(out_shape) - len(shape)
+    strides = contiguous_strides(shape)
+    return (0,) * pad + tuple(stride if dim > 1 else 0 for dim, stride in zip(shape, strides))
+
+
+def broadcast_elementwise(op, a, a_shape, b, b_shape, out=None, out_offset=0):
+    """
+    Applies a binary operator with NumPy-style broadcasting in one pass.
+
+    The smaller operand is never expanded: the output is produced row by row
+    (over its last dimension), and each operand contributes either a slice of
+    its buffer or, along a broadcast dimension, a repeated scalar.
+
+    Args:
+        op (str): Key of ``BINARY_OPS``.
+        a (array): Flat row-major buffer of the left operand.
+        a_shape (tuple): Shape of ``a``.
+        b (array): Flat row-major buffer of the right operand.
+        b_shape (tuple): Shape of ``b``.
+        out (array, optional): Buffer receiving the result in place.
+        out_offset (int, optional): Index in ``out`` of the first result.
+
+    Returns:
+        array: The flat result with the broadcast shape, or ``out``.
+    """
+    fn = BINARY_OPS[op]
+    out_shape = broadcast_shapes(a_shape, b_shape)
+    a_strides = _broadcast_strides(a_shape, out_shape)
+    b_strides = _broadcast_strides(b_shape, out_shape)
+    width = out_shape[-1]
+
+    a_starts, b_starts = [0], [0]
+    for dim, a_stride, b_stride in zip(out_shape[:-1], a_strides[:-1], b_strides[:-1]):
+        a_starts = [start + i * a_stride for start in a_starts for i in range(dim)]
+        b_starts = [start + i * b_stride for start in b_starts for i in range(dim)]
+
+    def row(x, start, stride):
+        return x[start:start + width] if stride else repeat(x[start], width)
+
+    if out is None:
+        out = array(TYPECODE, bytes(8 * len(a_starts) * width))
+        out_offset = 0
+    for index, (a_start, b_start) in enumerate(zip(a_starts, b_starts)):
+        dest = out_offset + index * width
+        out[dest:dest + width] = array(TYPECODE, map(fn, row(a, a_start, a_strides[-1]), row(b, b_start, b_strides[-1])))
+    return out
+
+
+def unary(op, a, out=None, out_offset=0, alpha=None):
+    # ``alpha`` is the parameter of the PARAMETRIC_OPS
+    if op in CHUNK_OPS:
+        build = CHUNK_OPS[op]
+        return _apply(lambda start, end: build(_chunk(a, start, end)), len(a), out, out_offset)
+    if alpha is None:
+        fn = UNARY_OPS[op]
+        return _apply(lambda start, end: map(fn, _chunk(a, start, end)), len(a), out, out_offset)
+    fn = PARAMETRIC_OPS[op]
+    return _apply(lambda start, end: map(fn, _chunk(a, start, end), repeat(alpha, end - start)), len(a), out, out_offset)
+
+
+def axpy(alpha, x, y, out=None, out_offset=0):
+    # alpha * x + y in one pass
+    def build(start, end):
+        scaled = map(operator.mul, _chunk(x, start, end), repeat(alpha, end - start))
+        return map(operator.add, scaled, _chunk(y, start, end))
+    return _apply(build, len(x), out, out_offset)
+
+
+def addcmul(t, value, t1, t2, out=None, out_offset=0):
+    # t + value * t1 * t2 in one pass
+    def build(start, end):
+        products = map(operator.mul, _chunk(t1, start, end), _chunk(t2, start, end))
+        return map(operator.add, _chunk(t, start, end), map(operator.mul, products, repeat(value, end - start)))
+    return _apply(build, len(t), out, out_offset)
+
+
+def addcdiv(t, value, t1, t2, out=None, out_offset=0):
+    # t + value * t1 / t2 in one pass
+    def build(start, end):
+        quotients = map(operator.truediv, _chunk(t1, start, end), _chunk(t2, start, end))
+        return map(operator.add, _chunk(t, start, end), map(operator.mul, quotients, repeat(value, end - start)))
+    return _apply(build, len(t), out, out_offset)
+
+
+REDUCTIONS = ('sum', 'mean', 'max', 'min', 'argmax', 'var', 'logsumexp')
+
+
+def _logsumexp(row):
+    peak = max(row)
+    if math.isinf(peak):
+        return peak
+    return peak + math.log(sum(map(math.exp, map(operator.sub, row, repeat(peak)))))
+
+
+def _variance(row):
+    mean = sum(row) / len(row)
+    deviations = list(map(operator.sub, row, repeat(mean)))
+    return dot(deviations, deviations) / len(row)
+
+
+# reductions of one contiguous row; rows are in cache, so a second sweep is cheap
+_ROW_REDUCTIONS = {
+    'sum': sum,
+    'mean': lambda row: sum(row) / len(row),
+    'max': max,
+    'min': min,
+    'argmax': lambda row: float(max(range(len(row)), key=row.__getitem__)),
+    'var': _variance,
+    'logsumexp': _logsumexp,
+}
+
+
+def _reduce_slices(op, a, start, dim, inner):
+    # reduces ``dim`` consecutive slices of length ``inner`` elementwise,
+    # streaming each slice once
+    mul, add, sub = operator.mul, operator.add, operator.sub
+    first = a[start:start + inner]
+    slices = (a[start + d * inner:start + (d + 1) * inner] for d in range(1, dim))
+    if op in ('sum', 'mean'):
+        acc = first
+        for x in slices:
+            acc = list(map(add, acc, x))
+        return list(map(mul, acc, repeat(1.0 / dim))) if op == 'mean' else acc
+    if op in ('max', 'min'):
+        acc = first
+        for x in slices:
+            acc = list(map(max if op == 'max' else min, acc, x))
+        return acc
+    if op == 'argmax':
+        acc, index = list(first), [0.0] * inner
+        for d, x in enumerate(slices, 1):
+            index = [float(d) if val > best else i for val, best, i in zip(x, acc, index)]
+            acc = list(map(max, acc, x))
+        return index
+    if op == 'var':
+        # Welford, one slice at a time: delta = x - mean; mean += delta / n; m2 += delta * (x - mean)
+        mean, m2 = list(first), [0.0] * inner
+        for n, x in enumerate(slices, 2):
+            delta = list(map(sub, x, mean))
+            mean = list(map(add, mean, map(mul, delta, repeat(1.0 / n))))
+            m2 = list(map(add, m2, map(mul, delta, map(sub, x, mean))))
+        return list(map(mul, m2, repeat(1.0 / dim)))
+    # logsumexp: the peak of each position first, then the shifted exponentials
+    peak = _reduce_slices('max', a, start, dim, inner)
+    shift = [0.0 if math.isinf(p) else p for p in peak]
+    acc = [0.0] * inner
+    for d in range(dim):
+        x = a[start + d * inner:start + (d + 1) * inner]
+        acc = list(map(add, acc, map(math.exp, map(sub, x, shift))))
+    return [p if math.isinf(p) else s + math.log(total) for p, s, total in zip(peak, shift, acc)]
+
+
+def reduce(op, a, shape, axis=None):
+    """
+    Reduces a flat buffer along one axis, or over every element.
+
+    The buffer is viewed as (outer, dim, inner). Reducing the last axis walks
+    contiguous rows; any other axis combines whole inner slices at a time.
+    ``argmax`` returns indices as floats; ``var`` is the population variance.
+
+    Args:
+        op (str): One of ``REDUCTIONS``.
+        a (array): Flat row-major buffer.
+        shape (tuple): Shape of ``a``.
+        axis (int, optional): Non-negative axis to reduce; ``None`` reduces
+            everything to a single value.
+
+    Returns:
+        array: The flat result with ``axis`` removed.
+    """
+    if op not in REDUCTIONS:
+        raise ValueError("Unsupported reduction '{}'.".format(op))
+    if axis is None:
+        dim, inner = len(a), 1
+    else:
+        dim = shape[axis]
+        inner = 1
+        for size in shape[axis + 1:]:
+            inner *= size
+    if dim == 0:
+        raise ValueError("Cannot reduce an empty axis.")
+    outer = len(a) // (dim * inner)
+    if inner == 1:
+        fn = _ROW_REDUCTIONS[op]
+        return array(TYPECODE, [fn(a[o * dim:(o + 1) * dim]) for o in range(outer)])
+    result = array(TYPECODE)
+    for o in range(outer):
+        result.extend(_reduce_slices(op, a, o * dim * inner, dim, inner))
+    return result
+
+
+def norm(a, n, gamma=None, beta=None, epsilon=1e-5, rms=False, out=None, out_offset=0):
+    """
+    Layer normalization, or RMS normalization, of every row of length ``n``.
+
+    Each row is read once into its centered values (RMS: the row itself),
+    whose dot product gives the variance (mean square); the same values are
+    then scaled and shifted straight into ``out``. No mean, variance or
+    normalized matrix is allocated and the centered form keeps the variance
+    free of the cancellation of ``E[x^2] - E[x]^2``.
+
+    Args:
+        a (array): Flat input, rows of ``n`` values.
+        n (int): Row length (the normalized features).
+        gamma (array, optional): ``n`` scales.
+        beta (array, optional): ``n`` shifts.
+        epsilon (float, optional): Added to the variance.
+        rms (bool, optional): RMSNorm: divide by the root mean square
+            without centering.
+        out (array, optional): Buffer receiving the result; may be ``a``.
+        out_offset (int, optional): Index in ``out`` of the first result.
+
+    Returns:
+        array: The flat result, or ``out``.
+    """
+    if out is None:
+        out, out_offset = array(TYPECODE, bytes(8 * len(a))), 0
+    sub, mul, add = operator.sub, operator.mul, operator.add
+    for start in range(0, len(a), n):
+        row = a[start:start + n]
+        if not rms:
+            row = list(map(sub, row, repeat(sum(row) / n, n)))
+        values = map(mul, row, repeat(1.0 / math.sqrt(dot(row, row) / n + epsilon), n))
+        if gamma is not None:
+            values = map(mul, values, gamma)
+        if beta is not None:
+            values = map(add, values, beta)
+        dest = out_offset + start
+        out[dest:dest + n] = array(TYPECODE, values)
+    return out
+
+
+def contiguous_strides(shape):
+    # row-major element strides for the given shape
+    strides = []
+    step = 1
+    for dim in reversed(shape):
+        strides.append(step)
+        step *= dim
+    return tuple(reversed(strides))
+
+
+def is_contiguous(shape, strides):
+    expected = contiguous_strides(shape)
+    return all(dim == 1 or stride == want for dim, stride, want in zip(shape, strides, expected))
+
+
+def gather(buffer, shape, strides, offset=0):
+    """
+    Copies a strided view into a new contiguous buffer.
+
+    Args:
+        buffer (array): Flat buffer the view points into.
+        shape (tuple): Shape of the view.
+        strides (tuple): Element strides of the view.
+        offset (int, optional): Index of the view's first element.
+
+    Returns:
+        array: The view's values in row-major order.
+    """
+    last, step = shape[-1], strides[-1]
+    starts = [offset]
+    for dim, stride in zip(shape[:-1], strides[:-1]):
+        starts = [start + i * stride for start in starts for i in range(dim)]
+    # keep the buffer's own storage type (memoryviews expose it as ``format``)
+    result = array(buffer.typecode if isinstance(buffer, array) else buffer.format)
+    if last == 0:
+        return result
+    for start in starts:
+        if step > 0:
+            result.extend(buffer[start:start + (last - 1) * step + 1:step])
+        else:
+            result.extend([buffer[start + j * step] for j in range(last)])
+    return result
+
+
+def _batch_offsets(batch_shape, batch_strides, out_batch_shape, base=0):
+    # flat start of every 2D block of an operand, in output batch order
+    pad = len(out_batch_shape) - len(batch_shape)
+    strides = (0,) * pad + tuple(stride if dim > 1 else 0 for dim, stride in zip(batch_shape, batch_strides))
+    return [base + sum(i * s for i, s in zip(index, strides)) for index in product(*[range(d) for d in out_batch_shape])]
+
+
+def pack_transposed(b, start, k, n, k_block=K_BLOCK_SIZE, row_stride=None, col_stride=1):
+    """
+    Packs a (k, n) block of B into column panels.
+
+    Every column of B is copied once into its own list and split into panels
+    of ``k_block`` rows, so the inner loop of the matmul reads both operands
+    sequentially and reuses the already boxed floats of B. When B is a
+    transposed view (``row_stride == 1``) its columns are already contiguous
+    and are read as plain slices.
+
+    Args:
+        b (array): Flat buffer holding B.
+        start (int): Index of B[0][0] in ``b``.
+        k (int): Rows of B.
+        n (int): Columns of B.
+        k_block (int, optional): Rows per panel.
+        row_stride (int, optional): Distance between rows. Defaults to ``n``.
+        col_stride (int, optional): Distance between columns.
+
+    Returns:
+        list: ``panels[p][j]`` is rows ``p*k_block`` onward of column ``j``.
+    """
+    row_stride = n if row_stride is None else row_stride
+    if row_stride == 1 and col_stride != 1:
+        columns = [list(b[start + j * col_stride:start + j * col_stride + k]) for j in range(n)]
+    else:
+        span = (k - 1) * row_stride + 1
+        columns = [list(b[start + j * col_stride:start + j * col_stride + span:row_stride]) for j in range(n)]
+    if k <= k_block:
+        return [columns]
+    return [[column[k0:k0 + k_block] for column in columns] for k0 in range(0, k, k_block)]
+
+
+def epilogue(bias=None, activation=None):
+    """
+    Builds the per-row step of a fused linear layer.
+
+    Args:
+        bias (array, optional): Flat bias with one value per output column.
+        activation (str, optional): Key of ``UNARY_OPS`` applied after the bias.
+
+    Returns:
+        callable: ``fn(values, j0, j1)`` mapping output columns [j0, j1) of one
+        row to their final values, or None when there is nothing to apply.
+    """
+    if activation is not None and activation not in UNARY_OPS:
+        raise ValueError("Unknown activation '{}'.".format(activation))
+    if bias is None and activation is None:
+        return None
+    if activation is None:
+        return lambda values, j0, j1: map(operator.add, values, bias[j0:j1])
+    chunk_op = CHUNK_OPS.get(activation)
+    fn = UNARY_OPS[activation]
+    apply = chunk_op or (lambda values: map(fn, values))
+    if bias is None:
+        return lambda values, j0, j1: apply(values)
+    return lambda values, j0, j1: apply(map(operator.add, values, bias[j0:j1]))
+
+
+def matmul(a, a_shape, b, b_shape, block_size=BLOCK_SIZE, k_block=K_BLOCK_SIZE,
+           a_strides=None, a_offset=0, b_strides=None, b_offset=0, step=None):
+    """
+    Cache-blocked batched matrix multiplication on flat buffers.
+
+    Leading (batch) dimensions broadcast like NumPy, so a 2D weight is packed
+    once and reused across every batch of a 3D input. Operands may be strided
+    views: A only needs contiguous rows and B contiguous rows or columns, so
+    head-split activations and transposed keys are read in place. Other
+    layouts are gathered first.
+
+    Args:
+        a (array): Flat buffer of A.
+        a_shape (tuple): Shape of A, (..., m, k).
+        b (array): Flat buffer of B.
+        b_shape (tuple): Shape of B, (..., k, n).
+        block_size (int, optional): Tile size over the rows and columns of C.
+        k_block (int, optional): Tile size over the shared dimension.
+        a_strides (tuple, optional): Element strides of A. Defaults to row-major.
+        a_offset (int, optional): Index of A's first element in ``a``.
+        b_strides (tuple, optional): Element strides of B. Defaults to row-major.
+        b_offset (int, optional): Index of B's first element in ``b``.
+        step (callable, optional): ``epilogue`` applied to each row segment of
+            C as its last k panel is written, so bias and activation cost no
+            extra pass or buffer.
+
+    Returns:
+        tuple: The flat result buffer and its shape (..., m, n).
+    """
+    m, k = a_shape[-2], a_shape[-1]
+    n = b_shape[-1]
+    if b_shape[-2] != k:
+        raise ValueError("Matrices must have appropriate dimensions for multiplication.")
+    a_strides = contiguous_strides(a_shape) if a_strides is None else a_strides
+    b_strides = contiguous_strides(b_shape) if b_strides is None else b_strides
+    if a_strides[-1] != 1 and k > 1:
+        a, a_strides, a_offset = gather(a, a_shape, a_strides, a_offset), contiguous_strides(a_shape), 0
+    if b_strides[-1] != 1 and b_strides[-2] != 1:
+        b, b_strides, b_offset = gather(b, b_shape, b_strides, b_offset), contiguous_strides(b_shape), 0
+    a_row = a_strides[-2]
+    out_batch_shape = broadcast_shapes(a_shape[:-2], b_shape[:-2])
+    a_offsets = _batch_offsets(a_shape[:-2], a_strides[:-2], out_batch_shape, a_offset)
+    b_offsets = _batch_offsets(b_shape[:-2], b_strides[:-2], out_batch_shape, b_offset)
+
+    add = operator.add
+    result = array(TYPECODE, bytes(8 * len(a_offsets) * m * n))
+    packed = {}
+    # an A broadcast against several B blocks (e.g. one input times per-head
+    # weights) has its row tiles split once and reused
+    tiles = {} if len(set(a_offsets)) < len(a_offsets) else None
+    k_starts = range(0, k, k_block)
+    for out_start, (a_start, b_start) in zip(range(0, len(result), m * n), zip(a_offsets, b_offsets)):
+        panels = packed.get(b_start)
+        if panels is None:
+            panels = packed[b_start] = pack_transposed(b, b_start, k, n, k_block, b_strides[-2], b_strides[-1])
+        last = len(panels) - 1
+        for i0 in range(0, m, block_size):
+            i1 = min(i0 + block_size, m)
+            # rows of the A tile, split like the B panels and reused for every column tile
+            a_tile = None if tiles is None else tiles.get((a_start, i0))
+            if a_tile is None:
+                a_tile = [[list(a[a_start + i * a_row + k0:a_start + i * a_row + min(k0 + k_block, k)])
+                           for k0 in k_starts] for i in range(i0, i1)]
+                if tiles is not None:
+                    tiles[a_start, i0] = a_tile
+            for j0 in range(0, n, block_size):
+                j1 = min(j0 + block_size, n)
+                for p, panel in enumerate(panels):
+                    tile = panel[j0:j1]
+                    for i, a_row_panels in zip(range(i0, i1), a_tile):
+                        a_seg = a_row_panels[p]
+                        partial = [dot(a_seg, column) for column in tile]
+                        c0 = out_start + i * n + j0
+                        if p:
+                            partial = map(add, result[c0:c0 + j1 - j0], partial)
+                        if step is not None and p == last:
+                            partial = step(partial, j0, j1)
+                        result[c0:c0 + j1 - j0] = array(TYPECODE, partial)
+    return result, out_batch_shape + (m, n)
+
+
+def _quadrants(x, rows, cols):
+    # split a flat (rows, cols) block into its four (rows/2, cols/2) quadrants
+    half_rows, half_cols = rows // 2, cols // 2
+    quadrants = []
+    for r0 in (0, half_rows):
+        for c0 in (0, half_cols):
+            quadrant = array(TYPECODE)
+            for i in range(r0, r0 + half_rows):
+                quadrant.extend(x[i * cols + c0:i * cols + c0 + half_cols])
+            quadrants.append(quadrant)
+    return quadrants
+
+
+def _join(c11, c12, c21, c22, half_rows, half_cols):
+    result = array(TYPECODE)
+    for top, bottom in ((c11, c12), (c21, c22)):
+        for i in range(half_rows):
+            result.extend(top[i * half_cols:(i + 1) * half_cols])
+            result.extend(bottom[i * half_cols:(i + 1) * half_cols])
+    return result
+
+
+def _add(x, y):
+    return array(TYPECODE, map(operator.add, x, y))
+
+
+def _sub(x, y):
+    return array(TYPECODE, map(operator.sub, x, y))
+
+
+def _strassen(a, b, m, k, n, crossover):
+    if min(m, k, n) <= crossover or m % 2 or k % 2 or n % 2:
+        return matmul(a, (m, k), b, (k, n))[0]
+    a11, a12, a21, a22 = _quadrants(a, m, k)
+    b11, b12, b21, b22 = _quadrants(b, k, n)
+    m, k, n = m // 2, k // 2, n // 2
+
+    m1 = _strassen(_add(a11, a22), _add(b11, b22), m, k, n, crossover)
+    m2 = _strassen(_add(a21, a22), b11, m, k, n, crossover)
+    m3 = _strassen(a11, _sub(b12, b22), m, k, n, crossover)
+    m4 = _strassen(a22, _sub(b21, b11), m, k, n, crossover)
+    m5 = _strassen(_add(a11, a12), b22, m, k, n, crossover)
+    m6 = _strassen(_sub(a21, a11), _add(b11, b12), m, k, n, crossover)
+    m7 = _strassen(_sub(a12, a22), _add(b21, b22), m, k, n, crossover)
+
+    # the four-term sums are fused into one pass each instead of three temporaries
+    c11 = array(TYPECODE, map(operator.add, map(operator.sub, map(operator.add, m1, m4), m5), m7))
+    c12 = _add(m3, m5)
+    c21 = _add(m2, m4)
+    c22 = array(TYPECODE, map(operator.add, map(operator.add, map(operator.sub, m1, m2), m3), m6))
+    return _join(c11, c12, c21, c22, m, n)
+
+
+def _padded_dim(dim, levels):
+    step = 1 << levels
+    return -(-dim // step) * step
+
+
+def _pad(x, rows, cols, padded_rows, padded_cols, start=0):
+    if rows == padded_rows and cols == padded_cols:
+        return x[start:start + rows * cols]
+    result = array(TYPECODE, bytes(8 * padded_rows * padded_cols))
+    for i in range(rows):
+        result[i * padded_cols:i * padded_cols + cols] = array(TYPECODE, x[start + i * cols:start + (i + 1) * cols])
+    return result
+
+
+def _best_time(fn, repeat=2):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _calibrate_crossover():
+    # one Strassen level at size s costs seven half-size products plus about
+    # 24 elementwise passes over a quadrant (18 additions, the splits and the
+    # join); products are timed on two thin probes and extrapolated in the
+    # row count, since full products would take seconds. Strassen has to win
+    # by a clear margin so timing noise near break-even keeps the safe choice
+    rng = random.Random(0)
+    low, high = CALIBRATION_ROWS
+
+    def probe(size):
+        b = array(TYPECODE, [rng.random() for _ in range(size * size)])
+        timings = []
+        for rows in (low, high):
+            a = array(TYPECODE, [rng.random() for _ in range(rows * size)])
+            timings.append(_best_time(lambda: matmul(a, (rows, size), b, (size, size)), repeat=3))
+        slope = max(timings[1] - timings[0], 0.0) / (high - low)
+        return timings[0] + (size - low) * slope
+
+    x = array(TYPECODE, [rng.random() for _ in range(4096)])
+    add_cost = _best_time(lambda: _add(x, x)) / len(x)
+    for size in STRASSEN_CANDIDATES:
+        half = size // 2
+        blocked = probe(size)
+        strassen = 7 * probe(half) + 24 * half * half * add_cost
+        if strassen < 0.95 * blocked:
+            return half
+    return STRASSEN_CANDIDATES[-1]
+
+
+def strassen_crossover():
+    """
+    Returns the size at or below which Strassen hands over to the blocked kernel.
+
+    The value is estimated on first use by timing one level of Strassen
+    against the blocked kernel, then cached for the rest of the process.
+    """
+    global _strassen_crossover
+    if _strassen_crossover is None:
+        _strassen_crossover = _calibrate_crossover()
+    return _strassen_crossover
+
+
+def set_strassen_crossover(size):
+    """
+    Overrides the calibrated crossover; ``None`` recalibrates on next use.
+    """
+    global _strassen_crossover
+    _strassen_crossover = size
+
+
+def strassen_matmul(a, a_shape, b, b_shape, crossover=None):
+    """
+    Recursive Strassen multiplication on flat buffers.
+
+    Every dimension is zero-padded to a multiple of ``2**levels``, where
+    ``levels`` is the number of halvings needed to bring the smallest
+    dimension down to the crossover. Below the crossover the blocked kernel
+    takes over, so small or thin products cost no more than ``matmul``.
+    Leading batch dimensions broadcast as in ``matmul``.
+
+    Args:
+        a (array): Flat row-major buffer of A.
+        a_shape (tuple): Shape of A, (..., m, k).
+        b (array): Flat row-major buffer of B.
+        b_shape (tuple): Shape of B, (..., k, n).
+        crossover (int, optional): Leaf size. Defaults to the calibrated value.
+
+    Returns:
+        tuple: The flat result buffer and its shape (..., m, n).
+    """
+    m, k = a_shape[-2], a_shape[-1]
+    n = b_shape[-1]
+    if b_shape[-2] != k:
+        raise ValueError("Matrices must have appropriate dimensions for multiplication.")
+    crossover = crossover or strassen_crossover()
+    levels = 0
+    while -(-min(m, k, n) // (1 << levels)) > crossover:
+        levels += 1
+    if levels == 0:
+        return matmul(a, a_shape, b, b_shape)
+
+    pm, pk, pn = _padded_dim(m, levels), _padded_dim(k, levels), _padded_dim(n, levels)
+    out_batch_shape = broadcast_shapes(a_shape[:-2], b_shape[:-2])
+    a_offsets = _batch_offsets(a_shape[:-2], contiguous_strides(a_shape)[:-2], out_batch_shape)
+    b_offsets = _batch_offsets(b_shape[:-2], contiguous_strides(b_shape)[:-2], out_batch_shape)
+    padded_b = {}
+    result = array(TYPECODE)
+    for a_start, b_start in zip(a_offsets, b_offsets):
+        if b_start not in padded_b:
+            padded_b[b_start] = _pad(b, k, n, pk, pn, b_start)
+        product_ = _strassen(_pad(a, m, k, pm, pk, a_start), padded_b[b_start], pm, pk, pn, crossover)
+        for i in range(m):
+            result.extend(product_[i * pn:i * pn + n])
+    return result, out_batch_shape + (m, n)
+
+
+def _key_limits(lengths, batch_shape, n):
+    # valid keys of every batch entry; ``lengths`` has one entry per index of the leading axis
+    if lengths is None:
+        return repeat(n)
+    if not batch_shape or len(lengths) != batch_shape[0]:
+        raise ValueError("Expected one length per sequence of a batch of shape {}, got {}.".format(batch_shape, len(lengths)))
+    inner = 1
+    for dim in batch_shape[1:]:
+        inner *= dim
+    return [min(n, max(0, length)) for length in lengths for _ in range(inner)]
+
+
+def _bias_layout(bias_shape, batch_shape, m, n):
+    # batch offsets and row stride of an additive (..., m, n) or (..., 1, n) bias
+    if bias_shape[-1] != n or bias_shape[-2] not in (1, m) or broadcast_shapes(batch_shape, bias_shape[:-2]) != batch_shape:
+        raise ValueError("Bias of shape {} does not broadcast to {}.".format(bias_shape, tuple(batch_shape) + (m, n)))
+    offsets = _batch_offsets(bias_shape[:-2], contiguous_strides(bias_shape)[:-2], batch_shape)
+    return offsets, (0 if bias_shape[-2] == 1 else n)
+
+
+def softmax(a, shape, causal=False, start=None, lengths=None, bias=None, bias_shape=None, log=False, out=None,
+            out_offset=0):
+    """
+    Softmax, or log-softmax, over the last axis with the masks applied on the fly.
+
+    Causal and key-padding masks both keep a prefix of every row, so only
+    that prefix is read, exponentiated and normalized; the rest is filled
+    with 0 (log: -inf). An additive bias is added while the row is read.
+    Neither a mask nor a masked copy of ``a`` is ever built. Rows without a
+    valid position are all 0 (log: -inf).
+
+    Args:
+        a (array): Flat scores of shape (..., m, n).
+        shape (tuple): Shape of ``a``.
+        causal (bool, optional): Row ``i`` keeps columns ``j <= i + start``.
+        start (int, optional): Column of the first row's own position under
+            ``causal``. Defaults to ``n - m``, i.e. the rows are the last
+            ``m`` positions.
+        lengths (sequence, optional): Valid columns per entry of the leading
+            axis, e.g. the unpadded length of every sequence of a batch.
+        bias (array, optional): Flat additive bias of shape (..., m, n) or
+            (..., 1, n), broadcast over the leading dimensions.
+        bias_shape (tuple, optional): Shape of ``bias``.
+        log (bool, optional): Return log-probabilities.
+        out (array, optional): Buffer receiving the result; may be ``a``.
+        out_offset (int, optional): Index in ``out`` of the first result.
+
+    Returns:
+        array: The flat result, or ``out``.
+    """
+    m, n = shape[-2], shape[-1]
+    batch_shape = tuple(shape[:-2])
+    limits = _key_limits(lengths, batch_shape, n)
+    shift = n - m if start is None else start
+    bias_offsets, bias_row = _bias_layout(bias_shape, batch_shape, m, n) if bias is not None else (repeat(0), 0)
+    if out is None:
+        out, out_offset = array(TYPECODE, bytes(8 * len(a))), 0
+    fill = -math.inf if log else 0.0
+    exp, sub, add, mul = math.exp, operator.sub, operator.add, operator.mul
+    for index, length, bias_start in zip(range(len(a) // (m * n) if m * n else 0), limits, bias_offsets):
+        base = index * m * n
+        for i in range(m):
+            limit = max(0, min(length, i + shift + 1)) if causal else length
+            first = base + i * n
+            row = a[first:first + limit]
+            if bias is not None:
+                row_bias = bias_start + i * bias_row
+                row = list(map(add, row, bias[row_bias:row_bias + limit]))
+            peak = max(row) if limit else -math.inf
+            dest = out_offset + first
+            if peak == -math.inf:
+                out[dest:dest + n] = array(TYPECODE, repeat(fill, n))
+                continue
+            shifted = list(map(sub, row, repeat(peak, limit)))
+            exps = list(map(exp, shifted))
+            total = sum(exps)
+            if log:
+                values = map(sub, shifted, repeat(math.log(total), limit))
+            else:
+                values = map(mul, exps, repeat(1.0 / total, limit))
+            out[dest:dest + limit] = array(TYPECODE, values)
+            if limit < n:
+                out[dest + limit:dest + n] = array(TYPECODE, repeat(fill, n - limit))
+    return out
+
+
+def _pack_keys(k, k_start, v, v_start, n, d, dv, block_size):
+    # per key block: its rows of K and the columns of its rows of V, so the
+    # scores and the weighted sum of values are both plain dot products
+    blocks = []
+    for b0 in range(0, n, block_size):
+        b1 = min(b0 + block_size, n)
+        k_rows = [k[k_start + j * d:k_start + (j + 1) * d] for j in range(b0, b1)]
+        v_cols = [v[v_start + b0 * dv + t:v_start + b1 * dv:dv] for t in range(dv)]
+        blocks.append((k_rows, v_cols))
+    return blocks
+
+
+def attention(q, q_shape, k, k_shape, v, v_shape, scale, causal=False, start=None, mask=None, mask_shape=None,
+              lengths=None, bias=None, bias_shape=None, block_size=ATTENTION_BLOCK_SIZE, heads_last=False):
+    """
+    Scaled dot-product attention with an online softmax over key blocks.
+
+    Every query row walks the keys one block at a time, keeping a running
+    maximum, the running sum of exponentials and the weighted sum of values,
+    and rescaling them when the maximum grows (the flash-attention
+    recurrence). No (m, n) score matrix is built: besides the output, memory
+    holds one packed copy of K and V and one block of scores.
+
+    Leading dimensions broadcast, so K and V may be shared across heads.
+    Rows whose keys are all masked produce zeros.
+
+    Args:
+        q (array): Flat queries, shape (..., m, d).
+        q_shape (tuple): Shape of ``q``.
+        k (array): Flat keys, shape (..., n, d).
+        k_shape (tuple): Shape of ``k``.
+        v (array): Flat values, shape (..., n, dv).
+        v_shape (tuple): Shape of ``v``.
+        scale (float): Factor applied to the scores.
+        causal (bool, optional): Query ``i`` only sees keys ``j <= i + start``.
+        start (int, optional): Key position of the first query under
+            ``causal``. Defaults to ``n - m``, i.e. the queries are the last
+            ``m`` positions; a preallocated cache passes its previous length
+            so the unused keys past the queries are never read.
+        mask (array, optional): Flat keep-mask of shape (..., m, n); zeros
+            block the position.
+        mask_shape (tuple, optional): Shape of ``mask``.
+        lengths (sequence, optional): Valid keys per entry of the leading
+            axis; later keys are padding and are skipped.
+        bias (array, optional): Flat additive score bias of shape (..., m, n)
+            or (..., 1, n).
+        bias_shape (tuple, optional): Shape of ``bias``.
+        block_size (int, optional): Keys per block.
+        heads_last (bool, optional): Write every output row straight to its
+            place in a (..., m, heads, dv) result, where ``heads`` is the last
+            batch dimension, i.e. the layout of the concatenated heads.
+
+    Returns:
+        tuple: The flat result buffer and its shape, (..., m, dv) or
+        (..., m, heads, dv).
+    """
+    m, d = q_shape[-2], q_shape[-1]
+    n, dv = k_shape[-2], v_shape[-1]
+    if k_shape[-1] != d or v_shape[-2] != n:
+        raise ValueError("Attention operands {}, {} and {} do not match.".format(q_shape, k_shape, v_shape))
+    if mask is not None and tuple(mask_shape[-2:]) != (m, n):
+        raise ValueError("Mask of shape {} does not match {} queries and {} keys.".format(mask_shape, m, n))
+    shapes = (q_shape, k_shape, v_shape) + (() if mask is None else (mask_shape,))
+    batch_shape = ()
+    for shape in shapes:
+        batch_shape = broadcast_shapes(batch_shape, shape[:-2])
+    offsets = [_batch_offsets(shape[:-2], contiguous_strides(shape)[:-2], batch_shape) for shape in shapes]
+    if mask is None:
+        offsets.append(repeat(0))
+    offsets.append(_key_limits(lengths, batch_shape, n))
+    offsets.append(_bias_layout(bias_shape, batch_shape, m, n)[0] if bias is not None else repeat(0))
+    bias_row = 0 if bias is None or bias_shape[-2] == 1 else n
+
+    neg_inf, exp, sub, add, mul = -math.inf, math.exp, operator.sub, operator.add, operator.mul
+    shift = n - m if start is None else start
+    # keys no query can see are never packed
+    used = max(0, min(n, shift + m)) if causal else n
+    if lengths is not None:
+        used = min(used, max(lengths, default=0))
+    heads = batch_shape[-1] if heads_last and batch_shape else 1
+    entries = 1
+    for dim in batch_shape:
+        entries *= dim
+    # fully masked rows keep their zeros
+    result = array(TYPECODE, bytes(8 * entries * m * dv))
+    packed = {}
+    for index, (q_start, k_start, v_start, mask_start, length, bias_start) in enumerate(zip(*offsets)):
+        outer, head = divmod(index, heads)
+        blocks = packed.get((k_start, v_start))
+        if blocks is None:
+            blocks = packed[k_start, v_start] = _pack_keys(k, k_start, v, v_start, used, d, dv, block_size)
+        for i in range(m):
+            row = array(TYPECODE, map(mul, q[q_start + i * d:q_start + (i + 1) * d], repeat(scale, d)))
+            limit = max(0, min(length, i + shift + 1)) if causal else length
+            peak, total, acc = neg_inf, 0.0, None
+            for b0 in range(0, limit, block_size):
+                k_rows, v_cols = blocks[b0 // block_size]
+                count = min(block_size, limit - b0)
+                if count < len(k_rows):
+                    k_rows, v_cols = k_rows[:count], [col[:count] for col in v_cols]
+                scores = [dot(row, key) for key in k_rows]
+                if bias is not None:
+                    first = bias_start + i * bias_row + b0
+                    scores = list(map(add, scores, bias[first:first + count]))
+                if mask is not None:
+                    first = mask_start + i * n + b0
+                    scores = [score if keep else neg_inf for score, keep in zip(scores, mask[first:first + count])]
+                block_peak = max(scores)
+                if block_peak == neg_inf:
+                    continue
+                if block_peak > peak:
+                    # rescale what was accumulated under the old maximum
+                    if acc is not None:
+                        alpha = exp(peak - block_peak)
+                        total *= alpha
+                        acc = list(map(mul, acc, repeat(alpha, dv)))
+                    peak = block_peak
+                weights = list(map(exp, map(sub, scores, repeat(peak, count))))
+                total += sum(weights)
+                values = [dot(weights, col) for col in v_cols]
+                acc = values if acc is None else list(map(add, acc, values))
+            if acc is not None:
+                dest = ((outer * m + i) * heads + head) * dv
+                result[dest:dest + dv] = array(TYPECODE, map(mul, acc, repeat(1.0 / total, dv)))
+    if heads_last and batch_shape:
+        return result, batch_shape[:-1] + (m, heads, dv)
+    return result, batch_shape + (m, dv)
+
+
+def sparse_attention(q, q_shape, k, k_shape, v, v_shape, scale, row_keys, start=None, n=None, heads_last=False):
+    """
+    Scaled dot-product attention over a sparse set of keys per query.
+
+    ``row_keys(position, n)`` lists the key positions query ``position``
+    may see, so only those scores are computed and the cost is the total
+    number of allowed pairs, e.g. O(seq * window) for a sliding window,
+    rather than O(seq^2). Each query's keys are read in place and its
+    softmax is exact. The key lists are computed once per query and shared
+    by every batch entry and head.
+
+    Args:
+        q (array): Flat queries, shape (..., m, d).
+        q_shape (tuple): Shape of ``q``.
+        k (array): Flat keys, shape (..., capacity, d).
+        k_shape (tuple): Shape of ``k``.
+        v (array): Flat values, shape (..., capacity, dv).
+        v_shape (tuple): Shape of ``v``.
+        scale (float): Factor applied to the scores.
+        row_keys (callable): Sorted allowed key positions of a query.
+        start (int, optional): Position of the first query among the keys.
+            Defaults to ``n - m``.
+        n (int, optional): Keys in use, e.g. the filled part of a cache.
+            Defaults to all of them.
+        heads_last (bool, optional): Return (..., m, heads, dv), see
+            ``attention``.
+
+    Returns:
+        tuple: The flat result buffer and its shape. Queries without any
+        allowed key produce zeros.
+    """
+    m, d = q_shape[-2], q_shape[-1]
+    capacity, dv = k_shape[-2], v_shape[-1]
+    if k_shape[-1] != d or v_shape[-2] != capacity:
+        raise ValueError("Attention operands {}, {} and {} do not match.".format(q_shape, k_shape, v_shape))
+    n = capacity if n is None else n
+    if not 0 <= n <= capacity:
+        raise ValueError("Cannot use {} of {} keys.".format(n, capacity))
+    shift = n - m if start is None else start
+    shapes = (q_shape, k_shape, v_shape)
+    batch_shape = ()
+    for shape in shapes:
+        batch_shape = broadcast_shapes(batch_shape, shape[:-2])
+    entries = list(zip(*[_batch_offsets(shape[:-2], contiguous_strides(shape)[:-2], batch_shape) for shape in shapes]))
+    heads = batch_shape[-1] if heads_last and batch_shape else 1
+    result = array(TYPECODE, bytes(8 * len(entries) * m * dv))
+
+    exp, sub, mul = math.exp, operator.sub, operator.mul
+    for i in range(m):
+        keys = row_keys(shift + i, n)
+        if not keys:
+            continue
+        count = len(keys)
+        for index, (q_start, k_start, v_start) in enumerate(entries):
+            row = array(TYPECODE, map(mul, q[q_start + i * d:q_start + (i + 1) * d], repeat(scale, d)))
+            scores = [dot(row, k[k_start + j * d:k_start + (j + 1) * d]) for j in keys]
+            peak = max(scores)
+            weights = list(map(exp, map(sub, scores, repeat(peak, count))))
+            norm = 1.0 / sum(weights)
+            # the value columns of the selected rows, transposed in one zip
+            columns = zip(*[v[v_start + j * dv:v_start + (j + 1) * dv] for j in keys])
+            outer, head = divmod(index, heads)
+            dest = ((outer * m + i) * heads + head) * dv
+            result[dest:dest + dv] = array(TYPECODE, [dot(weights, column) * norm for column in columns])
+    if heads_last and batch_shape:
+        return result, batch_shape[:-1] + (m, heads, dv)
+    return result, batch_shape + (m, dv)
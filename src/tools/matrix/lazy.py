@@ -0,0 +1,262 @@
+from array import array
+from contextlib import contextmanager
+from itertools import chain, repeat
+
+from .kernels import TYPECODE, UNARY_OPS, broadcast_shapes, contiguous_strides
+
+# per-element source of every fusable operator; operands are local names
+BINARY_TEMPLATES = {
+    'add': '{} + {}',
+    'sub': '{} - {}',
+    'mul': '{} * {}',
+    'truediv': '{} / {}',
+    'pow': '{} ** {}',
+    'maximum': 'max({}, {})',
+    'minimum': 'min({}, {})',
+}
+
+UNARY_TEMPLATES = {
+    'exp': 'exp({})',
+    'log': 'log({})',
+    'sqrt': 'sqrt({})',
+    'neg': '-{}',
+    'abs': 'abs({})',
+    'relu': '({0} if {0} > 0.0 else 0.0)',
+    'sigmoid': 'sigmoid({})',
+    'tanh': 'tanh({})',
+    'gelu': 'gelu({})',
+    'gelu_tanh': 'gelu_tanh({})',
+    'silu': 'silu({})',
+}
+
+_FUNCTIONS = {name: UNARY_OPS[name] for name in ('exp', 'log', 'sqrt', 'sigmoid', 'tanh', 'gelu', 'gelu_tanh', 'silu')}
+
+# compiled kernels by expression structure, so repeated graphs compile once
+_kernels = {}
+_lazy_depth = 0
+
+
+def is_lazy():
+    return _lazy_depth > 0
+
+
+@contextmanager
+def lazy():
+    """
+    Makes Matrix elementwise arithmetic build expressions inside the block.
+
+    Results are ``Expression`` objects that are evaluated, in one fused pass,
+    the first time their values are needed. Operations with ``out=`` and
+    in-place operators stay eager.
+    """
+    global _lazy_depth
+    _lazy_depth += 1
+    try:
+        yield
+    finally:
+        _lazy_depth -= 1
+
+
+def _is_scalar(x):
+    return isinstance(x, (int, float))
+
+
+def _broadcast_source(flat, shape, out_shape):
+    # values of ``flat`` in the order of ``out_shape``, streamed row by row
+    # from slices and repeated scalars instead of an expanded copy
+    if tuple(shape) == tuple(out_shape):
+        return flat
+    pad = len(out_shape) - len(shape)
+    strides = (0,) * pad + tuple(stride if dim > 1 else 0 for dim, stride in zip(shape, contiguous_strides(shape)))
+    width = out_shape[-1]
+    starts = [0]
+    for dim, stride in zip(out_shape[:-1], strides[:-1]):
+        starts = [start + i * stride for start in starts for i in range(dim)]
+    if strides[-1]:
+        return chain.from_iterable(flat[start:start + width] for start in starts)
+    return chain.from_iterable(repeat(flat[start], width) for start in starts)
+
+
+class Expression:
+    """
+    Deferred elementwise expression over Matrix operands.
+
+    Arithmetic on expressions records a small DAG instead of computing. When
+    the value is forced (``evaluate()``, or any Matrix attribute such as
+    ``data``, ``sum`` or ``matmul``) the whole DAG is compiled into one
+    per-element function and run in a single pass, so a chain of N operators
+    allocates one output instead of N temporaries. Structurally identical
+    subexpressions are computed once per element.
+
+    Args:
+        op (str): ``'leaf'`` or a key of ``BINARY_TEMPLATES`` /
+            ``UNARY_TEMPLATES``.
+        args (tuple): Child expressions, scalars, or for a leaf the Matrix.
+        shape (tuple): Shape of the result.
+    """
+
+    def __init__(self, op, args, shape):
+        self.op = op
+        self.args = args
+        self._shape = tuple(shape)
+        self._value = None
+
+    @staticmethod
+    def leaf(matrix):
+        return matrix if isinstance(matrix, Expression) else Expression('leaf', (matrix,), matrix.shape())
+
+    @staticmethod
+    def binary(op, a, b, name=None):
+        a, b = (x if _is_scalar(x) else Expression.leaf(x) for x in (a, b))
+        shapes = [x._shape for x in (a, b) if not _is_scalar(x)]
+        try:
+            shape = broadcast_shapes(*shapes) if len(shapes) == 2 else shapes[0]
+        except ValueError:
+            raise ValueError("Matrices of shape {} and {} cannot be broadcast for {}.".format(
+                shapes[0], shapes[1], name or op)) from None
+        return Expression(op, (a, b), shape)
+
+    @staticmethod
+    def unary(op, a):
+        a = Expression.leaf(a)
+        return Expression(op, (a,), a._shape)
+
+    def shape(self):
+        return self._shape
+
+    def __add__(self, other):
+        return Expression.binary('add', self, other, 'addition')
+
+    def __radd__(self, other):
+        return Expression.binary('add', other, self, 'addition')
+
+    def __sub__(self, other):
+        return Expression.binary('sub', self, other, 'subtraction')
+
+    def __truediv__(self, other):
+        return Expression.binary('truediv', self, other, 'division')
+
+    def __pow__(self, exponent):
+        return Expression.binary('pow', self, exponent, 'exponentiation')
+
+    def __mul__(self, other):
+        # same contract as Matrix: scalars scale lazily, matrices are a matmul
+        if _is_scalar(other):
+            return Expression.binary('mul', self, other, 'multiplication')
+        return self.evaluate().matmul(other.evaluate() if isinstance(other, Expression) else other)
+
+    def __rmul__(self, other):
+        return Expression.binary('mul', other, self, 'multiplication')
+
+    def __neg__(self):
+        return Expression.unary('neg', self)
+
+    def multiply(self, other):
+        return Expression.binary('mul', self, other, 'multiplication')
+
+    def maximum(self, other):
+        return Expression.binary('maximum', self, other, 'maximum')
+
+    def minimum(self, other):
+        return Expression.binary('minimum', self, other, 'minimum')
+
+    def exp(self):
+        return Expression.unary('exp', self)
+
+    def sqrt(self):
+        return Expression.unary('sqrt', self)
+
+    def relu(self):
+        return Expression.unary('relu', self)
+
+    def sigmoid(self):
+        return Expression.unary('sigmoid', self)
+
+    def tanh(self):
+        return Expression.unary('tanh', self)
+
+    def gelu(self, approximate=False):
+        return Expression.unary('gelu_tanh' if approximate else 'gelu', self)
+
+    def silu(self):
+        return Expression.unary('silu', self)
+
+    def __getattr__(self, name):
+        # anything else is a Matrix attribute: force the expression and delegate
+        if name.startswith('__') or name in ('op', 'args', '_shape', '_value'):
+            raise AttributeError(name)
+        return getattr(self.evaluate(), name)
+
+    def _compile(self):
+        """
+        Lowers the DAG to straight-line code with one local per distinct node.
+
+        Returns:
+            tuple: ``(source, leaves, constants)`` where ``leaves`` are the
+            input matrices and ``constants`` the distinct scalar operands, in
+            the order the generated function expects them.
+        """
+        names, memo = {}, {}
+        leaves, constants, lines = [], [], []
+
+        def visit(node):
+            if _is_scalar(node):
+                key = ('const', float(node))
+                if key not in names:
+                    constants.append(float(node))
+                    names[key] = 'c{}'.format(len(constants) - 1)
+                return names[key]
+            if id(node) in memo:
+                return memo[id(node)]
+            memo[id(node)] = name = visit_node(node)
+            return name
+
+        def visit_node(node):
+            if node.op == 'leaf' or node._value is not None:
+                matrix = node._value if node._value is not None else node.args[0]
+                key = ('leaf', id(matrix))
+                if key not in names:
+                    leaves.append(matrix)
+                    names[key] = 'v{}'.format(len(leaves) - 1)
+                return names[key]
+            # structurally equal nodes map to the same key, and so to one local
+            key = (node.op,) + tuple(visit(arg) for arg in node.args)
+            operands = key[1:]
+            if key not in names:
+                template = BINARY_TEMPLATES.get(node.op) or UNARY_TEMPLATES[node.op]
+                names[key] = 't{}'.format(len(lines))
+                lines.append('    {} = {}'.format(names[key], template.format(*operands)))
+            return names[key]
+
+        result = visit(self)
+        body = '\n'.join(lines) if lines else ''
+        source = 'def fused({}):\n{}\n    return {}'.format(', '.join('v{}'.format(i) for i in range(len(leaves))), body, result)
+        return source, leaves, constants
+
+    def evaluate(self):
+        """
+        Computes the expression in one fused pass and caches the result.
+
+        Returns:
+            Matrix: The value of the expression.
+        """
+        if self._value is not None:
+            return self._value
+        if self.op == 'leaf':
+            return self.args[0]
+        from .matrix import Matrix
+
+        source, leaves, constants = self._compile()
+        factory = _kernels.get((source, len(constants)))
+        if factory is None:
+            params = ', '.join('c{}'.format(i) for i in range(len(constants)))
+            namespace = dict(_FUNCTIONS)
+            exec('def make({}):\n{}\n    return fused'.format(
+                params, '\n'.join('    ' + line for line in source.split('\n'))), namespace)
+            factory = _kernels[source, len(constants)] = namespace['make']
+        fused = factory(*constants)
+        sources = [_broadcast_source(leaf._flat(), leaf.shape(), self._shape) for leaf in leaves]
+        self._value = Matrix.from_buffer(array(TYPECODE, map(fused, *sources)), self._shape)
+        # drop the graph so inputs can be freed; later uses read the cached value
+        self.args = ()
+        return self._value
@@ -1,82 +1,665 @@
+from array import array
+
+from .backend import get_backend
+from .dtypes import DEFAULT_DTYPE, STORAGE, check_dtype, decode, encode
+from .kernels import (TYPECODE, broadcast_shapes, contiguous_strides, gather, is_contiguous, normalize_axis,
+                      strassen_matmul)
+from .lazy import Expression, is_lazy
+from .rng import default_generator
+
+# activations a fused linear layer can apply
+ACTIVATIONS = ('relu', 'sigmoid', 'tanh', 'gelu', 'gelu_tanh', 'silu')
+
+
 class Matrix:
+    """
+    Batched matrix backed by a single contiguous buffer.
+
+    Values live in one flat ``array('d')`` together with a shape and element
+    strides, so a (batch_size, rows, cols) matrix costs 8 bytes per element.
+    The nested-list ``data`` attribute is still available as a read-only
+    compatibility accessor.
+
+    ``transpose``, ``reshape`` and the slicing helpers in ``MatrixUtils``
+    return strided views that share the parent's buffer. Shared buffers are
+    copy-on-write: whichever matrix is written to first takes a private copy.
+    """
+
     def __init__(self, data):
         if isinstance(data[0][0], list):
-            self.data = data
-            self.batch_size = len(data)
-            self.rows = len(data[0])
-            self.cols = len(data[0][0])
+            shape = (len(data), len(data[0]), len(data[0][0]))
+            values = [val for batch in data for row in batch for val in row]
         else:
-            self.data = [data]
-            self.batch_size = 1
-            self.rows = len(data)
-            self.cols = len(data[0])
+            shape = (1, len(data), len(data[0]))
+            values = [val for row in data for val in row]
+        if len(values) != shape[0] * shape[1] * shape[2]:
+            raise ValueError("All rows must have the same number of columns.")
+        self._set_buffer(array(TYPECODE, values), shape)
 
-    def strassen_multiply(self, other):
-        # Check if matrices have compatible dimensions for Strassen's algorithm
-        if self.rows != other.rows or self.cols != other.cols or self.rows != self.cols or self.rows % 2 != 0:
-            raise ValueError("Matrices must be square and have dimensions that are a power of 2 for Strassen's algorithm.")
+    def _set_buffer(self, buffer, shape, strides=None, offset=0, dtype=DEFAULT_DTYPE):
+        self._buffer = buffer
+        self.dtype = dtype
+        self._shape = tuple(shape)
+        self._strides = tuple(strides) if strides is not None else contiguous_strides(self._shape)
+        self._offset = offset
+        self._shared = False
+
+    @classmethod
+    def from_buffer(cls, buffer, shape, strides=None, offset=0, dtype=DEFAULT_DTYPE):
+        """
+        Wraps an existing flat buffer without copying it.
+
+        Args:
+            buffer (array): Flat buffer holding the values, ``array('d')`` for
+                the default float64 dtype.
+            shape (tuple): Logical shape, e.g. (batch_size, rows, cols).
+            strides (tuple, optional): Element strides. Defaults to row-major.
+            offset (int, optional): Index of the first element in ``buffer``.
+            dtype (str, optional): Storage dtype of ``buffer``; see
+                ``tools.matrix.dtypes``.
+
+        Returns:
+            Matrix: A matrix sharing ``buffer``.
+        """
+        matrix = cls.__new__(cls)
+        matrix._set_buffer(buffer, shape, strides, offset, dtype)
+        return matrix
+
+    @property
+    def batch_size(self):
+        size = 1
+        for dim in self._shape[:-2]:
+            size *= dim
+        return size
+
+    @property
+    def rows(self):
+        return self._shape[-2]
+
+    @property
+    def cols(self):
+        return self._shape[-1]
+
+    @property
+    def size(self):
+        return self.batch_size * self.rows * self.cols
+
+    @property
+    def strides(self):
+        return self._strides
+
+    @property
+    def itemsize(self):
+        return self._buffer.itemsize
+
+    @property
+    def nbytes(self):
+        return self.size * self.itemsize
+
+    @property
+    def data(self):
+        # nested list copy in data[b][i][j] layout, kept for older callers
+        flat = self._flat()
+        nested = [flat[i:i + self.cols].tolist() for i in range(0, len(flat), self.cols)]
+        for dim in reversed(self._shape[:-1]):
+            nested = [nested[i:i + dim] for i in range(0, len(nested), dim)]
+        return nested[0]
 
-        THRESHOLD = (128,128)
-        if self.rows <= THRESHOLD:
-            return self._naive_multiply(other)
-            return self._naive_multiply(other)
+    def _raw(self):
+        # contiguous run of the stored values in row-major order, still in the storage dtype
+        if not self.is_contiguous():
+            return gather(self._buffer, self._shape, self._strides, self._offset)
+        if self._offset == 0 and len(self._buffer) == self.size:
+            return self._buffer
+        return self._buffer[self._offset:self._offset + self.size]
 
-        a11, a12, a21, a22 = self.divide_submatrices()
-        b11, b12, b21, b22 = other.divide_submatrices()
+    def _flat(self):
+        # contiguous float64 values in row-major order; compact dtypes are
+        # expanded here, so every kernel computes and accumulates in float64
+        raw = self._raw()
+        return raw if self.dtype == DEFAULT_DTYPE else decode(raw, self.dtype)
 
-        m1 = (a11 + a22) * (b11 + b22)
-        m2 = (a21 + a22) * b11
-        m3 = a11 * (b12 - b22)
-        m4 = a21 * (b11 - b12)
-        m5 = (a11 + a12) * b22
-        m6 = (a21 + a22) * b21
-        m7 = (a11 + a12) * (b11 + b12)
+    def _copy_raw(self):
+        return array(STORAGE[self.dtype], self._raw())
 
-        c11 = m1 + m4 - m5 + m7
-        c12 = m3 + m5
-        c21 = m2 + m4
-        c22 = m1 + m3 - m2 + m6
+    def is_contiguous(self):
+        return is_contiguous(self._shape, self._strides)
 
-        return self.combine_submatrices(c11, c12, c21, c22)
+    def contiguous(self):
+        """
+        Returns a matrix with its own row-major buffer.
+
+        Contiguous matrices that do not share their buffer are returned as is;
+        views are materialized.
+        """
+        if self.is_contiguous() and not self._shared and self._offset == 0 and len(self._buffer) == self.size:
+            return self
+        return Matrix.from_buffer(self._copy_raw(), self._shape, dtype=self.dtype)
+
+    def _view(self, shape, strides, offset):
+        view = Matrix.from_buffer(self._buffer, shape, strides, offset, self.dtype)
+        view._shared = self._shared = True
+        return view
+
+    def _ensure_writable(self):
+        # copy-on-write: take a private contiguous buffer before the first write to shared storage
+        if self._shared or not self.is_contiguous():
+            self._set_buffer(self._copy_raw(), self._shape, dtype=self.dtype)
+
+    def reshape(self, *shape):
+        """
+        Returns a matrix with the same values and a new shape.
+
+        Contiguous matrices are reshaped as a view; strided views are
+        materialized first. One dimension may be -1 and is inferred.
+
+        Args:
+            *shape (int): The new shape, or a single tuple holding it.
+
+        Returns:
+            Matrix: The reshaped matrix.
+        """
+        if len(shape) == 1 and isinstance(shape[0], (tuple, list)):
+            shape = tuple(shape[0])
+        known = 1
+        for dim in shape:
+            if dim != -1:
+                known *= dim
+        if -1 in shape:
+            if shape.count(-1) > 1 or known == 0 or self.size % known:
+                raise ValueError("Cannot reshape matrix of shape {} to {}.".format(self._shape, shape))
+            shape = tuple(self.size // known if dim == -1 else dim for dim in shape)
+        elif known != self.size:
+            raise ValueError("Cannot reshape matrix of shape {} to {}.".format(self._shape, shape))
+        shape = (1,) * (2 - len(shape)) + tuple(shape)
+        if self.is_contiguous():
+            return self._view(shape, contiguous_strides(shape), self._offset)
+        return Matrix.from_buffer(self._copy_raw(), shape, dtype=self.dtype)
+
+    def strassen_multiply(self, other):
+        """
+        Multiplies two matrices with Strassen's algorithm.
+
+        Shapes that are not a power of two are zero-padded, and sub-products at
+        or below the calibrated crossover are handed to the blocked kernel.
+
+        Args:
+            other (Matrix): Right-hand operand with ``rows == self.cols``.
+
+        Returns:
+            Matrix: The product, batched like ``self * other``.
+        """
+        if self.cols != other.rows:
+            raise ValueError("Matrices must have appropriate dimensions for multiplication.")
+        result, shape = strassen_matmul(self._flat(), self._shape, other._flat(), other._shape)
+        return Matrix.from_buffer(result, shape)
 
     def __repr__(self):
         return '\n'.join(['\n'.join([' '.join(map(str, row)) for row in batch]) for batch in self.data])
 
+    def _operand(self, other, name):
+        if isinstance(other, (int, float)):
+            return other
+        if self._shape != other._shape:
+            raise ValueError("Matrices must have the same dimensions and batch size for {}.".format(name))
+        return other._flat()
+
+    def _destination(self, out, shape=None):
+        # buffer and offset that receive a result written in place
+        if out is None:
+            return None, 0
+        shape = self._shape if shape is None else shape
+        if out._shape != shape:
+            raise ValueError("Output matrix must have shape {}, got {}.".format(shape, out._shape))
+        out._ensure_writable()
+        if out.dtype != DEFAULT_DTYPE:
+            # compute into a float64 temporary; _result converts it into ``out``
+            return None, 0
+        return out._buffer, out._offset
+
+    def _result(self, result, out, shape=None):
+        if out is None:
+            return Matrix.from_buffer(result, self._shape if shape is None else shape)
+        if out.dtype != DEFAULT_DTYPE:
+            out._buffer[out._offset:out._offset + out.size] = encode(result, out.dtype)
+        return out
+
+    def _elementwise(self, op, other, name, out=None):
+        if isinstance(other, Expression):
+            if out is None:
+                return Expression.binary(op, self, other, name)
+            other = other.evaluate()
+        elif out is None and is_lazy():
+            return Expression.binary(op, self, other, name)
+        if isinstance(other, (int, float)) or other._shape == self._shape:
+            a, b = self._flat(), self._operand(other, name)
+            buffer, offset = self._destination(out)
+            return self._result(get_backend().elementwise(op, a, b, buffer, offset), out)
+        try:
+            shape = broadcast_shapes(self._shape, other._shape)
+        except ValueError:
+            raise ValueError("Matrices of shape {} and {} cannot be broadcast for {}.".format(
+                self._shape, other._shape, name)) from None
+        a, b = self._flat(), other._flat()
+        buffer, offset = self._destination(out, shape)
+        result = get_backend().broadcast_elementwise(op, a, self._shape, b, other._shape, buffer, offset)
+        return self._result(result, out, shape)
+
     def __add__(self, other):
-        if self.batch_size != other.batch_size or self.rows != other.rows or self.cols != other.cols:
-            raise ValueError("Matrices must have the same dimensions and batch size for addition.")
-        result = [[[self.data[b][i][j] + other.data[b][i][j] for j in range(self.cols)] for i in range(self.rows)] for b in range(self.batch_size)]
-        return Matrix(result)
+        return self._elementwise('add', other, 'addition')
 
     def __sub__(self, other):
-        if self.batch_size != other.batch_size or self.rows != other.rows or self.cols != other.cols:
-            raise ValueError("Matrices must have the same dimensions and batch size for subtraction.")
-        result = [[[self.data[b][i][j] - other.data[b][i][j] for j in range(self.cols)] for i in range(self.rows)] for b in range(self.batch_size)]
-        return Matrix(result)
+        return self._elementwise('sub', other, 'subtraction')
+
+    def __truediv__(self, other):
+        return self._elementwise('truediv', other, 'division')
+
+    def __pow__(self, exponent):
+        return self._elementwise('pow', exponent, 'exponentiation')
 
     def __mul__(self, other):
+        if isinstance(other, (int, float)):
+            return self._elementwise('mul', other, 'multiplication')
+        return self.matmul(other)
+
+    def multiply(self, other, out=None):
+        """
+        Elementwise (Hadamard) product with broadcasting; ``*`` is the matrix product.
+        """
+        return self._elementwise('mul', other, 'multiplication', out)
+
+    def maximum(self, other, out=None):
+        return self._elementwise('maximum', other, 'maximum', out)
+
+    def minimum(self, other, out=None):
+        return self._elementwise('minimum', other, 'minimum', out)
+
+    def __radd__(self, other):
+        return self._elementwise('add', other, 'addition')
+
+    def __rmul__(self, other):
+        # scalar on the left: elementwise scaling
+        return self._elementwise('mul', other, 'multiplication')
+
+    def _reflected(self, op, other, name):
+        # scalar on the left of a non-commutative op: a one-element operand
+        # broadcast over self, so no full-size copy of the scalar is built
+        if not isinstance(other, (int, float)):
+            return NotImplemented
+        return Matrix.from_buffer(array(TYPECODE, [other]), (1, 1))._elementwise(op, self, name)
+
+    def __rsub__(self, other):
+        return self._reflected('sub', other, 'subtraction')
+
+    def __rtruediv__(self, other):
+        return self._reflected('truediv', other, 'division')
+
+    def __rpow__(self, other):
+        return self._reflected('pow', other, 'exponentiation')
+
+    def __neg__(self):
+        return self._elementwise('mul', -1.0, 'negation')
+
+    def __iadd__(self, other):
+        return self._elementwise('add', other, 'addition', out=self)
+
+    def __isub__(self, other):
+        return self._elementwise('sub', other, 'subtraction', out=self)
+
+    def __imul__(self, other):
+        if not isinstance(other, (int, float)):
+            # a matrix product changes the shape, so it cannot run in place
+            return NotImplemented
+        return self._elementwise('mul', other, 'multiplication', out=self)
+
+    def __itruediv__(self, other):
+        return self._elementwise('truediv', other, 'division', out=self)
+
+    @staticmethod
+    def axpy(alpha, x, y, out=None):
+        """
+        Computes ``alpha * x + y`` in one pass.
+
+        Args:
+            alpha (float): Scale applied to ``x``.
+            x (Matrix): Scaled operand.
+            y (Matrix): Added operand, same shape as ``x``.
+            out (Matrix, optional): Destination; may be ``x`` or ``y``.
+
+        Returns:
+            Matrix: ``out``, or a new matrix when ``out`` is None.
+        """
+        operands = x._flat(), x._operand(y, 'axpy')
+        buffer, offset = x._destination(out)
+        return x._result(get_backend().axpy(alpha, *operands, out=buffer, out_offset=offset), out)
+
+    @staticmethod
+    def addcmul(t, value, t1, t2, out=None):
+        """
+        Computes ``t + value * t1 * t2`` elementwise in one pass.
+
+        Args:
+            t (Matrix): Accumulator.
+            value (float): Scale applied to the product.
+            t1 (Matrix): First factor.
+            t2 (Matrix): Second factor.
+            out (Matrix, optional): Destination; may alias any operand.
+
+        Returns:
+            Matrix: ``out``, or a new matrix when ``out`` is None.
+        """
+        operands = t._flat(), t._operand(t1, 'addcmul'), t._operand(t2, 'addcmul')
+        buffer, offset = t._destination(out)
+        return t._result(get_backend().addcmul(operands[0], value, *operands[1:], out=buffer, out_offset=offset), out)
+
+    @staticmethod
+    def addcdiv(t, value, t1, t2, out=None):
+        """
+        Computes ``t + value * t1 / t2`` elementwise in one pass.
+
+        Args:
+            t (Matrix): Accumulator.
+            value (float): Scale applied to the quotient.
+            t1 (Matrix): Numerator.
+            t2 (Matrix): Denominator.
+            out (Matrix, optional): Destination; may alias any operand.
+
+        Returns:
+            Matrix: ``out``, or a new matrix when ``out`` is None.
+        """
+        operands = t._flat(), t._operand(t1, 'addcdiv'), t._operand(t2, 'addcdiv')
+        buffer, offset = t._destination(out)
+        return t._result(get_backend().addcdiv(operands[0], value, *operands[1:], out=buffer, out_offset=offset), out)
+
+    def astype(self, dtype):
+        """
+        Returns a copy stored in ``dtype``.
+
+        Args:
+            dtype (str): One of 'float64', 'float32', 'float16', 'bfloat16' or
+                'int8'. int8 rounds and saturates; arithmetic on any dtype
+                computes in float64 and returns float64.
+
+        Returns:
+            Matrix: The converted matrix with its own buffer.
+        """
+        return Matrix.from_buffer(encode(self._flat(), check_dtype(dtype)), self._shape, dtype=dtype)
+
+    def lazy(self):
+        """
+        Starts a deferred expression on this matrix.
+
+        Elementwise arithmetic on the result builds an ``Expression`` that is
+        evaluated in one fused pass when forced; see ``tools.matrix.lazy``.
+        """
+        return Expression.leaf(self)
+
+    def matmul(self, other):
+        """
+        Batched matrix product through the active backend.
+
+        Leading dimensions broadcast, so a 2D weight applies to every batch.
+
+        Args:
+            other (Matrix): Right-hand operand with ``rows == self.cols``.
+
+        Returns:
+            Matrix: The product with shape (..., self.rows, other.cols).
+        """
         if self.cols != other.rows:
             raise ValueError("Matrices must have appropriate dimensions for multiplication.")
-        result = [[[sum(self.data[b][i][k] * other.data[b][k][j] for k in range(self.cols)) for j in range(other.cols)] for i in range(self.rows)] for b in range(self.batch_size)]
-        return Matrix(result)
+        a, a_strides, a_offset = self._matmul_operand(columns_ok=False)
+        b, b_strides, b_offset = other._matmul_operand(columns_ok=True)
+        result, shape = get_backend().matmul(a, self._shape, b, other._shape, a_strides=a_strides, a_offset=a_offset,
+                                             b_strides=b_strides, b_offset=b_offset)
+        return Matrix.from_buffer(result, shape)
+
+    def linear(self, weight, bias=None, activation=None):
+        """
+        Fused ``activation(self @ weight + bias)``.
+
+        Bias and activation are applied to each output row as the matmul
+        writes it, so the layer allocates only its result instead of one
+        intermediate per step.
+
+        Args:
+            weight (Matrix): Weight of shape (..., in, out).
+            bias (Matrix, optional): Bias with ``out`` elements, e.g. (1, out).
+            activation (str, optional): 'relu', 'sigmoid', 'tanh', 'gelu',
+                'gelu_tanh' or 'silu'.
+
+        Returns:
+            Matrix: The result with shape (..., self.rows, out).
+        """
+        if self.cols != weight.rows:
+            raise ValueError("Matrices must have appropriate dimensions for multiplication.")
+        if bias is not None and bias.size != weight.cols:
+            raise ValueError("Bias of shape {} does not match {} output features.".format(bias.shape(), weight.cols))
+        if activation is not None and activation not in ACTIVATIONS:
+            raise ValueError("Unknown activation '{}'; expected one of {}.".format(activation, ACTIVATIONS))
+        a, a_strides, a_offset = self._matmul_operand(columns_ok=False)
+        b, b_strides, b_offset = weight._matmul_operand(columns_ok=True)
+        result, shape = get_backend().linear(a, self._shape, b, weight._shape, None if bias is None else bias._flat(),
+                                             activation, a_strides=a_strides, a_offset=a_offset,
+                                             b_strides=b_strides, b_offset=b_offset)
+        return Matrix.from_buffer(result, shape)
+
+    def _matmul_operand(self, columns_ok):
+        # views whose rows (or, for B, columns) are contiguous go to the kernel without a copy
+        if self.dtype != DEFAULT_DTYPE:
+            return self._flat(), None, 0
+        if self.is_contiguous() or self._strides[-1] == 1 or (columns_ok and self._strides[-2] == 1):
+            return self._buffer, self._strides, self._offset
+        return self._flat(), None, 0
+
+    def _unary(self, op, out=None, alpha=None):
+        if out is None and alpha is None and is_lazy():
+            return Expression.unary(op, self)
+        a = self._flat()
+        buffer, offset = self._destination(out)
+        return self._result(get_backend().unary(op, a, buffer, offset, alpha), out)
+
+    def exp(self, out=None):
+        return self._unary('exp', out)
+
+    def sqrt(self, out=None):
+        return self._unary('sqrt', out)
+
+    def abs(self, out=None):
+        return self._unary('abs', out)
+
+    def relu(self, out=None):
+        """
+        Applies ReLU in one pass over the buffer.
+
+        Every activation takes ``out``; ``out=self`` overwrites the matrix in
+        place instead of allocating the result.
 
-    def transpose(self):
-        result = [[[self.data[b][j][i] for j in range(self.rows)] for i in range(self.cols)] for b in range(self.batch_size)]
-        return Matrix(result)
+        Args:
+            out (Matrix, optional): Matrix of the same shape receiving the result.
+
+        Returns:
+            Matrix: The activated matrix, or ``out``.
+        """
+        return self._unary('relu', out)
+
+    def sigmoid(self, out=None):
+        # 1 / (1 + exp(-x)), split by sign so large magnitudes do not overflow
+        return self._unary('sigmoid', out)
+
+    def tanh(self, out=None):
+        return self._unary('tanh', out)
+
+    def gelu(self, approximate=False, out=None):
+        # x * Phi(x); ``approximate=True`` uses the tanh form
+        return self._unary('gelu_tanh' if approximate else 'gelu', out)
+
+    def silu(self, out=None):
+        # x * sigmoid(x), also known as swish
+        return self._unary('silu', out)
+
+    def leaky_relu(self, alpha=0.01, out=None):
+        return self._unary('leaky_relu', out, alpha)
+
+    def elu(self, alpha=1.0, out=None):
+        return self._unary('elu', out, alpha)
+
+    def layer_norm(self, gamma=None, beta=None, epsilon=1e-5, out=None):
+        """
+        Normalizes every row over the last axis, then scales and shifts it.
+
+        One fused kernel computes each row's mean and variance and writes
+        ``(x - mean) / sqrt(var + epsilon) * gamma + beta`` directly, without
+        intermediate matrices.
+
+        Args:
+            gamma (Matrix, optional): Scale with one value per column.
+            beta (Matrix, optional): Shift with one value per column.
+            epsilon (float, optional): Added to the variance.
+            out (Matrix, optional): Matrix receiving the result; ``out=self``
+                normalizes in place.
+
+        Returns:
+            Matrix: The normalized matrix, or ``out``.
+        """
+        return self._norm(gamma, beta, epsilon, False, out)
+
+    def rms_norm(self, gamma=None, beta=None, epsilon=1e-5, out=None):
+        # x / sqrt(mean(x^2) + epsilon) * gamma (+ beta) per row, without centering; see layer_norm
+        return self._norm(gamma, beta, epsilon, True, out)
+
+    def _norm(self, gamma, beta, epsilon, rms, out):
+        for name, param in (('gamma', gamma), ('beta', beta)):
+            if param is not None and param.size != self.cols:
+                raise ValueError("{} of shape {} does not match {} features.".format(name, param.shape(), self.cols))
+        a = self._flat()
+        buffer, offset = self._destination(out)
+        result = get_backend().norm(a, self.cols, None if gamma is None else gamma._flat(),
+                                    None if beta is None else beta._flat(), epsilon, rms, buffer, offset)
+        return self._result(result, out)
+
+    def _reduce(self, op, axis, keepdims):
+        result, shape = get_backend().reduce(op, self._flat(), self._shape, axis, keepdims)
+        if axis is None and not keepdims:
+            return result[0]
+        return Matrix.from_buffer(result, shape)
+
+    def sum(self, axis=None, keepdims=False):
+        """
+        Sums the elements of the matrix.
+
+        All reductions share this signature and run through the active
+        backend in one sweep over the buffer.
+
+        Args:
+            axis (int, optional): Axis to reduce; negative values count from the
+                end. ``None`` sums every element.
+            keepdims (bool, optional): Keep the reduced axis with size 1.
+
+        Returns:
+            float or Matrix: A float when ``axis`` is ``None`` and ``keepdims``
+            is False, otherwise the reduced Matrix.
+        """
+        return self._reduce('sum', axis, keepdims)
+
+    def mean(self, axis=None, keepdims=False):
+        return self._reduce('mean', axis, keepdims)
+
+    def max(self, axis=None, keepdims=False):
+        return self._reduce('max', axis, keepdims)
+
+    def min(self, axis=None, keepdims=False):
+        return self._reduce('min', axis, keepdims)
+
+    def argmax(self, axis=None, keepdims=False):
+        # index of the first maximum along ``axis`` (of the flat buffer when None), as a float
+        return self._reduce('argmax', axis, keepdims)
+
+    def var(self, axis=None, keepdims=False):
+        # population variance
+        return self._reduce('var', axis, keepdims)
+
+    def logsumexp(self, axis=None, keepdims=False):
+        # log(sum(exp(x))) computed around the maximum, so large values do not overflow
+        return self._reduce('logsumexp', axis, keepdims)
+
+    def transpose(self, *axes):
+        """
+        Returns a transposed view sharing this matrix's buffer.
+
+        Args:
+            *axes: Nothing to swap the last two axes, two ints naming the axes
+                to swap, or a full permutation as a single tuple.
+
+        Returns:
+            Matrix: A strided view with permuted axes.
+        """
+        ndim = len(self._shape)
+        if not axes:
+            axes = (-2, -1)
+        if len(axes) == 2 and not isinstance(axes[0], (tuple, list)):
+            first, second = normalize_axis(axes[0], ndim), normalize_axis(axes[1], ndim)
+            order = list(range(ndim))
+            order[first], order[second] = second, first
+        else:
+            order = [normalize_axis(axis, ndim) for axis in (axes[0] if len(axes) == 1 else axes)]
+            if sorted(order) != list(range(ndim)):
+                raise ValueError("Axes {} are not a permutation of {} dimensions.".format(axes, ndim))
+        return self._view(tuple(self._shape[axis] for axis in order),
+                          tuple(self._strides[axis] for axis in order), self._offset)
+
+    def unbind(self):
+        """
+        Splits the matrix along its first axis into views.
+
+        Used to take the query, key and value parts of a packed projection
+        without copying them. Views of a contiguous matrix stay contiguous.
+
+        Returns:
+            list: One Matrix per index of the first axis, each with that axis
+            removed.
+        """
+        if len(self._shape) < 3:
+            raise ValueError("Cannot unbind a matrix of shape {}.".format(self._shape))
+        shape, strides = self._shape[1:], self._strides[1:]
+        return [self._view(shape, strides, self._offset + index * self._strides[0]) for index in range(self._shape[0])]
 
     @staticmethod
     def identity(size, batch_size=1):
-        return Matrix([[[1 if i == j else 0 for j in range(size)] for i in range(size)] for _ in range(batch_size)])
+        result = array(TYPECODE, bytes(8 * batch_size * size * size))
+        for b in range(batch_size):
+            result[b * size * size:(b + 1) * size * size:size + 1] = array(TYPECODE, [1.0] * size)
+        return Matrix.from_buffer(result, (batch_size, size, size))
 
     @staticmethod
     def zeros(rows, cols, batch_size=1):
-        return Matrix([[[0 for _ in range(cols)] for _ in range(rows)] for _ in range(batch_size)])
+        return Matrix.from_buffer(array(TYPECODE, bytes(8 * batch_size * rows * cols)), (batch_size, rows, cols))
+
+    @staticmethod
+    def random(rows, cols, batch_size=1, low=0.0, high=1.0, generator=None):
+        """
+        Uniform random matrix filled in one bulk draw.
+
+        Args:
+            generator (Generator, optional): Stream to draw from; defaults to
+                the generator set by ``manual_seed``.
+        """
+        values = (generator or default_generator()).uniform(batch_size * rows * cols, low, high)
+        return Matrix.from_buffer(values, (batch_size, rows, cols))
+
+    @staticmethod
+    def zeros_like(matrix):
+        return Matrix.from_buffer(array(TYPECODE, bytes(8 * matrix.size)), matrix.shape())
+
+    @staticmethod
+    def ones_like(matrix):
+        return Matrix.from_buffer(array(TYPECODE, [1.0]) * matrix.size, matrix.shape())
 
     @staticmethod
     def from_flat_list(flat_list, rows, cols, batch_size=1):
         if len(flat_list) != batch_size * rows * cols:
             raise ValueError("The number of elements does not match the specified dimensions.")
-        return Matrix([flat_list[b * rows * cols:(b + 1) * rows * cols].reshape((rows, cols)) for b in range(batch_size)])
+        return Matrix.from_buffer(array(TYPECODE, flat_list), (batch_size, rows, cols))
 
     def shape(self):
         """
@@ -85,4 +668,4 @@ class Matrix:
         Returns:
             tuple: The shape of the matrix as (batch_size, rows, cols).
         """
-        return (self.batch_size, self.rows, self.cols)
+        return self._shape
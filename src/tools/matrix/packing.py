@@ -0,0 +1,112 @@
+from array import array
+
+from .attention import AttentionPattern
+from .kernels import TYPECODE
+from .matrix import Matrix
+
+
+class PackedSequence:
+    """
+    Variable-length sequences packed into one run of tokens, without padding.
+
+    The tokens of every sequence are concatenated into a (1, total, features)
+    matrix and ``cu_seqlens`` holds the cumulative offsets ``[0, l1, l1 + l2,
+    ...]``, so sequence ``b`` is rows ``cu_seqlens[b]:cu_seqlens[b + 1]``.
+    Row-wise layers (linear, feed-forward, normalization) run on the tokens
+    as they are, and attention is restricted to each sequence through
+    ``attention_pattern``, so no work is spent on pad tokens.
+
+    Args:
+        tokens (Matrix): Packed tokens of shape (1, total, features).
+        cu_seqlens (sequence): Cumulative sequence offsets, ending at
+            ``total``.
+    """
+
+    def __init__(self, tokens, cu_seqlens):
+        cu_seqlens = list(cu_seqlens)
+        if tokens.batch_size != 1 or len(tokens.shape()) != 3:
+            raise ValueError("Packed tokens must have shape (1, total, features), got {}.".format(tokens.shape()))
+        if not cu_seqlens or cu_seqlens[0] != 0 or cu_seqlens[-1] != tokens.rows or \
+                any(a > b for a, b in zip(cu_seqlens, cu_seqlens[1:])):
+            raise ValueError("Offsets {} do not split {} tokens.".format(cu_seqlens, tokens.rows))
+        self.tokens = tokens
+        self.cu_seqlens = cu_seqlens
+
+    @staticmethod
+    def pack(sequences):
+        # concatenates (length, features) matrices, one per sequence, into a PackedSequence
+        cu_seqlens = [0]
+        for sequence in sequences:
+            cu_seqlens.append(cu_seqlens[-1] + sequence.rows)
+        features = sequences[0].cols
+        if any(sequence.cols != features or sequence.batch_size != 1 for sequence in sequences):
+            raise ValueError("Sequences must be single matrices with the same number of features.")
+        values = array(TYPECODE)
+        for sequence in sequences:
+            values.extend(sequence._flat())
+        return PackedSequence(Matrix.from_buffer(values, (1, cu_seqlens[-1], features)), cu_seqlens)
+
+    @staticmethod
+    def from_padded(x, lengths):
+        """
+        Packs the real tokens of a padded (batch, seq, features) matrix.
+
+        Args:
+            x (Matrix): Padded batch.
+            lengths (sequence): Real length of every sequence.
+
+        Returns:
+            PackedSequence: The tokens without the padding.
+        """
+        batch, seq, features = x.shape()
+        if len(lengths) != batch or any(not 0 <= length <= seq for length in lengths):
+            raise ValueError("Expected {} lengths of at most {}, got {}.".format(batch, seq, lengths))
+        flat = x._flat()
+        values = array(TYPECODE)
+        cu_seqlens = [0]
+        for b, length in enumerate(lengths):
+            start = b * seq * features
+            values.extend(flat[start:start + length * features])
+            cu_seqlens.append(cu_seqlens[-1] + length)
+        return PackedSequence(Matrix.from_buffer(values, (1, cu_seqlens[-1], features)), cu_seqlens)
+
+    @property
+    def lengths(self):
+        return [b - a for a, b in zip(self.cu_seqlens, self.cu_seqlens[1:])]
+
+    def to_padded(self, length=None):
+        # (batch, length, features) with zero padding; length defaults to the longest sequence
+        lengths = self.lengths
+        length = max(lengths, default=0) if length is None else length
+        if any(n > length for n in lengths):
+            raise ValueError("Sequences of up to {} tokens do not fit {} positions.".format(max(lengths), length))
+        features = self.tokens.cols
+        flat = self.tokens._flat()
+        values = array(TYPECODE, bytes(8 * len(lengths) * length * features))
+        for b, (start, end) in enumerate(zip(self.cu_seqlens, self.cu_seqlens[1:])):
+            dest = b * length * features
+            values[dest:dest + (end - start) * features] = flat[start * features:end * features]
+        return Matrix.from_buffer(values, (len(lengths), length, features))
+
+    def unpack(self):
+        # one (length, features) view of the packed tokens per sequence
+        features = self.tokens.cols
+        tokens = self.tokens.contiguous()
+        return [tokens._view((1, end - start, features), ((end - start) * features, features, 1), start * features)
+                for start, end in zip(self.cu_seqlens, self.cu_seqlens[1:])]
+
+    def with_tokens(self, tokens):
+        # the same sequences carrying new per-token values, e.g. a layer's output
+        return PackedSequence(tokens, self.cu_seqlens)
+
+    def attention_pattern(self, pattern=None):
+        # block-diagonal attention over the sequences, optionally through ``pattern`` inside each one
+        return (pattern or AttentionPattern()).within(self.cu_seqlens)
+
+    def __add__(self, other):
+        # residual connections between two layers' outputs for the same sequences
+        if isinstance(other, PackedSequence):
+            if other.cu_seqlens != self.cu_seqlens:
+                raise ValueError("Cannot add packed sequences with different offsets.")
+            other = other.tokens
+        return self.with_tokens(self.tokens + other)
@@ -0,0 +1,207 @@
+import math
+from array import array
+
+from .backend import get_backend
+from .kernels import TYPECODE
+from .matrix import Matrix
+
+# symmetric int8 range; -128 is left unused so the grid is symmetric around zero
+QMAX = 127
+
+
+def _scale(max_abs):
+    # a zero range would divide by zero; any scale represents an all-zero channel exactly
+    return max_abs / QMAX if max_abs else 1.0
+
+
+class QuantizedMatrix:
+    """
+    int8 weight matrix with one float scale per output channel.
+
+    ``values * scales`` approximates the original weight. Channels are the
+    columns of a (..., in, out) weight, i.e. the outputs of ``x @ weight``, so
+    each output can be dequantized with a single multiply. Stacked weights,
+    such as the per-head blocks of a packed projection, get one scale per
+    column of every stacked matrix.
+
+    Args:
+        values (Matrix): int8 matrix of shape (..., in, out).
+        scales (Matrix): float64 matrix of shape (..., 1, out).
+    """
+
+    def __init__(self, values, scales):
+        if values.dtype != 'int8':
+            raise ValueError("Quantized values must be stored as int8, got {}.".format(values.dtype))
+        if scales.shape()[-1] != values.cols:
+            raise ValueError("Expected {} channel scales, got {}.".format(values.cols, scales.shape()[-1]))
+        self.values = values
+        self.scales = scales
+
+    @staticmethod
+    def from_matrix(matrix):
+        # symmetric per-column quantization: the largest magnitude of each column maps to 127
+        maxima = matrix.abs().max(axis=-2, keepdims=True)
+        scales = Matrix.from_buffer(array(TYPECODE, map(_scale, maxima._flat())), maxima.shape())
+        return QuantizedMatrix((matrix / scales).astype('int8'), scales)
+
+    def shape(self):
+        return self.values.shape()
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.scales.nbytes
+
+    def dequantize(self):
+        return self.values.multiply(self.scales)
+
+
+class ActivationObserver:
+    """
+    Records the range of a layer input during calibration.
+
+    The observed maximum magnitude becomes the per-tensor scale the input is
+    quantized with at inference time.
+    """
+
+    def __init__(self):
+        self.max_abs = 0.0
+        self.count = 0
+
+    def observe(self, x):
+        self.max_abs = max(self.max_abs, x.abs().max())
+        self.count += 1
+
+    def scale(self):
+        if not self.count:
+            raise ValueError("Observer has not seen any calibration inputs.")
+        return _scale(self.max_abs)
+
+
+class MatrixQuantization:
+
+    @staticmethod
+    def quantize(weight):
+        # per-channel int8 copy of a float weight; see QuantizedMatrix
+        return QuantizedMatrix.from_matrix(weight)
+
+    @staticmethod
+    def quantize_activations(x, scale):
+        # per-tensor int8; values beyond the calibrated range saturate
+        return (x * (1.0 / scale)).astype('int8')
+
+    @staticmethod
+    def matmul(x, weight, input_scale, bias=None, activation=None):
+        """
+        Computes ``x @ weight`` with int8 operands.
+
+        ``x`` is quantized with the calibrated ``input_scale``, multiplied by
+        the int8 weight with exact integer accumulation through the active
+        backend, and the accumulator is dequantized by
+        ``input_scale * weight.scales`` per output channel.
+
+        Args:
+            x (Matrix): Float input of shape (..., m, in).
+            weight (QuantizedMatrix): Quantized weight of shape (..., in, out).
+            input_scale (float): Scale of ``x`` from calibration.
+            bias (Matrix, optional): Bias added after dequantizing.
+            activation (str, optional): Activation applied last, as in
+                ``Matrix.linear``.
+
+        Returns:
+            Matrix: float64 result of shape (..., m, out).
+        """
+        if x.cols != weight.values.rows:
+            raise ValueError("Matrices must have appropriate dimensions for multiplication.")
+        x_q = MatrixQuantization.quantize_activations(x, input_scale)
+        accumulator, shape = get_backend().int8_matmul(x_q._buffer, x_q.shape(), weight.values._buffer, weight.shape())
+        result = Matrix.from_buffer(accumulator, shape).multiply(weight.scales * input_scale)
+        # the epilogue reuses the dequantized buffer
+        if bias is not None:
+            result += bias
+        if activation is not None:
+            result._unary(activation, result)
+        return result
+
+    @staticmethod
+    def report(reference, outputs):
+        """
+        Compares quantized outputs with the float outputs they approximate.
+
+        Args:
+            reference (list): Float-path outputs (Matrix).
+            outputs (list): Quantized-path outputs for the same inputs.
+
+        Returns:
+            dict: ``max_abs_error``, ``mean_abs_error`` and ``relative_error``
+            (Frobenius norm of the error over that of the reference).
+        """
+        max_error, error_sum, count, error_sq, reference_sq = 0.0, 0.0, 0, 0.0, 0.0
+        for expected, got in zip(reference, outputs):
+            error = (got - expected).abs()
+            max_error = max(max_error, error.max())
+            error_sum += error.sum()
+            count += error.size
+            error_sq += error.multiply(error).sum()
+            reference_sq += expected.multiply(expected).sum()
+        return {
+            'max_abs_error': max_error,
+            'mean_abs_error': error_sum / count if count else 0.0,
+            'relative_error': math.sqrt(error_sq / reference_sq) if reference_sq else math.sqrt(error_sq),
+        }
+
+
+class PostTrainingQuantizer:
+    """
+    Post-training int8 quantization of a layer's projection weights.
+
+    A layer takes part by naming its weight attributes in ``QUANTIZABLE``,
+    holding ``quantized`` and ``observers`` dicts, and sending each weight
+    product through a projection that observes its input when an observer is
+    registered and uses ``MatrixQuantization.matmul`` once the weight is
+    quantized (see ``FeedForwardLayer._project``).
+
+    Args:
+        keep_float (bool, optional): Keep the float64 weights after
+            quantizing. Serving only needs the int8 copies.
+    """
+
+    def __init__(self, keep_float=True):
+        self.keep_float = keep_float
+
+    def quantize(self, layer, calibration_inputs):
+        """
+        Calibrates, quantizes and evaluates ``layer`` in place.
+
+        The calibration inputs run through the float path once to record the
+        range of every projection input and the reference outputs; the
+        weights are then quantized per channel and the same inputs are run
+        through the int8 path.
+
+        Args:
+            layer: Layer following the protocol above.
+            calibration_inputs (iterable): Sample inputs for ``layer.forward``.
+
+        Returns:
+            dict: The accuracy report of ``MatrixQuantization.report`` plus
+            ``float_bytes`` and ``int8_bytes`` of the quantized weights.
+        """
+        inputs = list(calibration_inputs)
+        if not inputs:
+            raise ValueError("Calibration needs at least one input.")
+        layer.quantized = {}
+        layer.observers = {name: ActivationObserver() for name in layer.QUANTIZABLE}
+        try:
+            reference = [layer.forward(x) for x in inputs]
+        finally:
+            observers, layer.observers = layer.observers, {}
+        weights = {name: getattr(layer, name) for name in layer.QUANTIZABLE}
+        layer.quantized = {name: (MatrixQuantization.quantize(weight), observers[name].scale())
+                           for name, weight in weights.items()}
+
+        report = MatrixQuantization.report(reference, [layer.forward(x) for x in inputs])
+        report['float_bytes'] = sum(weight.nbytes for weight in weights.values())
+        report['int8_bytes'] = sum(weight.nbytes for weight, _ in layer.quantized.values())
+        if not self.keep_float:
+            for name in layer.QUANTIZABLE:
+                setattr(layer, name, None)
+        return report
@@ -1,13 +1,38 @@
+import math
+from array import array
+from itertools import repeat
+
+from .kernels import TYPECODE
 from .matrix import Matrix
-import random
+from .rng import default_generator
+
 
 class MatrixRandom:
+    # every method fills the whole buffer in one generator call; pass a
+    # Generator for an explicit stream, otherwise the default one is used
+
     @staticmethod
-    def random(rows, cols, low=0.0, high=1.0):
+    def random(rows, cols, low=0.0, high=1.0, batch_size=1, generator=None):
         # Random matrix of given dimensions
-        return Matrix([[random.uniform(low, high) for _ in range(cols)] for _ in range(rows)])
+        return Matrix.random(rows, cols, batch_size, low, high, generator)
+
+    @staticmethod
+    def random_int(rows, cols, low=0, high=10, batch_size=1, generator=None):
+        # Random integer matrix of given dimensions, both bounds inclusive
+        values = (generator or default_generator()).uniform(batch_size * rows * cols, low, high + 1)
+        return Matrix.from_buffer(array(TYPECODE, map(min, map(math.floor, values), repeat(high))), (batch_size, rows, cols))
+
+    @staticmethod
+    def normal(rows, cols, mean=0.0, std=1.0, batch_size=1, generator=None):
+        values = (generator or default_generator()).normal(batch_size * rows * cols, mean, std)
+        return Matrix.from_buffer(values, (batch_size, rows, cols))
+
+    @staticmethod
+    def truncated_normal(rows, cols, mean=0.0, std=1.0, bound=2.0, batch_size=1, generator=None):
+        values = (generator or default_generator()).truncated_normal(batch_size * rows * cols, mean, std, bound)
+        return Matrix.from_buffer(values, (batch_size, rows, cols))
 
     @staticmethod
-    def random_int(rows, cols, low=0, high=10):
-        # Random integer matrix of given dimensions
-        return Matrix([[random.randint(low, high) for _ in range(cols)] for _ in range(rows)])
+    def bernoulli(rows, cols, p=0.5, scale=1.0, batch_size=1, generator=None):
+        values = (generator or default_generator()).bernoulli(batch_size * rows * cols, p, scale)
+        return Matrix.from_buffer(values, (batch_size, rows, cols))
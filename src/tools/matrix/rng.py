@@ -0,0 +1,140 @@
+import hashlib
+import math
+import operator
+import random
+import struct
+import sys
+from array import array
+from itertools import repeat
+
+from .kernels import TYPECODE
+
+# IEEE-754 double layout: 52 mantissa bits below an exponent biased by 1023
+_MANTISSA = struct.pack('=Q', 0x000FFFFFFFFFFFFF)
+_EXPONENT_BIAS = 1023
+
+_default_generator = None
+
+
+class Generator:
+    """
+    Counter-based random stream that fills whole buffers per call.
+
+    A stream is identified by ``(seed, stream)``. Every draw hashes
+    ``(seed, stream, counter)`` into the seed of a fresh block generator and
+    then advances the counter, so the n-th draw of a stream is the same no
+    matter what other streams did. Give each worker process its own
+    ``stream`` (e.g. its rank) to get independent, reproducible sequences.
+
+    Args:
+        seed (int, optional): Shared seed of all streams.
+        stream (int, optional): Index of this stream.
+        counter (int, optional): Position to start the stream at.
+    """
+
+    def __init__(self, seed=0, stream=0, counter=0):
+        self.seed = seed
+        self.stream = stream
+        self.counter = counter
+
+    def spawn(self, stream):
+        # independent stream sharing this generator's seed
+        return Generator(self.seed, stream)
+
+    def _block(self):
+        key = "{}:{}:{}".format(self.seed, self.stream, self.counter).encode()
+        self.counter += 1
+        return random.Random(int.from_bytes(hashlib.blake2b(key, digest_size=16).digest(), 'little'))
+
+    def _unit(self, n, block=None, exponent=0):
+        # n doubles uniform in [2**exponent, 2**(exponent + 1)): random mantissas
+        # under a fixed exponent, masked as one big integer instead of per element
+        block = block or self._block()
+        bits = int.from_bytes(block.randbytes(8 * n), sys.byteorder)
+        bits &= int.from_bytes(_MANTISSA * n, sys.byteorder)
+        bits |= int.from_bytes(struct.pack('=Q', (_EXPONENT_BIAS + exponent) << 52) * n, sys.byteorder)
+        result = array(TYPECODE)
+        result.frombytes(bits.to_bytes(8 * n, sys.byteorder))
+        return result
+
+    def uniform(self, n, low=0.0, high=1.0):
+        scale = high - low
+        mantissa, exponent = math.frexp(scale)
+        if mantissa == 0.5:
+            # power-of-two widths come straight from the exponent: one shift, exact
+            return array(TYPECODE, map(operator.add, self._unit(n, exponent=exponent - 1), repeat(low - scale)))
+        # x in [1, 2) maps to low + (x - 1) * (high - low)
+        return array(TYPECODE, map(operator.add, map(operator.mul, self._unit(n), repeat(scale)), repeat(low - scale)))
+
+    def normal(self, n, mean=0.0, std=1.0):
+        """
+        Draws ``n`` normal samples with the Box-Muller transform.
+
+        Each pair of uniforms gives two independent normals, one from the
+        cosine and one from the sine branch.
+        """
+        half = (n + 1) // 2
+        block = self._block()
+        # 2 - x lies in (0, 1], keeping the logarithm finite
+        radius = map(math.sqrt, map(operator.mul, map(math.log, map(operator.sub, repeat(2.0), self._unit(half, block))), repeat(-2.0)))
+        radius = list(map(operator.mul, radius, repeat(std)))
+        angle = list(map(operator.mul, self._unit(half, block), repeat(2 * math.pi)))
+        result = array(TYPECODE, map(operator.add, map(operator.mul, radius, map(math.cos, angle)), repeat(mean)))
+        result.extend(map(operator.add, map(operator.mul, radius, map(math.sin, angle)), repeat(mean)))
+        del result[n:]
+        return result
+
+    def truncated_normal(self, n, mean=0.0, std=1.0, bound=2.0):
+        """
+        Draws ``n`` normal samples within ``bound`` standard deviations.
+
+        Samples outside the bound are redrawn from the next positions of the
+        stream until every sample is accepted.
+        """
+        low, high = mean - bound * std, mean + bound * std
+        result = self.normal(n, mean, std)
+        rejected = [i for i, val in enumerate(result) if not low <= val <= high]
+        while rejected:
+            redraw = self.normal(len(rejected), mean, std)
+            still = []
+            for i, val in zip(rejected, redraw):
+                if low <= val <= high:
+                    result[i] = val
+                else:
+                    still.append(i)
+            rejected = still
+        return result
+
+    def bernoulli(self, n, p=0.5, scale=1.0):
+        """
+        Draws a mask of ``n`` values that are ``scale`` with probability ``p``
+        and 0 otherwise.
+
+        With ``p = 1 - drop_prob`` and ``scale = 1 / p`` this is an inverted
+        dropout mask.
+        """
+        # x - 1 < p  <=>  x < 1 + p, with the comparison's bool scaled in C
+        return array(TYPECODE, map(operator.mul, map(operator.lt, self._unit(n), repeat(1.0 + p)), repeat(scale)))
+
+
+def default_generator():
+    global _default_generator
+    if _default_generator is None:
+        _default_generator = Generator(random.getrandbits(64))
+    return _default_generator
+
+
+def manual_seed(seed, stream=0):
+    """
+    Reseeds the generator used when no explicit generator is passed.
+
+    Args:
+        seed (int): Seed shared by all workers.
+        stream (int, optional): Stream of this worker, e.g. its rank.
+
+    Returns:
+        Generator: The new default generator.
+    """
+    global _default_generator
+    _default_generator = Generator(seed, stream)
+    return _default_generator
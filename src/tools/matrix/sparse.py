@@ -0,0 +1,189 @@
+import operator
+from array import array
+from itertools import repeat
+
+from .kernels import TYPECODE, dot
+from .matrix import Matrix
+
+# typecode of the index arrays
+INDEX_TYPECODE = 'q'
+
+
+class SparseMatrix:
+    """
+    Two-dimensional matrix in compressed sparse row (CSR) form.
+
+    Only the non-zeros are stored: ``values[indptr[i]:indptr[i + 1]]`` are the
+    entries of row ``i`` and ``indices`` holds their columns, sorted within
+    each row. Memory and the cost of the kernels below scale with ``nnz``
+    rather than ``rows * cols``.
+
+    Args:
+        indptr (iterable): Row pointers, ``rows + 1`` entries.
+        indices (iterable): Column index of each stored value.
+        values (iterable): Stored values.
+        shape (tuple): (rows, cols).
+    """
+
+    def __init__(self, indptr, indices, values, shape):
+        self.indptr = array(INDEX_TYPECODE, indptr)
+        self.indices = array(INDEX_TYPECODE, indices)
+        self.values = array(TYPECODE, values)
+        self.rows, self.cols = shape
+        if len(self.indptr) != self.rows + 1 or len(self.indices) != len(self.values) or self.indptr[-1] != len(self.values):
+            raise ValueError("CSR arrays do not describe a {}x{} matrix.".format(self.rows, self.cols))
+        if self.indices and (min(self.indices) < 0 or max(self.indices) >= self.cols):
+            raise ValueError("Column indices must lie in [0, {}).".format(self.cols))
+
+    @property
+    def nnz(self):
+        return len(self.values)
+
+    @property
+    def nbytes(self):
+        return self.values.itemsize * self.nnz + self.indices.itemsize * (self.nnz + self.rows + 1)
+
+    def shape(self):
+        return (self.rows, self.cols)
+
+    @staticmethod
+    def from_coo(row_indices, col_indices, values, shape):
+        """
+        Builds a CSR matrix from coordinate (COO) triplets.
+
+        Triplets may come in any order; duplicates are summed.
+        """
+        rows, cols = shape
+        entries = {}
+        for i, j, val in zip(row_indices, col_indices, values):
+            if not (0 <= i < rows and 0 <= j < cols):
+                raise ValueError("Entry ({}, {}) is outside a {}x{} matrix.".format(i, j, rows, cols))
+            entries[i, j] = entries.get((i, j), 0.0) + val
+        indptr = [0] * (rows + 1)
+        for i, _ in entries:
+            indptr[i + 1] += 1
+        for i in range(rows):
+            indptr[i + 1] += indptr[i]
+        keys = sorted(entries)
+        return SparseMatrix(indptr, [j for _, j in keys], [entries[key] for key in keys], shape)
+
+    @staticmethod
+    def from_dense(matrix):
+        # keeps the non-zero entries of a single (1, rows, cols) matrix
+        if matrix.batch_size != 1:
+            raise ValueError("Only a single matrix can be converted to a sparse matrix.")
+        flat, cols = matrix._flat(), matrix.cols
+        indptr, indices, values = [0], [], []
+        for i in range(matrix.rows):
+            row = flat[i * cols:(i + 1) * cols]
+            nonzero = [j for j, val in enumerate(row) if val]
+            indices.extend(nonzero)
+            values.extend(row[j] for j in nonzero)
+            indptr.append(len(indices))
+        return SparseMatrix(indptr, indices, values, (matrix.rows, cols))
+
+    def to_coo(self):
+        # (row_indices, col_indices, values) triplets in row-major order
+        row_indices = [i for i in range(self.rows) for _ in range(self.indptr[i + 1] - self.indptr[i])]
+        return row_indices, list(self.indices), list(self.values)
+
+    def to_dense(self):
+        result = array(TYPECODE, bytes(8 * self.rows * self.cols))
+        for i in range(self.rows):
+            base = i * self.cols
+            for p in range(self.indptr[i], self.indptr[i + 1]):
+                result[base + self.indices[p]] = self.values[p]
+        return Matrix.from_buffer(result, (1, self.rows, self.cols))
+
+    def transpose(self):
+        # CSR of the transpose, i.e. the CSC form of this matrix
+        row_indices, col_indices, values = self.to_coo()
+        return SparseMatrix.from_coo(col_indices, row_indices, values, (self.cols, self.rows))
+
+    def matmul(self, other):
+        """
+        Multiplies by a dense matrix: ``self @ other``.
+
+        Each stored value scales one row of ``other`` into the output, so the
+        cost is O(nnz * n) per batch.
+
+        Args:
+            other (Matrix): Dense matrix of shape (..., cols, n).
+
+        Returns:
+            Matrix: Dense result of shape (..., rows, n).
+        """
+        if other.rows != self.cols:
+            raise ValueError("Cannot multiply a {}x{} sparse matrix by a matrix with {} rows.".format(self.rows, self.cols, other.rows))
+        flat, n = other._flat(), other.cols
+        out = []
+        add, mul = operator.add, operator.mul
+        for b in range(other.batch_size):
+            base = b * other.rows * n
+            for i in range(self.rows):
+                row = [0.0] * n
+                for p in range(self.indptr[i], self.indptr[i + 1]):
+                    start = base + self.indices[p] * n
+                    row = list(map(add, row, map(mul, flat[start:start + n], repeat(self.values[p]))))
+                out.extend(row)
+        return Matrix.from_buffer(array(TYPECODE, out), other.shape()[:-2] + (self.rows, n))
+
+    def __mul__(self, other):
+        # like Matrix: '*' with a matrix is a matmul, with a scalar it scales
+        if isinstance(other, (int, float)):
+            return SparseMatrix(self.indptr, self.indices, map(operator.mul, self.values, repeat(other)), self.shape())
+        return self.matmul(other)
+
+    def __rmul__(self, other):
+        return self * other
+
+    def sampled_matmul(self, a, b):
+        """
+        Computes ``a @ b`` only at the stored positions of this matrix.
+
+        Useful for attention scores under a sparse pattern: only ``nnz`` dot
+        products are evaluated instead of ``rows * cols``.
+
+        Args:
+            a (Matrix): Single matrix of shape (rows, k).
+            b (Matrix): Single matrix of shape (k, cols).
+
+        Returns:
+            SparseMatrix: Products with this matrix's sparsity pattern.
+        """
+        if a.batch_size != 1 or b.batch_size != 1 or a.rows != self.rows or b.cols != self.cols or a.cols != b.rows:
+            raise ValueError("Operands do not match a {}x{} sampling pattern.".format(self.rows, self.cols))
+        a_flat, k = a._flat(), a.cols
+        b_columns = b.transpose().contiguous()._flat()
+        values = []
+        for i in range(self.rows):
+            a_row = a_flat[i * k:(i + 1) * k]
+            for p in range(self.indptr[i], self.indptr[i + 1]):
+                j = self.indices[p]
+                values.append(dot(a_row, b_columns[j * k:(j + 1) * k]))
+        return SparseMatrix(self.indptr, self.indices, values, self.shape())
+
+    def apply_mask(self, scores, fill=float('-inf')):
+        """
+        Keeps ``scores`` at the non-zero positions of this mask.
+
+        Every other position is set to ``fill``. The mask is broadcast over
+        the leading dimensions of ``scores``.
+
+        Args:
+            scores (Matrix): Dense scores of shape (..., rows, cols).
+            fill (float, optional): Value for masked-out positions.
+
+        Returns:
+            Matrix: The masked scores.
+        """
+        if (scores.rows, scores.cols) != self.shape():
+            raise ValueError("Mask of shape {} does not match scores of shape {}.".format(self.shape(), scores.shape()))
+        flat, block = scores._flat(), self.rows * self.cols
+        positions = [i * self.cols + self.indices[p]
+                     for i in range(self.rows) for p in range(self.indptr[i], self.indptr[i + 1]) if self.values[p]]
+        result = array(TYPECODE, [fill]) * scores.size
+        for base in range(0, scores.size, block):
+            for pos in positions:
+                result[base + pos] = flat[base + pos]
+        return Matrix.from_buffer(result, scores.shape())
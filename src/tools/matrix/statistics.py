@@ -1,14 +1,175 @@
+import math
+import operator
+from array import array
+from itertools import repeat
+
+from .kernels import TYPECODE, dot
+from .matrix import Matrix
+
+
+def _moments(values):
+    # count, mean and sum of squared deviations of one in-memory segment
+    n = len(values)
+    mean = math.fsum(values) / n
+    deviations = list(map(operator.sub, values, repeat(mean)))
+    return n, mean, dot(deviations, deviations)
+
+
+class RunningStatistics:
+    """
+    Streaming, mergeable mean and variance accumulator.
+
+    Each ``update`` folds one chunk into the running moments with the pairwise
+    form of Welford's algorithm (Chan et al.), so the data is read once and
+    never held in memory as a whole. Accumulators built on different chunks or
+    processes combine exactly with ``merge``.
+
+    Args:
+        by (str, optional): Grouping of the statistics. ``None`` keeps one
+            global value, ``'batch'`` one per batch element, ``'row'`` one per
+            row index and ``'col'`` one per column index. Row and column groups
+            accumulate over every batch element of every chunk.
+    """
+
+    GROUPINGS = (None, 'batch', 'row', 'col')
+
+    def __init__(self, by=None):
+        if by not in self.GROUPINGS:
+            raise ValueError("Grouping must be one of {}.".format(self.GROUPINGS))
+        self.by = by
+        self.batch_shape = None
+        self.counts = []
+        self.means = []
+        self.m2 = []
+
+    def _segments(self, matrix):
+        # (group, values) pairs covering every element of the chunk exactly once
+        flat = matrix._flat()
+        rows, cols = matrix.rows, matrix.cols
+        if self.by is None:
+            yield 0, flat
+        elif self.by == 'batch':
+            block = rows * cols
+            for b in range(matrix.batch_size):
+                yield b, flat[b * block:(b + 1) * block]
+        elif self.by == 'row':
+            for r in range(matrix.batch_size * rows):
+                yield r % rows, flat[r * cols:(r + 1) * cols]
+        else:
+            for j in range(cols):
+                yield j, flat[j::cols]
+
+    def _groups(self, matrix):
+        if self.by is None:
+            return 1
+        if self.by == 'batch':
+            return matrix.batch_size
+        return matrix.rows if self.by == 'row' else matrix.cols
+
+    def _combine(self, group, n, mean, m2):
+        count = self.counts[group]
+        if count == 0:
+            self.counts[group], self.means[group], self.m2[group] = n, mean, m2
+            return
+        total = count + n
+        delta = mean - self.means[group]
+        self.means[group] += delta * n / total
+        self.m2[group] += m2 + delta * delta * count * n / total
+        self.counts[group] = total
+
+    def _check_groups(self, groups):
+        if not self.counts:
+            self.counts, self.means, self.m2 = [0] * groups, [0.0] * groups, [0.0] * groups
+        elif len(self.counts) != groups:
+            raise ValueError("Expected {} groups, got {}.".format(len(self.counts), groups))
+
+    def update(self, matrix):
+        """
+        Folds a chunk of data into the statistics.
+
+        Args:
+            matrix (Matrix): The chunk. Row groups need a matching row count and
+                column groups a matching column count across chunks.
+
+        Returns:
+            RunningStatistics: ``self``, for chaining.
+        """
+        self._check_groups(self._groups(matrix))
+        if self.by == 'batch':
+            self.batch_shape = matrix.shape()[:-2]
+        for group, values in self._segments(matrix):
+            if len(values):
+                self._combine(group, *_moments(values))
+        return self
+
+    def merge(self, other):
+        """
+        Combines another accumulator, e.g. one built by a different worker.
+
+        Args:
+            other (RunningStatistics): Accumulator with the same grouping.
+
+        Returns:
+            RunningStatistics: ``self``, for chaining.
+        """
+        if other.by != self.by:
+            raise ValueError("Cannot merge statistics grouped by {!r} and {!r}.".format(self.by, other.by))
+        if not other.counts:
+            return self
+        self._check_groups(len(other.counts))
+        self.batch_shape = self.batch_shape or other.batch_shape
+        for group, n in enumerate(other.counts):
+            if n:
+                self._combine(group, n, other.means[group], other.m2[group])
+        return self
+
+    def _result(self, values):
+        # one float globally, otherwise a Matrix that broadcasts against the data
+        if self.by is None:
+            return values[0]
+        if self.by == 'batch':
+            shape = (self.batch_shape or (len(values),)) + (1, 1)
+        else:
+            shape = (1, len(values), 1) if self.by == 'row' else (1, 1, len(values))
+        return Matrix.from_buffer(array(TYPECODE, values), shape)
+
+    def mean(self):
+        if not self.counts or 0 in self.counts:
+            raise ValueError("No data has been accumulated.")
+        return self._result(self.means)
+
+    def variance(self, ddof=0):
+        """
+        Returns the variance of each group.
+
+        Args:
+            ddof (int, optional): Delta degrees of freedom; 0 gives the
+                population variance and 1 the sample variance.
+        """
+        if not self.counts or any(n <= ddof for n in self.counts):
+            raise ValueError("Not enough data for a variance with ddof={}.".format(ddof))
+        return self._result([m2 / (n - ddof) for n, m2 in zip(self.counts, self.m2)])
+
+    def stddev(self, ddof=0):
+        variance = self.variance(ddof)
+        if self.by is None:
+            return math.sqrt(variance)
+        return variance.sqrt()
+
+
 class MatrixStatistics:
     @staticmethod
-    def mean(matrix):
-        return sum([sum(row) for row in matrix.data]) / (matrix.rows * matrix.cols)
+    def running(by=None):
+        return RunningStatistics(by)
+
+    @staticmethod
+    def mean(matrix, by=None):
+        return RunningStatistics(by).update(matrix).mean()
 
     @staticmethod
-    def variance(matrix):
-        mean = MatrixStatistics.mean(matrix)
-        return sum([(val - mean) ** 2 for row in matrix.data for val in row]) / (matrix.rows * matrix.cols)
+    def variance(matrix, by=None, ddof=0):
+        return RunningStatistics(by).update(matrix).variance(ddof)
 
     @staticmethod
-    def stddev(matrix):
-        variance = MatrixStatistics.variance(matrix)
-        return variance ** 0.5
+    def stddev(matrix, by=None, ddof=0):
+        return RunningStatistics(by).update(matrix).stddev(ddof)
@@ -0,0 +1,135 @@
+import mmap
+import struct
+import sys
+from array import array
+
+from .dtypes import CODES, DEFAULT_DTYPE, STORAGE, check_dtype, dtype_from_code
+from .kernels import contiguous_strides
+from .matrix import Matrix
+from .utils import MatrixUtils
+
+# file layout: fixed header, shape and strides as int64, values from DATA_ALIGNMENT on
+MAGIC = b'MFMATRIX'
+VERSION = 1
+HEADER = struct.Struct('<8sIccxxI')
+DATA_ALIGNMENT = 64
+_BYTEORDER = b'<' if sys.byteorder == 'little' else b'>'
+
+# mmap access per open mode: read-only, copy-on-write, or written through to the file
+MODES = {'r': mmap.ACCESS_READ, 'c': mmap.ACCESS_COPY, 'r+': mmap.ACCESS_WRITE}
+
+
+def _data_offset(ndim):
+    end = HEADER.size + 16 * ndim
+    return -(-end // DATA_ALIGNMENT) * DATA_ALIGNMENT
+
+
+def _write_header(f, shape, strides, dtype):
+    f.write(HEADER.pack(MAGIC, VERSION, CODES[dtype].encode(), _BYTEORDER, len(shape)))
+    f.write(struct.pack('<{}q'.format(len(shape)), *shape))
+    f.write(struct.pack('<{}q'.format(len(shape)), *strides))
+    f.write(bytes(_data_offset(len(shape)) - f.tell()))
+
+
+class MatrixStorage:
+    @staticmethod
+    def read_header(path):
+        """
+        Reads the header of a matrix file.
+
+        Returns:
+            tuple: ``(shape, strides, dtype_code, data_offset)``, where
+            ``dtype_code`` is the one-character code from ``dtypes.CODES``.
+        """
+        with open(path, 'rb') as f:
+            magic, version, typecode, byteorder, ndim = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("{} is not a matrix file.".format(path))
+            dtype_from_code(typecode.decode())
+            if byteorder != _BYTEORDER:
+                raise ValueError("Matrix file uses unsupported byte order {!r}.".format(byteorder))
+            shape = struct.unpack('<{}q'.format(ndim), f.read(8 * ndim))
+            strides = struct.unpack('<{}q'.format(ndim), f.read(8 * ndim))
+        return shape, strides, typecode.decode(), _data_offset(ndim)
+
+    @staticmethod
+    def save(matrix, path, chunk_rows=4096):
+        """
+        Writes a matrix to ``path`` in row-major order.
+
+        Views are written chunk by chunk, so saving never materializes more
+        than ``chunk_rows`` rows of a strided matrix at once.
+        """
+        with open(path, 'wb') as f:
+            _write_header(f, matrix.shape(), contiguous_strides(matrix.shape()), matrix.dtype)
+            if matrix.is_contiguous():
+                f.write(matrix._raw())
+                return
+            for batch in MatrixStorage.iter_batches(matrix, 1):
+                for chunk in MatrixStorage.iter_rows(batch, chunk_rows):
+                    f.write(chunk._raw())
+
+    @staticmethod
+    def load(path, mode='r'):
+        """
+        Opens a matrix file as a memory-mapped Matrix without reading it.
+
+        Args:
+            path (str): File written by ``save`` or ``create``.
+            mode (str, optional): ``'r'`` maps the file read-only; in-place
+                operations then take a private in-memory copy first. ``'c'``
+                maps it copy-on-write: pages are copied by the OS only when
+                written and changes never reach the file. ``'r+'`` writes
+                changes through to the file.
+
+        Returns:
+            Matrix: A matrix whose buffer is the mapped file.
+        """
+        if mode not in MODES:
+            raise ValueError("Mode must be one of {}.".format(tuple(MODES)))
+        shape, strides, code, offset = MatrixStorage.read_header(path)
+        dtype = dtype_from_code(code)
+        with open(path, 'r+b' if mode == 'r+' else 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=MODES[mode])
+        # the memoryview keeps the mapping alive for as long as the matrix needs it
+        buffer = memoryview(mapped)[offset:].cast(STORAGE[dtype])
+        matrix = Matrix.from_buffer(buffer, shape, strides, dtype=dtype)
+        matrix._shared = mode == 'r'
+        return matrix
+
+    @staticmethod
+    def create(path, shape, dtype=DEFAULT_DTYPE):
+        """
+        Creates a zero-filled matrix file and maps it for writing.
+
+        The file is sized up front without writing the values, so outputs
+        larger than memory can be filled piece by piece.
+        """
+        shape = tuple(shape)
+        size = 1
+        for dim in shape:
+            size *= dim
+        with open(path, 'wb') as f:
+            _write_header(f, shape, contiguous_strides(shape), check_dtype(dtype))
+            f.truncate(f.tell() + array(STORAGE[dtype]).itemsize * size)
+        return MatrixStorage.load(path, 'r+')
+
+    @staticmethod
+    def flush(matrix):
+        # writes dirty pages of a matrix opened with mode 'r+' back to its file
+        if isinstance(matrix._buffer, memoryview) and isinstance(matrix._buffer.obj, mmap.mmap):
+            matrix._buffer.obj.flush()
+
+    @staticmethod
+    def iter_batches(matrix, chunk_size=1):
+        # zero-copy views of chunk_size entries along the leading axis
+        shape, strides = matrix.shape(), matrix.strides
+        for start in range(0, shape[0], chunk_size):
+            stop = min(start + chunk_size, shape[0])
+            yield matrix._view((stop - start,) + shape[1:], strides, matrix._offset + start * strides[0])
+
+    @staticmethod
+    def iter_rows(matrix, chunk_size=1024):
+        # zero-copy views of chunk_size rows of every batch
+        for start in range(0, matrix.rows, chunk_size):
+            yield MatrixUtils.slice(matrix, start, start + chunk_size, 0, matrix.cols)
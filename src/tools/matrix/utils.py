@@ -1,26 +1,73 @@
+from array import array
+
+from .kernels import TYPECODE
 from .matrix import Matrix
+
+
 class MatrixUtils:
     @staticmethod
     def reshape(matrix, new_rows, new_cols):
-        flat_data = [val for row in matrix.data for val in row]
-        if len(flat_data) != new_rows * new_cols:
+        # reshapes every batch; contiguous inputs come back as views of the same buffer
+        if matrix.rows * matrix.cols != new_rows * new_cols:
             raise ValueError("Cannot reshape matrix of size {}x{} to {}x{}".format(matrix.rows, matrix.cols, new_rows, new_cols))
-        reshaped = [flat_data[i*new_cols:(i+1)*new_cols] for i in range(new_rows)]
-        return Matrix(reshaped)
+        return matrix.reshape(matrix.shape()[:-2] + (new_rows, new_cols))
 
     @staticmethod
     def slice(matrix, row_start, row_end, col_start, col_end):
-        return Matrix([row[col_start:col_end] for row in matrix.data[row_start:row_end]])
+        # view of the given row/column window of every batch, sharing the parent's buffer
+        row_start, row_end, _ = slice(row_start, row_end).indices(matrix.rows)
+        col_start, col_end, _ = slice(col_start, col_end).indices(matrix.cols)
+        shape = matrix.shape()[:-2] + (max(row_end - row_start, 0), max(col_end - col_start, 0))
+        offset = matrix._offset + row_start * matrix.strides[-2] + col_start * matrix.strides[-1]
+        return matrix._view(shape, matrix.strides, offset)
 
     @staticmethod
-    def concatenate(matrix1, matrix2, axis=0):
+    def concatenate(*matrices, axis=0):
+        """
+        Concatenates any number of matrices in one preallocated buffer.
+
+        Args:
+            *matrices (Matrix): Matrices with matching batch dimensions. A
+                trailing int is taken as ``axis``, as in the two-matrix form
+                ``concatenate(a, b, 1)``.
+            axis (int, optional): 0 stacks rows (vertical), 1 stacks columns
+                (horizontal).
+
+        Returns:
+            Matrix: The concatenated matrix.
+        """
+        if matrices and isinstance(matrices[-1], int):
+            matrices, axis = matrices[:-1], matrices[-1]
+        if not matrices:
+            raise ValueError("Nothing to concatenate.")
+        if axis not in (0, 1):
+            raise ValueError("Axis must be 0 (vertical) or 1 (horizontal).")
+        first = matrices[0]
+        batch_shape = first.shape()[:-2]
+        if any(m.shape()[:-2] != batch_shape for m in matrices):
+            raise ValueError("Matrices must have the same batch dimensions for concatenation.")
         if axis == 0:  # Vertical concatenation
-            if matrix1.cols != matrix2.cols:
+            if any(m.cols != first.cols for m in matrices):
                 raise ValueError("Matrices must have the same number of columns for vertical concatenation.")
-            return Matrix(matrix1.data + matrix2.data)
-        elif axis == 1:  # Horizontal concatenation
-            if matrix1.rows != matrix2.rows:
+            rows, cols = sum(m.rows for m in matrices), first.cols
+        else:  # Horizontal concatenation
+            if any(m.rows != first.rows for m in matrices):
                 raise ValueError("Matrices must have the same number of rows for horizontal concatenation.")
-            return Matrix([matrix1.data[i] + matrix2.data[i] for i in range(matrix1.rows)])
-        else:
-            raise ValueError("Axis must be 0 (vertical) or 1 (horizontal).")
+            rows, cols = first.rows, sum(m.cols for m in matrices)
+
+        result = array(TYPECODE, bytes(8 * first.batch_size * rows * cols))
+        start = 0
+        for m in matrices:
+            flat = m._flat()
+            block = m.rows * m.cols
+            for b in range(first.batch_size):
+                if axis == 0:
+                    # a batch of m is one contiguous run of the output batch
+                    dest = b * rows * cols + start * cols
+                    result[dest:dest + block] = flat[b * block:(b + 1) * block]
+                else:
+                    for i in range(m.rows):
+                        dest = (b * rows + i) * cols + start
+                        result[dest:dest + m.cols] = flat[b * block + i * m.cols:b * block + (i + 1) * m.cols]
+            start += m.rows if axis == 0 else m.cols
+        return Matrix.from_buffer(result, batch_shape + (rows, cols))
@@ -0,0 +1,283 @@
+import importlib.util
+import math
+import random
+import unittest
+from tools.matrix import backend
+from tools.matrix.attention import AttentionMask, AttentionPattern, KVCache, MatrixAttention
+from tools.matrix.matrix import Matrix
+from tools.matrix.random import MatrixRandom
+from tools.matrix.rng import Generator
+from tools.matrix.sparse import SparseMatrix
+
+HAS_NUMPY = importlib.util.find_spec('numpy') is not None
+
+
+def reference_attention(q, k, v, allowed):
+    # dense softmax(q k^T / sqrt(d)) v; ``allowed[i][j]`` is False where masked
+    scores = q.matmul(k.transpose(-2, -1)) / math.sqrt(q.cols)
+    penalty = Matrix([[0.0 if keep else -1e30 for keep in row] for row in allowed])
+    scores = scores + penalty
+    weights = (scores - scores.logsumexp(axis=-1, keepdims=True)).exp()
+    return weights.matmul(v).multiply(Matrix([[1.0 if any(row) else 0.0] for row in allowed]))
+
+
+class TestAttention(unittest.TestCase):
+
+    def setUp(self):
+        generator = Generator(seed=5)
+        self.q = MatrixRandom.normal(12, 8, batch_size=4, generator=generator).reshape(2, 2, 12, 8)
+        self.k = MatrixRandom.normal(12, 8, batch_size=4, generator=generator).reshape(2, 2, 12, 8)
+        self.v = MatrixRandom.normal(12, 5, batch_size=4, generator=generator).reshape(2, 2, 12, 5)
+
+    def assertAllClose(self, got, want):
+        self.assertEqual(got.shape(), want.shape())
+        for a, b in zip(got._flat(), want._flat()):
+            self.assertAlmostEqual(a, b)
+
+    def test_blocks_match_dense_softmax(self):
+        allowed = [[True] * 12 for _ in range(12)]
+
+        for block_size in (1, 5, 12, 64):
+            out = MatrixAttention.scaled_dot_product(self.q, self.k, self.v, block_size=block_size)
+            self.assertAllClose(out, reference_attention(self.q, self.k, self.v, allowed))
+
+    def test_heads_last_layout(self):
+        out = MatrixAttention.scaled_dot_product(self.q, self.k, self.v, causal=True, block_size=5, heads_last=True)
+        expected = MatrixAttention.scaled_dot_product(self.q, self.k, self.v, causal=True, block_size=5)
+
+        self.assertEqual(out.data, expected.transpose((0, 2, 1, 3)).data)
+        self.assertEqual(out.reshape(2, 12, 10).shape(), (2, 12, 10))
+
+    def test_causal_and_explicit_masks(self):
+        keep = [[random.random() > 0.4 for _ in range(12)] for _ in range(12)]
+        keep[3] = [False] * 12
+        mask = Matrix([[1.0 if flag else 0.0 for flag in row] for row in keep])
+        causal = [[j <= i for j in range(12)] for i in range(12)]
+
+        masked = MatrixAttention.scaled_dot_product(self.q, self.k, self.v, mask=mask, block_size=5)
+        both = MatrixAttention.scaled_dot_product(self.q, self.k, self.v, mask=SparseMatrix.from_dense(mask),
+                                                  causal=True, block_size=5)
+
+        self.assertAllClose(masked, reference_attention(self.q, self.k, self.v, keep))
+        self.assertAllClose(both, reference_attention(self.q, self.k, self.v,
+                                                      [[a and b for a, b in zip(r, c)] for r, c in zip(keep, causal)]))
+        self.assertEqual(masked.data[1][0][3], [0.0] * 5)
+
+    def test_causal_queries_are_the_last_positions(self):
+        full = MatrixAttention.scaled_dot_product(self.q, self.k, self.v, causal=True)
+        last_rows = Matrix([head[-3:] for batch in self.q.data for head in batch]).reshape(2, 2, 3, 8)
+        tail = MatrixAttention.scaled_dot_product(last_rows, self.k, self.v, causal=True)
+
+        self.assertEqual(tail.shape(), (2, 2, 3, 5))
+        self.assertAllClose(tail, Matrix([head[-3:] for batch in full.data for head in batch]).reshape(2, 2, 3, 5))
+        with self.assertRaises(ValueError):
+            MatrixAttention.scaled_dot_product(self.q, self.k, self.v, mask=Matrix([[1.0, 0.0]]))
+
+
+class TestMaskedSoftmax(unittest.TestCase):
+
+    def setUp(self):
+        generator = Generator(seed=6)
+        self.scores = MatrixRandom.normal(4, 6, batch_size=2, generator=generator)
+        self.bias = MatrixRandom.normal(1, 6, generator=generator)
+
+    def expected(self, keep, bias=None, log=False):
+        # row-by-row softmax over the kept positions only
+        result = []
+        for b, batch in enumerate(self.scores.data):
+            for i, row in enumerate(batch):
+                if bias is not None:
+                    row = [x + y for x, y in zip(row, bias.data[0][0])]
+                kept = [x for j, x in enumerate(row) if keep(b, i, j)]
+                peak = max(kept)
+                total = math.log(sum(math.exp(x - peak) for x in kept))
+                for j, x in enumerate(row):
+                    value = x - peak - total if keep(b, i, j) else -math.inf
+                    result.append(value if log else math.exp(value))
+        return result
+
+    def assertRowsEqual(self, got, want):
+        for a, b in zip(got._flat(), want):
+            if math.isinf(b):
+                self.assertEqual(a, b)
+            else:
+                self.assertAlmostEqual(a, b)
+
+    def test_causal_padding_and_bias(self):
+        mask = AttentionMask(causal=True, lengths=[6, 3], bias=self.bias)
+
+        def keep(b, i, j):
+            return j <= i + 2 and j < (6, 3)[b]
+
+        self.assertRowsEqual(MatrixAttention.softmax(self.scores, mask), self.expected(keep, self.bias))
+        self.assertRowsEqual(MatrixAttention.log_softmax(self.scores, mask), self.expected(keep, self.bias, log=True))
+        self.assertRowsEqual(MatrixAttention.softmax(self.scores), self.expected(lambda b, i, j: True))
+
+    def test_in_place_and_empty_rows(self):
+        scores = self.scores.contiguous()
+        buffer = scores._buffer
+
+        result = MatrixAttention.softmax(scores, AttentionMask(lengths=[2, 0]), out=scores)
+
+        self.assertIs(result, scores)
+        self.assertIs(scores._buffer, buffer)
+        self.assertEqual(scores.data[1], [[0.0] * 6] * 4)
+        self.assertAlmostEqual(sum(scores.data[0][0]), 1.0)
+        self.assertEqual(MatrixAttention.log_softmax(self.scores, AttentionMask(lengths=[1, 0])).data[1][0][0], -math.inf)
+        with self.assertRaises(ValueError):
+            MatrixAttention.softmax(self.scores, AttentionMask(lengths=[1, 2, 3]))
+
+    def test_attention_with_a_mask_spec(self):
+        q = MatrixRandom.normal(4, 3, batch_size=2, generator=Generator(seed=7))
+        k = MatrixRandom.normal(6, 3, batch_size=2, generator=Generator(seed=8))
+        v = MatrixRandom.normal(6, 2, batch_size=2, generator=Generator(seed=9))
+        mask = AttentionMask(causal=True, lengths=[5, 3], bias=self.bias)
+
+        fused = MatrixAttention.scaled_dot_product(q, k, v, mask, block_size=4)
+        weights = MatrixAttention.softmax(q.matmul(k.transpose()) / math.sqrt(3), mask)
+
+        for a, b in zip(fused._flat(), weights.matmul(v)._flat()):
+            self.assertAlmostEqual(a, b)
+        with self.assertRaises(ValueError):
+            MatrixAttention.scaled_dot_product(q, k, v, AttentionMask(lengths=[5]))
+
+
+class TestKVCache(unittest.TestCase):
+
+    def setUp(self):
+        generator = Generator(seed=10)
+        self.q, self.k, self.v = (MatrixRandom.normal(6, 4, batch_size=6, generator=generator).reshape(3, 2, 6, 4)
+                                  for _ in range(3))
+
+    def positions(self, x, start, end):
+        # rows [start, end) of the sequence axis, each flattened over batch and heads
+        return x.transpose((2, 0, 1, 3)).reshape(x.shape()[2], -1).data[start:end]
+
+    def step(self, x, start, end):
+        # positions [start, end) of a (3, 2, 6, 4) matrix as (3, 2, end - start, 4)
+        rows = Matrix(self.positions(x, start, end)).reshape(end - start, 3, 2, 4)
+        return rows.transpose((1, 2, 0, 3)).contiguous()
+
+    def test_decoding_matches_causal_attention(self):
+        cache = KVCache(3, 2, 8, 4)
+        full = MatrixAttention.scaled_dot_product(self.q, self.k, self.v, causal=True)
+
+        outputs = []
+        for start, end in ((0, 3), (3, 4), (4, 5), (5, 6)):
+            self.assertEqual(cache.append(self.step(self.k, start, end), self.step(self.v, start, end)), end)
+            outputs.extend(self.positions(cache.attend(self.step(self.q, start, end)), 0, end - start))
+
+        self.assertEqual(cache.keys.shape(), (3, 2, 6, 4))
+        self.assertEqual(cache.values.data, self.v.data)
+        for a, b in zip(Matrix(outputs)._flat(), Matrix(self.positions(full, 0, 6))._flat()):
+            self.assertAlmostEqual(a, b)
+
+    def test_truncate_and_select(self):
+        cache = KVCache(3, 2, 6, 4)
+        cache.append(self.k, self.v)
+
+        cache.truncate(4)
+        cache.select([2, 0, 2])
+
+        self.assertEqual((cache.batch_size, cache.length), (3, 4))
+        self.assertEqual(cache.keys.data, [[head[:4] for head in self.k.data[i]] for i in (2, 0, 2)])
+        with self.assertRaises(ValueError):
+            cache.append(self.k, self.v)
+        with self.assertRaises(ValueError):
+            cache.truncate(5)
+        with self.assertRaises(ValueError):
+            cache.select([3])
+
+    def test_views_keep_their_positions(self):
+        cache = KVCache(3, 2, 6, 4)
+        cache.append(self.k, self.v)
+        keys = cache.keys
+
+        cache.truncate(1)
+        cache.append(self.step(self.v, 0, 5), self.step(self.k, 0, 5))
+
+        self.assertEqual(keys.data, self.k.data)
+        self.assertEqual(cache.keys.data[0][0][1:], self.v.data[0][0][:5])
+
+
+class TestAttentionPattern(unittest.TestCase):
+
+    def test_keys(self):
+        self.assertEqual(list(AttentionPattern.sliding_window(2).keys(0, 10)), [0, 1, 2])
+        self.assertEqual(list(AttentionPattern.sliding_window(2, causal=True).keys(5, 10)), [3, 4, 5])
+        self.assertEqual(list(AttentionPattern.dilated(2, 3).keys(4, 10)), [1, 4, 7])
+        pattern = AttentionPattern(window=1, global_tokens=[0], causal=True)
+        self.assertEqual(pattern.keys(6, 10), [0, 5, 6])
+        self.assertEqual(list(pattern.keys(0, 10)), [0])
+        self.assertEqual(list(AttentionPattern(window=1, global_tokens=[2]).keys(2, 5)), [0, 1, 2, 3, 4])
+        layout = AttentionPattern.block_sparse(3, [[0], [0, 1], [2]])
+        self.assertEqual(layout.keys(4, 8), [0, 1, 2, 3, 4, 5])
+        self.assertEqual(layout.keys(7, 8), [6, 7])
+        with self.assertRaises(ValueError):
+            AttentionPattern(layout=[[0]])
+        self.assertEqual(list(AttentionPattern.sliding_window(2).as_causal().keys(5, 10)), [3, 4, 5])
+
+    def test_sparse_matches_masked_dense(self):
+        generator = Generator(seed=11)
+        q = MatrixRandom.normal(16, 4, batch_size=4, generator=generator).reshape(2, 2, 16, 4)
+        k, v = (MatrixRandom.normal(16, 4, batch_size=2, generator=generator).reshape(2, 1, 16, 4) for _ in range(2))
+        patterns = (AttentionPattern.sliding_window(3), AttentionPattern.dilated(2, 2, causal=True),
+                    AttentionPattern(window=1, global_tokens=[0, 9]),
+                    AttentionPattern.block_sparse(4, {0: [0], 2: [0, 2], 3: [1]}, causal=True))
+
+        for pattern in patterns:
+            keep = Matrix([[1.0 if j in set(pattern.keys(i, 16)) else 0.0 for j in range(16)] for i in range(16)])
+            expected = MatrixAttention.scaled_dot_product(q, k, v, keep)
+            for got, want in zip(MatrixAttention.sparse(q, k, v, pattern)._flat(), expected._flat()):
+                self.assertAlmostEqual(got, want)
+
+    def test_cached_decoding_with_a_window(self):
+        q, k, v = (MatrixRandom.normal(6, 4, generator=Generator(seed=seed)).reshape(1, 1, 6, 4) for seed in (1, 2, 3))
+        patterns = (AttentionPattern.sliding_window(2, causal=True), AttentionPattern.sliding_window(2),
+                    AttentionPattern(window=1, global_tokens=[1]), AttentionPattern.block_sparse(2, [[0], [0, 1], [2]]))
+
+        for pattern in patterns:
+            # decoding is causal whatever the pattern says, so a prefilled
+            # prompt matches the same positions decoded one at a time
+            expected = MatrixAttention.sparse(q, k, v, pattern.as_causal())
+            for chunks in (((0, 1), (1, 2), (2, 3), (3, 4), (4, 5), (5, 6)), ((0, 4), (4, 5), (5, 6))):
+                cache = KVCache(1, 1, 6, 4)
+                for start, end in chunks:
+                    step = [Matrix(x.data[0][0][start:end]).reshape(1, 1, end - start, 4) for x in (q, k, v)]
+                    cache.append(step[1], step[2])
+                    got = cache.attend(step[0], pattern=pattern)._flat()
+                    for a, b in zip(got, Matrix(expected.data[0][0][start:end])._flat()):
+                        self.assertAlmostEqual(a, b)
+
+class NumpyBackendMixin:
+    # reruns a test case with the vectorized backend active
+
+    def setUp(self):
+        context = backend.use_backend('numpy')
+        context.__enter__()
+        self.addCleanup(context.__exit__, None, None, None)
+        super().setUp()
+
+
+@unittest.skipUnless(HAS_NUMPY, "NumPy is not installed")
+class TestAttentionNumpy(NumpyBackendMixin, TestAttention):
+    pass
+
+
+@unittest.skipUnless(HAS_NUMPY, "NumPy is not installed")
+class TestMaskedSoftmaxNumpy(NumpyBackendMixin, TestMaskedSoftmax):
+    pass
+
+
+@unittest.skipUnless(HAS_NUMPY, "NumPy is not installed")
+class TestKVCacheNumpy(NumpyBackendMixin, TestKVCache):
+    pass
+
+
+@unittest.skipUnless(HAS_NUMPY, "NumPy is not installed")
+class TestAttentionPatternNumpy(NumpyBackendMixin, TestAttentionPattern):
+    pass
+
+
+if __name__ == '__main__':
+    unittest.main()
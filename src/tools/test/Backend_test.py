@@ -0,0 +1,172 @@
+import importlib.util
+import math
+import os
+import random
+import unittest
+from unittest import mock
+from tools.matrix import backend
+from tools.matrix.attention import AttentionMask, AttentionPattern, MatrixAttention
+from tools.matrix.matrix import Matrix
+
+HAS_NUMPY = importlib.util.find_spec('numpy') is not None
+
+
+def random_matrix(*shape):
+    batch, rows, cols = shape
+    return Matrix([[[random.uniform(0.5, 2.0) for _ in range(cols)] for _ in range(rows)] for _ in range(batch)])
+
+
+class TestBackendRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.previous = backend.get_backend()
+
+    def tearDown(self):
+        backend._active = self.previous
+
+    def test_env_var_selects_default(self):
+        backend._active = None
+        with mock.patch.dict(os.environ, {backend.BACKEND_ENV_VAR: 'python'}):
+            self.assertEqual(backend.get_backend().name, 'python')
+
+    def test_use_backend_restores_previous(self):
+        backend.register_backend('reference', backend.PythonBackend)
+        with backend.use_backend('reference') as active:
+            self.assertIs(backend.get_backend(), active)
+        self.assertIs(backend.get_backend(), self.previous)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            backend.set_backend('missing')
+
+    def test_sum_axis_keepdims(self):
+        m = Matrix([[[1, 2, 3], [4, 5, 6]]])
+
+        self.assertEqual(m.sum(), 21)
+        self.assertEqual(m.sum(axis=-1, keepdims=True).data, [[[6], [15]]])
+        self.assertEqual(m.sum(axis=1).data, [[5, 7, 9]])
+        self.assertEqual(m.sum(axis=0).shape(), (2, 3))
+
+    def test_reductions_over_4d(self):
+        m = Matrix.from_flat_list([3, 1, 2, 9, 4, 4, 0, 5, 7, 6, 8, 1], 2, 3, 2).reshape(2, 1, 2, 3)
+
+        self.assertEqual(m.mean(axis=-1, keepdims=True).data, [[[[2], [17 / 3]]], [[[4], [5]]]])
+        self.assertEqual(m.max(axis=0).data, [[[3, 5, 7], [9, 8, 4]]])
+        self.assertEqual(m.min(axis=-2).shape(), (2, 1, 3))
+        self.assertEqual(m.argmax(axis=-1).data, [[[0, 0]], [[2, 1]]])
+        self.assertEqual(m.argmax(axis=0, keepdims=True).data, [[[[0, 1, 1], [0, 1, 0]]]])
+        self.assertEqual(m.argmax(), 3)
+        self.assertAlmostEqual(m.var(axis=0).data[0][0][0], 2.25)
+        self.assertAlmostEqual(m.var(), Matrix([[3, 1, 2, 9, 4, 4, 0, 5, 7, 6, 8, 1]]).var(axis=-1).data[0][0])
+
+    def test_logsumexp_is_stable(self):
+        m = Matrix([[1000.0, 1000.0], [-1000.0, float('-inf')]])
+
+        self.assertEqual(m.logsumexp(axis=-1).data, [[1000.0 + math.log(2), -1000.0]])
+        self.assertAlmostEqual(m.logsumexp(axis=0).data[0][1], 1000.0)
+        self.assertEqual(Matrix([[float('-inf'), float('-inf')]]).logsumexp(), float('-inf'))
+
+
+@unittest.skipUnless(HAS_NUMPY, "NumPy is not installed")
+class TestBackendParity(unittest.TestCase):
+
+    def assertMatchesAcrossBackends(self, fn):
+        with backend.use_backend('python'):
+            expected = fn()
+        with backend.use_backend('numpy'):
+            got = fn()
+        if isinstance(expected, Matrix):
+            self.assertEqual(got.shape(), expected.shape())
+            expected, got = expected._flat(), got._flat()
+        else:
+            expected, got = [expected], [got]
+        for a, b in zip(expected, got):
+            self.assertAlmostEqual(a, b, places=9)
+
+    def test_elementwise_and_unary(self):
+        a, b = random_matrix(2, 3, 4), random_matrix(2, 3, 4)
+
+        self.assertMatchesAcrossBackends(lambda: a + b)
+        self.assertMatchesAcrossBackends(lambda: a - b)
+        self.assertMatchesAcrossBackends(lambda: a / b)
+        self.assertMatchesAcrossBackends(lambda: a ** 2)
+        self.assertMatchesAcrossBackends(lambda: a.exp())
+        self.assertMatchesAcrossBackends(lambda: a.sqrt())
+
+    def test_broadcasting(self):
+        x, bias, column = random_matrix(2, 3, 4), random_matrix(1, 1, 4), random_matrix(2, 3, 1)
+
+        self.assertMatchesAcrossBackends(lambda: x + bias)
+        self.assertMatchesAcrossBackends(lambda: x / column)
+        self.assertMatchesAcrossBackends(lambda: x.maximum(column))
+
+    def test_matmul_and_reductions(self):
+        a, w = random_matrix(2, 3, 4), random_matrix(1, 4, 5)
+
+        self.assertMatchesAcrossBackends(lambda: a.matmul(w))
+        self.assertMatchesAcrossBackends(lambda: a.sum())
+        self.assertMatchesAcrossBackends(lambda: a.sum(axis=-1, keepdims=True))
+        self.assertMatchesAcrossBackends(lambda: a.sum(axis=1))
+        for op in ('mean', 'max', 'min', 'argmax', 'var', 'logsumexp'):
+            for axis in (None, 0, 1, -1):
+                self.assertMatchesAcrossBackends(lambda: getattr(a, op)(axis=axis, keepdims=True))
+
+    def test_activations(self):
+        x = random_matrix(2, 3, 4) * 8.0
+
+        for op in ('relu', 'sigmoid', 'tanh', 'gelu', 'silu', 'leaky_relu', 'elu'):
+            self.assertMatchesAcrossBackends(getattr(x, op))
+        self.assertMatchesAcrossBackends(lambda: x.gelu(approximate=True))
+        self.assertMatchesAcrossBackends(lambda: x.elu(0.5, out=x.contiguous()))
+
+    def test_fused_linear(self):
+        x, w, b = random_matrix(2, 3, 4), random_matrix(1, 4, 5), random_matrix(1, 1, 5)
+
+        for activation in (None, 'relu', 'gelu', 'sigmoid'):
+            self.assertMatchesAcrossBackends(lambda: x.linear(w, b, activation))
+        self.assertMatchesAcrossBackends(lambda: x.linear(w.transpose(-2, -1).contiguous().transpose(-2, -1)))
+
+    def test_norms(self):
+        x = random_matrix(3, 4, 6)
+        gamma, beta = random_matrix(1, 1, 6), random_matrix(1, 1, 6)
+
+        self.assertMatchesAcrossBackends(lambda: x.layer_norm(gamma, beta))
+        self.assertMatchesAcrossBackends(lambda: x.rms_norm(gamma, epsilon=1e-6))
+        self.assertMatchesAcrossBackends(lambda: x.layer_norm(out=Matrix.zeros_like(x)))
+
+    def test_blocked_attention(self):
+        q = random_matrix(4, 7, 4).reshape(2, 2, 7, 4)
+        k, v = random_matrix(2, 9, 4).reshape(2, 1, 9, 4), random_matrix(2, 9, 3).reshape(2, 1, 9, 3)
+        mask = Matrix([[float(random.random() > 0.3) for _ in range(9)] for _ in range(7)])
+
+        self.assertMatchesAcrossBackends(lambda: MatrixAttention.scaled_dot_product(q, k, v, block_size=4))
+        self.assertMatchesAcrossBackends(lambda: MatrixAttention.scaled_dot_product(q, k, v, mask, causal=True,
+                                                                                     block_size=2))
+        spec = AttentionMask(causal=True, lengths=[9, 4], bias=random_matrix(2, 1, 9))
+        self.assertMatchesAcrossBackends(lambda: MatrixAttention.scaled_dot_product(q, k, v, spec, block_size=4))
+        prefix = AttentionMask(causal=True, start=1)
+        self.assertMatchesAcrossBackends(lambda: MatrixAttention.scaled_dot_product(q, k, v, prefix, block_size=4))
+        self.assertMatchesAcrossBackends(lambda: MatrixAttention.scaled_dot_product(q, k, v, heads_last=True))
+
+    def test_sparse_attention(self):
+        q = random_matrix(4, 11, 4).reshape(2, 2, 11, 4)
+        k, v = random_matrix(2, 11, 4).reshape(2, 1, 11, 4), random_matrix(2, 11, 3).reshape(2, 1, 11, 3)
+        pattern = AttentionPattern(window=2, dilation=2, global_tokens=[3], block_size=4, layout=[[1], [], [0]])
+
+        self.assertMatchesAcrossBackends(lambda: MatrixAttention.sparse(q, k, v, pattern))
+        self.assertMatchesAcrossBackends(lambda: MatrixAttention.sparse(q, k, v, pattern, heads_last=True))
+        # the only key block is in the future of query block 0, whose rows come out zero
+        future = AttentionPattern.block_sparse(4, [[2]], causal=True)
+        self.assertMatchesAcrossBackends(lambda: MatrixAttention.sparse(q, k, v, future))
+
+    def test_masked_softmax(self):
+        scores = random_matrix(2, 5, 7)
+        spec = AttentionMask(causal=True, lengths=[7, 3], bias=random_matrix(1, 5, 7))
+
+        self.assertMatchesAcrossBackends(lambda: MatrixAttention.softmax(scores, spec))
+        self.assertMatchesAcrossBackends(lambda: MatrixAttention.softmax(scores, AttentionMask(lengths=[2, 6])))
+        self.assertMatchesAcrossBackends(lambda: MatrixAttention.log_softmax(scores, AttentionMask(causal=True)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+import math
+import unittest
+from tools.matrix.attention import AttentionPattern
+from tools.matrix.matrix import Matrix
+from tools.matrix.packing import PackedSequence
+from tools.matrix.quantization import MatrixQuantization, PostTrainingQuantizer
+from tools.matrix.random import MatrixRandom
+from tools.matrix.rng import Generator, manual_seed
+from transformer.core.normalization import LayerNorm, RMSNorm
+from transformer.layers.feedforward import FeedForwardLayer
+from transformer.layers.multihead_attention import MultiHeadSelfAttention
+from transformer.layers.normalization import LayerNormalization, RMSNormalization
+
+
+class TestPostTrainingQuantization(unittest.TestCase):
+
+    def setUp(self):
+        manual_seed(7)
+        self.inputs = [MatrixRandom.normal(6, 8, batch_size=2, generator=Generator(seed=i)) for i in range(3)]
+
+    def check_layer(self, layer):
+        reference = [layer.forward(x) for x in self.inputs]
+        weights = {name: getattr(layer, name) for name in layer.QUANTIZABLE}
+
+        report = PostTrainingQuantizer(keep_float=False).quantize(layer, self.inputs)
+
+        self.assertEqual(set(layer.quantized), set(layer.QUANTIZABLE))
+        self.assertTrue(all(getattr(layer, name) is None for name in layer.QUANTIZABLE))
+        self.assertEqual(report['float_bytes'], sum(weight.nbytes for weight in weights.values()))
+        self.assertLess(report['int8_bytes'], report['float_bytes'])
+        self.assertLess(report['relative_error'], 0.05)
+        # the reported error is that of the int8 path, which still runs without the float weights
+        outputs = [layer.forward(x) for x in self.inputs]
+        self.assertEqual(MatrixQuantization.report(reference, outputs),
+                         {key: report[key] for key in ('max_abs_error', 'mean_abs_error', 'relative_error')})
+        return outputs
+
+    def test_feedforward_layer(self):
+        for activation in ('relu', 'gelu'):
+            outputs = self.check_layer(FeedForwardLayer(8, 16, activation=activation))
+            self.assertEqual(outputs[0].shape(), (2, 6, 8))
+
+    def test_multihead_self_attention(self):
+        layer = MultiHeadSelfAttention(8, 2)
+        weights = layer.Wqkv
+
+        outputs = self.check_layer(layer)
+
+        self.assertEqual(outputs[0].shape(), (2, 6, 8))
+        self.assertEqual(layer.quantized['Wqkv'][0].values.shape(), weights.shape())
+
+
+def reference_attention(layer, x, causal=False):
+    # unpacked multi-head self-attention in plain Python: separate q, k and v
+    # products per head, softmax over materialized scores, concat, then Wo
+    heads, depth, d_model = layer.num_heads, layer.depth, layer.d_model
+    weights = layer.Wqkv._flat()
+    wo = layer.Wo.data[0]
+
+    def project(tokens, p, h):
+        base = (p * heads + h) * d_model * depth
+        return [[sum(token[i] * weights[base + i * depth + j] for i in range(d_model)) for j in range(depth)]
+                for token in tokens]
+
+    outputs = []
+    for tokens in x.data:
+        concat = [[] for _ in tokens]
+        for h in range(heads):
+            q, k, v = (project(tokens, p, h) for p in range(3))
+            for i, query in enumerate(q):
+                keys = range(i + 1) if causal else range(len(k))
+                scores = [sum(a * b for a, b in zip(query, k[j])) / math.sqrt(depth) for j in keys]
+                peak = max(scores)
+                exps = [math.exp(score - peak) for score in scores]
+                total = sum(exps)
+                concat[i].extend(sum(e * v[j][c] for e, j in zip(exps, keys)) / total for c in range(depth))
+        outputs.append([[sum(row[i] * wo[i][c] for i in range(d_model)) for c in range(d_model)] for row in concat])
+    return outputs
+
+
+class TestMultiHeadSelfAttention(unittest.TestCase):
+
+    def setUp(self):
+        manual_seed(3)
+        self.layer = MultiHeadSelfAttention(6, 3)
+        self.x = MatrixRandom.normal(5, 6, batch_size=2, generator=Generator(seed=8))
+
+    def assertMatches(self, got, expected):
+        self.assertEqual(got.shape(), (len(expected), len(expected[0]), len(expected[0][0])))
+        for a, b in zip(got._flat(), Matrix(expected)._flat()):
+            self.assertAlmostEqual(a, b)
+
+    def test_packed_projection_matches_unpacked_reference(self):
+        self.assertEqual(self.layer.Wqkv.shape(), (3, 1, 3, 6, 2))
+
+        q, k, v = self.layer.project_qkv(self.x)
+
+        self.assertEqual(q.shape(), (2, 3, 5, 2))
+        self.assertMatches(self.layer.forward(self.x), reference_attention(self.layer, self.x))
+
+    def test_causal_pattern_matches_reference(self):
+        self.layer.pattern = AttentionPattern(causal=True)
+
+        self.assertMatches(self.layer.forward(self.x), reference_attention(self.layer, self.x, causal=True))
+
+    def tokens(self, start, end):
+        return Matrix([tokens[start:end] for tokens in self.x.data])
+
+    def test_cached_decoding_matches_causal_forward(self):
+        expected = reference_attention(self.layer, self.x, causal=True)
+
+        for chunks in (((0, 1), (1, 2), (2, 3), (3, 4), (4, 5)), ((0, 3), (3, 4), (4, 5))):
+            cache = self.layer.init_cache(2, 5)
+            for start, end in chunks:
+                got = self.layer.forward(self.tokens(start, end), cache)
+                self.assertMatches(got, [rows[start:end] for rows in expected])
+            self.assertEqual(cache.length, 5)
+        with self.assertRaises(ValueError):
+            self.layer.forward(self.tokens(0, 1), cache)
+
+    def test_cached_decoding_with_a_pattern(self):
+        # a non-causal window is applied causally when decoding
+        self.layer.pattern = AttentionPattern.sliding_window(1)
+        cache = self.layer.init_cache(2, 5)
+        prompt = self.layer.forward(self.tokens(0, 3), cache)
+        steps = [self.layer.forward(self.tokens(t, t + 1), cache) for t in (3, 4)]
+
+        self.layer.pattern = AttentionPattern.sliding_window(1, causal=True)
+        expected = self.layer.forward(self.x)
+
+        self.assertMatches(prompt, [rows[:3] for rows in expected.data])
+        for t, step in zip((3, 4), steps):
+            self.assertMatches(step, [rows[t:t + 1] for rows in expected.data])
+
+
+
+class TestNormalizationLayers(unittest.TestCase):
+
+    def setUp(self):
+        generator = Generator(seed=9)
+        self.x = MatrixRandom.normal(5, 6, batch_size=2, mean=3.0, generator=generator)
+        self.gamma = MatrixRandom.normal(1, 6, generator=generator)
+        self.beta = MatrixRandom.normal(1, 6, generator=generator)
+
+    def layer_norm(self, epsilon, gamma=None, beta=None):
+        # the two-pass formula the layers used before the fused kernel
+        mean = self.x.mean(axis=-1, keepdims=True)
+        variance = self.x.var(axis=-1, keepdims=True)
+        y = (self.x - mean) / (variance + epsilon).sqrt()
+        if gamma is not None:
+            y = y.multiply(gamma)
+        return y if beta is None else y + beta
+
+    def rms_norm(self, epsilon, gamma=None):
+        y = self.x / (self.x.multiply(self.x).mean(axis=-1, keepdims=True) + epsilon).sqrt()
+        return y if gamma is None else y.multiply(gamma)
+
+    def assertClose(self, got, expected):
+        self.assertEqual(got.shape(), expected.shape())
+        for a, b in zip(got._flat(), expected._flat()):
+            self.assertAlmostEqual(a, b, places=10)
+
+    def test_core_layers(self):
+        norm, rms = LayerNorm(6), RMSNorm(6)
+        norm.gamma, norm.beta, rms.gamma = self.gamma, self.beta, self.gamma
+
+        self.assertClose(norm.forward(self.x), self.layer_norm(1e-5, self.gamma, self.beta))
+        self.assertClose(rms.forward(self.x), self.rms_norm(1e-5, self.gamma))
+        self.assertClose(LayerNorm(6).forward(self.x), self.layer_norm(1e-5))
+
+    def test_normalization_layers(self):
+        norm, rms = LayerNormalization(), RMSNormalization()
+
+        self.assertClose(norm.forward(self.x, self.gamma, self.beta), self.layer_norm(1e-6, self.gamma, self.beta))
+        self.assertClose(norm.forward(self.x, self.gamma), self.layer_norm(1e-6, self.gamma))
+        self.assertClose(norm.forward(self.x), self.layer_norm(1e-6))
+        self.assertClose(rms.forward(self.x, self.gamma), self.rms_norm(1e-6, self.gamma))
+        self.assertClose(rms.forward(self.x), self.rms_norm(1e-6))
+
+        packed = PackedSequence.from_padded(self.x, [5, 3])
+        expected = PackedSequence.from_padded(self.layer_norm(1e-6, self.gamma, self.beta), [5, 3])
+        self.assertClose(norm.forward(packed, self.gamma, self.beta).tokens, expected.tokens)
+
+
+if __name__ == '__main__':
+    unittest.main()
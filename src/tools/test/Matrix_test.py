@@ -0,0 +1,561 @@
+import math
+import random
+import unittest
+from array import array
+from tools.matrix.matrix import Matrix
+from tools.matrix.algebra import MatrixAlgebra
+from tools.matrix.random import MatrixRandom
+from tools.matrix.rng import Generator
+from tools.matrix.statistics import MatrixStatistics, RunningStatistics
+from tools.matrix.utils import MatrixUtils
+from tools.matrix import dtypes, kernels
+from tools.matrix.lazy import Expression, lazy
+from tools.activation import GELU, ReLU, Sigmoid
+
+
+class TestMatrixStorage(unittest.TestCase):
+
+    def test_nested_lists_are_stored_flat(self):
+        m = Matrix([[1, 2, 3], [4, 5, 6]])
+
+        self.assertIsInstance(m._buffer, array)
+        self.assertEqual(m.shape(), (1, 2, 3))
+        self.assertEqual(m.strides, (6, 3, 1))
+        self.assertEqual(m.data, [[[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]]])
+
+    def test_memory_per_element(self):
+        m = Matrix.zeros(512, 512)
+
+        self.assertEqual(m.itemsize, 8)
+        self.assertEqual(m.nbytes, 8 * 512 * 512)
+
+    def test_add_and_sub(self):
+        a = Matrix([[[1, 2], [3, 4]], [[5, 6], [7, 8]]])
+        b = Matrix([[[1, 1], [1, 1]], [[2, 2], [2, 2]]])
+
+        self.assertEqual((a + b).data, [[[2, 3], [4, 5]], [[7, 8], [9, 10]]])
+        self.assertEqual((a - b).data, [[[0, 1], [2, 3]], [[3, 4], [5, 6]]])
+        with self.assertRaises(ValueError):
+            a + Matrix([[1, 2, 3]])
+
+    def test_matrix_multiply(self):
+        a = Matrix([[1, 2, 3], [4, 5, 6]])
+        b = Matrix([[7, 8], [9, 10], [11, 12]])
+
+        self.assertEqual((a * b).data, [[[58, 64], [139, 154]]])
+        self.assertEqual((a * 2).data, [[[2, 4, 6], [8, 10, 12]]])
+
+    def test_transpose(self):
+        m = Matrix([[[1, 2, 3], [4, 5, 6]], [[7, 8, 9], [10, 11, 12]]])
+
+        self.assertEqual(m.transpose().data, [[[1, 4], [2, 5], [3, 6]], [[7, 10], [8, 11], [9, 12]]])
+        self.assertEqual(m.transpose((2, 0, 1)).shape(), (3, 2, 2))
+        self.assertEqual(m.transpose(0, 2).data, [[[1, 7], [4, 10]], [[2, 8], [5, 11]], [[3, 9], [6, 12]]])
+
+    def test_constructors(self):
+        self.assertEqual(Matrix.identity(2, batch_size=2).data, [[[1, 0], [0, 1]], [[1, 0], [0, 1]]])
+        self.assertEqual(Matrix.zeros(1, 3).data, [[[0, 0, 0]]])
+        self.assertEqual(Matrix.from_flat_list([1, 2, 3, 4], 2, 1, batch_size=2).data, [[[1], [2]], [[3], [4]]])
+        with self.assertRaises(ValueError):
+            Matrix.from_flat_list([1, 2, 3], 2, 2)
+
+
+class TestViews(unittest.TestCase):
+
+    def test_views_share_the_buffer(self):
+        m = Matrix.from_flat_list(list(range(24)), 4, 6)
+
+        for view in (m.transpose(), m.reshape(2, 3, 4), MatrixUtils.reshape(m, 6, 4), MatrixUtils.slice(m, 1, 3, 2, 5)):
+            self.assertIs(view._buffer, m._buffer)
+        self.assertEqual(MatrixUtils.slice(m, 1, 3, 2, 5).data, [[[8, 9, 10], [14, 15, 16]]])
+        self.assertEqual(m.reshape(2, -1, 3).shape(), (2, 4, 3))
+        with self.assertRaises(ValueError):
+            m.reshape(5, -1)
+
+    def test_reshape_of_strided_view_materializes(self):
+        m = Matrix.from_flat_list(list(range(6)), 2, 3)
+        flipped = m.transpose().reshape(1, 6)
+
+        self.assertIsNot(flipped._buffer, m._buffer)
+        self.assertEqual(flipped.data, [[0, 3, 1, 4, 2, 5]])
+
+    def test_matmul_reads_head_split_views_in_place(self):
+        batch, seq, heads, depth = 2, 3, 2, 2
+        x = Matrix.from_flat_list([random.uniform(-1, 1) for _ in range(batch * seq * heads * depth)], seq, heads * depth, batch)
+        q = x.reshape(batch, seq, heads, depth).transpose((0, 2, 1, 3))
+
+        scores = q.matmul(q.transpose(-2, -1))
+        expected = q.contiguous().matmul(q.contiguous().transpose().contiguous())
+
+        self.assertEqual(scores.shape(), (batch, heads, seq, seq))
+        for got, want in zip(scores._flat(), expected._flat()):
+            self.assertAlmostEqual(got, want)
+
+    def test_unbind_packed_projection(self):
+        x = Matrix.from_flat_list([random.uniform(-1, 1) for _ in range(12)], 3, 4)
+        w = Matrix.from_flat_list([random.uniform(-1, 1) for _ in range(24)], 4, 2, 3).reshape(3, 1, 4, 2)
+
+        q, k, v = x.reshape(1, 1, 3, 4).matmul(w).unbind()
+
+        for part, weight in zip((q, k, v), w.unbind()):
+            self.assertIs(part._buffer, q._buffer)
+            self.assertTrue(part.is_contiguous())
+            self.assertEqual(part.shape(), (1, 3, 2))
+            for got, want in zip(part._flat(), (x * weight.reshape(4, 2))._flat()):
+                self.assertAlmostEqual(got, want)
+        with self.assertRaises(ValueError):
+            x.reshape(3, 4).unbind()
+
+    def test_multiway_concatenate(self):
+        a = Matrix([[[1, 2]], [[3, 4]]])
+        b = Matrix([[[5], [6]], [[7], [8]]]).transpose()
+
+        self.assertEqual(MatrixUtils.concatenate(a, b, a, axis=1).data, [[[1, 2, 5, 6, 1, 2]], [[3, 4, 7, 8, 3, 4]]])
+        self.assertEqual(MatrixUtils.concatenate(a, b, axis=0).data, [[[1, 2], [5, 6]], [[3, 4], [7, 8]]])
+        # the positional axis of the original two-matrix signature still works
+        self.assertEqual(MatrixUtils.concatenate(a, b, 1).data, MatrixUtils.concatenate(a, b, axis=1).data)
+        self.assertEqual(MatrixUtils.concatenate(a, b, 0).data, MatrixUtils.concatenate(a, b).data)
+        with self.assertRaises(ValueError):
+            MatrixUtils.concatenate(a, Matrix([[1, 2, 3]]), axis=0)
+
+
+class TestBroadcasting(unittest.TestCase):
+
+    def test_row_bias_over_batch(self):
+        x = Matrix([[[1, 2, 3], [4, 5, 6]], [[7, 8, 9], [10, 11, 12]]])
+        bias = Matrix([[10, 20, 30]])
+
+        self.assertEqual((x + bias).data, [[[11, 22, 33], [14, 25, 36]], [[17, 28, 39], [20, 31, 42]]])
+        self.assertEqual(x.multiply(bias).shape(), (2, 2, 3))
+        self.assertEqual((bias - x).data[1][1], [0, 9, 18])
+
+    def test_column_vector_and_mixed_rank(self):
+        scores = Matrix.from_flat_list([1.0, 2.0, 3.0, 4.0, 6.0, 8.0], 2, 3).reshape(1, 1, 2, 3)
+        totals = scores.sum(axis=-1, keepdims=True)
+
+        self.assertEqual((scores / totals).data, [[[[1 / 6, 2 / 6, 3 / 6], [4 / 18, 6 / 18, 8 / 18]]]])
+        self.assertEqual(Matrix([[1], [5]]).maximum(Matrix([[2, 4]])).data, [[[2, 4], [5, 5]]])
+        self.assertEqual(Matrix([[1], [5]]).minimum(3).data, [[[1], [3]]])
+        self.assertEqual((Matrix([[2, 3]]) ** Matrix([[2], [1]])).data, [[[4, 9], [2, 3]]])
+
+    def test_scalar_on_the_left(self):
+        x = Matrix([[[1, 2], [4, 8]], [[0.5, 0.25], [-1, -2]]])
+
+        self.assertEqual((2.0 - x).data, [[[1, 0], [-2, -6]], [[1.5, 1.75], [3, 4]]])
+        self.assertEqual((8 / x).data, [[[8, 4], [2, 1]], [[16, 32], [-8, -4]]])
+        self.assertEqual((2 ** x).data, [[[2, 4], [16, 256]], [[2 ** 0.5, 2 ** 0.25], [0.5, 0.25]]])
+        self.assertEqual((1 + x).data, (x + 1).data)
+        self.assertEqual((2.0 - x.transpose()).shape(), (2, 2, 2))
+
+    def test_inplace_broadcast_keeps_shape(self):
+        x = Matrix([[1, 2], [3, 4]])
+        x += Matrix([[1, 1]])
+
+        self.assertEqual(x.data, [[[2, 3], [4, 5]]])
+        with self.assertRaises(ValueError):
+            Matrix([[1, 2]]).__iadd__(Matrix([[1, 2], [3, 4]]))
+
+
+class TestInPlace(unittest.TestCase):
+
+    def test_inplace_operators_keep_the_buffer(self):
+        m = Matrix([[1, 2], [3, 4]])
+        buffer = m._buffer
+
+        m += Matrix([[1, 1], [1, 1]])
+        m -= 1
+        m *= 3
+        m /= Matrix([[1, 2], [3, 4]])
+
+        self.assertIs(m._buffer, buffer)
+        self.assertEqual(m.data, [[[3, 3], [3, 3]]])
+        self.assertEqual((2 * m).data, [[[6, 6], [6, 6]]])
+
+    def test_write_to_shared_buffer_copies(self):
+        m = Matrix([[1, 2], [3, 4]])
+        view = m.transpose()
+
+        view += 10
+
+        self.assertEqual(view.data, [[[11, 13], [12, 14]]])
+        self.assertEqual(m.data, [[[1, 2], [3, 4]]])
+
+    def test_fused_helpers(self):
+        t = Matrix([[1.0, 2.0]])
+        a = Matrix([[2.0, 4.0]])
+        b = Matrix([[4.0, 8.0]])
+
+        self.assertEqual(Matrix.axpy(0.5, a, t).data, [[[2, 4]]])
+        self.assertEqual(Matrix.addcmul(t, 2, a, b).data, [[[17, 66]]])
+        out = Matrix.addcdiv(t, 2, b, a, out=t)
+        self.assertIs(out, t)
+        self.assertEqual(t.data, [[[5, 6]]])
+        with self.assertRaises(ValueError):
+            Matrix.axpy(1.0, a, Matrix([[1.0]]))
+
+    def test_large_inplace_update_is_chunked(self):
+        size = kernels.CHUNK_SIZE * 2 + 3
+        x = Matrix.from_flat_list([1.0] * size, 1, size)
+        y = Matrix.from_flat_list(list(range(size)), 1, size)
+
+        Matrix.axpy(2.0, x, y, out=y)
+
+        self.assertEqual(list(y._flat()), [i + 2.0 for i in range(size)])
+
+
+class TestMatmulKernel(unittest.TestCase):
+
+    def naive(self, a, b):
+        return [[sum(a[i][k] * b[k][j] for k in range(len(b))) for j in range(len(b[0]))] for i in range(len(a))]
+
+    def test_tiled_matches_naive(self):
+        a = [[random.uniform(-1, 1) for _ in range(13)] for _ in range(7)]
+        b = [[random.uniform(-1, 1) for _ in range(11)] for _ in range(13)]
+        flat_a = [val for row in a for val in row]
+        flat_b = [val for row in b for val in row]
+
+        result, shape = kernels.matmul(flat_a, (7, 13), flat_b, (13, 11), block_size=4, k_block=5)
+
+        self.assertEqual(shape, (7, 11))
+        expected = [val for row in self.naive(a, b) for val in row]
+        for got, want in zip(result, expected):
+            self.assertAlmostEqual(got, want)
+
+    def test_weight_broadcast_over_batch(self):
+        x = Matrix([[[1, 2], [3, 4]], [[5, 6], [7, 8]]])
+        w = Matrix([[1, 0, 1], [0, 1, 1]])
+
+        out = x * w
+
+        self.assertEqual(out.shape(), (2, 2, 3))
+        self.assertEqual(out.data, [[[1, 2, 3], [3, 4, 7]], [[5, 6, 11], [7, 8, 15]]])
+
+    def test_incompatible_batches(self):
+        with self.assertRaises(ValueError):
+            Matrix.zeros(2, 2, batch_size=2) * Matrix.zeros(2, 2, batch_size=3)
+
+
+class TestStrassen(unittest.TestCase):
+
+    def setUp(self):
+        kernels.set_strassen_crossover(4)
+
+    def tearDown(self):
+        kernels.set_strassen_crossover(None)
+
+    def test_padded_shapes_match_blocked(self):
+        a = Matrix([[[random.uniform(-1, 1) for _ in range(21)] for _ in range(19)] for _ in range(2)])
+        b = Matrix([[random.uniform(-1, 1) for _ in range(23)] for _ in range(21)])
+
+        result = a.strassen_multiply(b)
+        expected, shape = kernels.matmul(a._flat(), a.shape(), b._flat(), b.shape())
+
+        self.assertEqual(result.shape(), shape)
+        for got, want in zip(result._flat(), expected):
+            self.assertAlmostEqual(got, want)
+
+    def test_default_product_is_deterministic(self):
+        a = Matrix([[random.uniform(-1, 1) for _ in range(72)] for _ in range(72)])
+
+        product = a * a
+        kernels.set_strassen_crossover(10 ** 6)
+
+        # the crossover only affects strassen_multiply, never the default product
+        self.assertEqual((a * a)._flat(), product._flat())
+
+    def test_crossover_is_cached(self):
+        kernels.set_strassen_crossover(None)
+        first = kernels.strassen_crossover()
+
+        self.assertIn(first * 2, kernels.STRASSEN_CANDIDATES + (kernels.STRASSEN_CANDIDATES[-1] * 2,))
+        self.assertEqual(kernels.strassen_crossover(), first)
+
+
+class TestLUDecomposition(unittest.TestCase):
+
+    def test_determinant_and_inverse(self):
+        a = Matrix([[0, 2, 1], [1, 1, 0], [3, 0, 1]])
+
+        self.assertAlmostEqual(MatrixAlgebra.determinant(a), -5.0)
+        for got, want in zip(a.matmul(MatrixAlgebra.inverse(a))._flat(), Matrix.identity(3)._flat()):
+            self.assertAlmostEqual(got, want)
+
+    def test_solve_many_right_hand_sides(self):
+        n, m = 12, 5
+        a = Matrix([[random.uniform(-1, 1) + (n if i == j else 0) for j in range(n)] for i in range(n)])
+        x = Matrix([[random.uniform(-1, 1) for _ in range(m)] for _ in range(n)])
+
+        lu = MatrixAlgebra.lu(a)
+        solved = lu.solve(a.matmul(x))
+
+        self.assertEqual(solved.shape(), (1, n, m))
+        for got, want in zip(solved._flat(), x._flat()):
+            self.assertAlmostEqual(got, want)
+        self.assertAlmostEqual(lu.determinant(), MatrixAlgebra.determinant(a))
+
+    def test_singular_matrix(self):
+        a = Matrix([[1, 2], [2, 4]])
+
+        self.assertEqual(MatrixAlgebra.determinant(a), 0.0)
+        with self.assertRaises(ValueError):
+            MatrixAlgebra.inverse(a)
+        with self.assertRaises(ValueError):
+            MatrixAlgebra.lu(Matrix([[1, 2, 3]]))
+
+
+class TestRunningStatistics(unittest.TestCase):
+
+    def test_groupings_on_batched_input(self):
+        m = Matrix([[[1, 2], [3, 4]], [[5, 6], [7, 8]]])
+
+        self.assertAlmostEqual(MatrixStatistics.mean(m), 4.5)
+        self.assertAlmostEqual(MatrixStatistics.variance(m), 5.25)
+        self.assertEqual(MatrixStatistics.mean(m, by='batch').data, [[[2.5]], [[6.5]]])
+        self.assertEqual(MatrixStatistics.mean(m, by='row').data, [[[3.5], [5.5]]])
+        self.assertEqual(MatrixStatistics.mean(m, by='col').data, [[[4, 5]]])
+        self.assertEqual(MatrixStatistics.variance(m, by='col').data, [[[5, 5]]])
+
+    def test_chunks_and_merge_match_one_pass(self):
+        values = [random.gauss(1e6, 3.0) for _ in range(600)]
+        full = Matrix.from_flat_list(values, 200, 3)
+
+        left = RunningStatistics(by='col')
+        for start in range(0, 288, 48):
+            left.update(Matrix.from_flat_list(values[start:start + 48], 16, 3))
+        right = RunningStatistics(by='col').update(Matrix.from_flat_list(values[288:], 104, 3))
+        merged = left.merge(right)
+        expected = MatrixStatistics.variance(full, by='col', ddof=1)
+
+        for got, want in zip(merged.variance(ddof=1)._flat(), expected._flat()):
+            self.assertAlmostEqual(got, want, places=6)
+        with self.assertRaises(ValueError):
+            merged.update(Matrix.zeros(2, 4))
+        with self.assertRaises(ValueError):
+            merged.merge(RunningStatistics())
+
+
+class TestRandom(unittest.TestCase):
+
+    def test_streams_are_reproducible_and_independent(self):
+        first = Generator(seed=7, stream=1)
+        again = Generator(seed=7, stream=1)
+        other = first.spawn(2)
+
+        self.assertEqual(list(first.uniform(64)), list(again.uniform(64)))
+        self.assertEqual(list(first.normal(33)), list(again.normal(33)))
+        self.assertNotEqual(list(Generator(7, 1).uniform(64)), list(other.uniform(64)))
+        # a draw depends only on its position in the stream
+        advanced = Generator(seed=7, stream=1)
+        advanced.uniform(1000)
+        self.assertEqual(list(advanced.normal(33)), list(Generator(7, 1, counter=1).normal(33)))
+
+    def test_distributions(self):
+        gen = Generator(seed=3)
+        n = 20000
+
+        uniform = MatrixRandom.random(100, 200, low=-0.5, high=1.5, generator=gen)
+        normal = MatrixRandom.normal(n, 1, mean=2.0, std=3.0, generator=gen)
+        truncated = gen.truncated_normal(n, std=2.0, bound=1.0)
+        mask = MatrixRandom.bernoulli(n, 1, p=0.25, scale=4.0, generator=gen)
+
+        self.assertEqual(uniform.shape(), (1, 100, 200))
+        self.assertTrue(all(-0.5 <= val < 1.5 for val in uniform._flat()))
+        self.assertAlmostEqual(MatrixStatistics.mean(normal), 2.0, delta=0.1)
+        self.assertAlmostEqual(MatrixStatistics.stddev(normal), 3.0, delta=0.1)
+        self.assertTrue(all(-2.0 <= val <= 2.0 for val in truncated))
+        self.assertEqual(set(mask._flat()), {0.0, 4.0})
+        self.assertAlmostEqual(MatrixStatistics.mean(mask), 1.0, delta=0.1)
+        ints = MatrixRandom.random_int(50, 50, low=1, high=3, generator=gen)
+        self.assertEqual(set(ints._flat()), {1.0, 2.0, 3.0})
+
+
+class TestLazy(unittest.TestCase):
+
+    def test_fused_chain_matches_eager(self):
+        x = Matrix([[[1, 2, 3], [4, 5, 6]], [[7, 8, 9], [10, 11, 12]]])
+        mean = x.sum(axis=-1, keepdims=True) / 3.0
+        gamma = Matrix([[1, 2, 3]])
+
+        eager = ((x - mean) / 2.0).multiply(gamma) + 1
+        with lazy():
+            deferred = ((x - mean) / 2.0).multiply(gamma) + 1
+
+        self.assertIsInstance(deferred, Expression)
+        self.assertEqual(deferred.shape(), (2, 2, 3))
+        self.assertEqual(deferred.data, eager.data)
+        self.assertEqual((x.lazy() * 2 - 1).exp().evaluate().data, (x * 2 - 1).exp().data)
+
+    def test_common_subexpressions_are_computed_once(self):
+        x = Matrix([[1, 2], [3, 4]])
+        with lazy():
+            y = (x - 1).multiply(x - 1) + (x - 1)
+
+        source = y._compile()[0]
+
+        self.assertEqual(source.count(' - '), 1)
+        self.assertEqual(y.data, [[[0, 2], [6, 12]]])
+
+    def test_eager_paths_inside_lazy_mode(self):
+        x = Matrix([[1, 2], [3, 4]])
+        buffer = x._buffer
+        with lazy():
+            x += 1
+            product = (x * 1.0) * Matrix.identity(2)
+
+        self.assertIs(x._buffer, buffer)
+        self.assertEqual(product.data, [[[2, 3], [4, 5]]])
+        with self.assertRaises(ValueError):
+            x.lazy() + Matrix([[1, 2, 3]])
+
+
+class TestDtypes(unittest.TestCase):
+
+    def test_round_trip_and_footprint(self):
+        x = Matrix([[0.1, -2.5, 3.0], [1e-3, 70000.0, -0.75]])
+
+        half, brain, small = x.astype('float16'), x.astype('bfloat16'), x.astype('int8')
+
+        self.assertEqual((half.itemsize, brain.itemsize, small.itemsize), (2, 2, 1))
+        self.assertEqual(half.nbytes, x.nbytes // 4)
+        self.assertEqual(half.data[0][0][1:], [-2.5, 3.0])
+        self.assertEqual(half.data[0][1][1], float('inf'))
+        self.assertEqual(brain.data[0][1][1], 70144.0)
+        self.assertEqual(small.data, [[[0, -2, 3], [0, 127, -1]]])
+        for got, want in zip(half._flat()[:4], x._flat()[:4]):
+            self.assertAlmostEqual(got, want, delta=1e-3 * abs(want))
+        for got, want in zip(brain._flat(), x._flat()):
+            self.assertAlmostEqual(got, want, delta=1e-2 * abs(want))
+        with self.assertRaises(ValueError):
+            x.astype('float8')
+
+    def test_int8_saturates_non_finite_values(self):
+        values = [float('inf'), float('-inf'), float('nan'), 1e300, -200.0, 2.5]
+
+        self.assertEqual(list(dtypes.encode(values, 'int8')), [127, -128, 0, 127, -128, 2])
+        self.assertEqual(Matrix([values]).astype('int8').data, [[[127, -128, 0, 127, -128, 2]]])
+
+    def test_arithmetic_and_in_place_updates(self):
+        x = Matrix([[1.0, 2.0], [3.0, 4.0]]).astype('float16')
+
+        y = x + 0.5
+        x += 0.25
+
+        self.assertEqual(y.dtype, 'float64')
+        self.assertEqual(y.data, [[[1.5, 2.5], [3.5, 4.5]]])
+        self.assertEqual((x.dtype, x.data), ('float16', [[[1.25, 2.25], [3.25, 4.25]]]))
+        self.assertEqual(x.transpose().contiguous().dtype, 'float16')
+        self.assertEqual((x * Matrix.identity(2)).data, x.data)
+
+
+class TestActivations(unittest.TestCase):
+
+    def test_values_on_batches(self):
+        x = Matrix([[[-2.0, 0.0], [1.0, 3.0]], [[-0.5, 0.5], [4.0, -4.0]]])
+
+        self.assertEqual(x.relu().data, [[[0.0, 0.0], [1.0, 3.0]], [[0.0, 0.5], [4.0, 0.0]]])
+        self.assertEqual(x.leaky_relu(0.1).data[1][1], [4.0, -0.4])
+        self.assertAlmostEqual(x.elu().data[0][0][0], math.expm1(-2.0))
+        for got, value in zip(x.sigmoid()._flat(), x._flat()):
+            self.assertAlmostEqual(got, 1.0 / (1.0 + math.exp(-value)))
+        for got, value in zip(x.silu()._flat(), x._flat()):
+            self.assertAlmostEqual(got, value / (1.0 + math.exp(-value)))
+        for exact, approx, value in zip(x.gelu()._flat(), x.gelu(approximate=True)._flat(), x._flat()):
+            self.assertAlmostEqual(exact, 0.5 * value * (1.0 + math.erf(value / math.sqrt(2.0))))
+            self.assertAlmostEqual(approx, exact, places=3)
+        self.assertEqual(x.tanh()._flat().tolist(), [math.tanh(v) for v in x._flat()])
+
+    def test_extreme_inputs_do_not_overflow(self):
+        x = Matrix([[-1000.0, 1000.0]])
+
+        self.assertEqual(x.sigmoid().data, [[[0.0, 1.0]]])
+        self.assertEqual(x.tanh().data, [[[-1.0, 1.0]]])
+        self.assertEqual(x.silu().data, [[[-0.0, 1000.0]]])
+        self.assertEqual(x.gelu().data, [[[-0.0, 1000.0]]])
+
+    def test_in_place_and_lazy(self):
+        x = Matrix([[[-1.0, 2.0]], [[3.0, -4.0]]])
+        buffer = x._buffer
+
+        result = ReLU(inplace=True).forward(x)
+        sigmoid = Sigmoid().forward(x.transpose())
+        with lazy():
+            fused = (x * 2.0 - 1.0).relu()
+
+        self.assertIs(result, x)
+        self.assertIs(x._buffer, buffer)
+        self.assertEqual(x.data, [[[0.0, 2.0]], [[3.0, 0.0]]])
+        self.assertEqual(sigmoid.shape(), (2, 2, 1))
+        self.assertIsInstance(fused, Expression)
+        self.assertEqual(fused.data, [[[0.0, 3.0]], [[5.0, 0.0]]])
+        self.assertEqual(GELU(approximate=True).forward(x).shape(), x.shape())
+
+
+class TestNorms(unittest.TestCase):
+
+    def setUp(self):
+        self.x = Matrix.from_flat_list([random.uniform(-3, 3) for _ in range(2 * 3 * 5)], 3, 5, 2)
+        self.gamma = Matrix([[random.uniform(0.5, 1.5) for _ in range(5)]])
+        self.beta = Matrix([[random.uniform(-1, 1) for _ in range(5)]])
+
+    def test_layer_norm_matches_the_unfused_steps(self):
+        mean = self.x.mean(axis=-1, keepdims=True)
+        variance = self.x.var(axis=-1, keepdims=True)
+        expected = ((self.x - mean) / (variance + 1e-5).sqrt()).multiply(self.gamma) + self.beta
+
+        for got, want in zip(self.x.layer_norm(self.gamma, self.beta)._flat(), expected._flat()):
+            self.assertAlmostEqual(got, want)
+        with self.assertRaises(ValueError):
+            self.x.layer_norm(Matrix([[1.0, 2.0]]))
+
+    def test_rms_norm_and_in_place(self):
+        rms = (self.x.multiply(self.x).mean(axis=-1, keepdims=True) + 1e-5).sqrt()
+        expected = (self.x / rms).multiply(self.gamma)
+        x = self.x.contiguous()
+        buffer = x._buffer
+
+        result = x.rms_norm(self.gamma, out=x)
+
+        self.assertIs(result, x)
+        self.assertIs(x._buffer, buffer)
+        for got, want in zip(x._flat(), expected._flat()):
+            self.assertAlmostEqual(got, want)
+
+    def test_large_offsets_keep_their_variance(self):
+        x = Matrix([[1e9 + 1.0, 1e9 + 2.0, 1e9 + 3.0]])
+
+        for got, want in zip(x.layer_norm(epsilon=0.0)._flat(), (-math.sqrt(1.5), 0.0, math.sqrt(1.5))):
+            self.assertAlmostEqual(got, want)
+
+
+class TestLinear(unittest.TestCase):
+
+    def setUp(self):
+        self.x = Matrix([[[random.uniform(-1, 1) for _ in range(13)] for _ in range(7)] for _ in range(2)])
+        self.w = Matrix([[random.uniform(-1, 1) for _ in range(11)] for _ in range(13)])
+        self.b = Matrix([[random.uniform(-1, 1) for _ in range(11)]])
+
+    def assertAllClose(self, got, want):
+        self.assertEqual(got.shape(), want.shape())
+        for a, b in zip(got._flat(), want._flat()):
+            self.assertAlmostEqual(a, b)
+
+    def test_matches_unfused(self):
+        self.assertAllClose(self.x.linear(self.w), self.x * self.w)
+        self.assertAllClose(self.x.linear(self.w, self.b), self.x * self.w + self.b)
+        self.assertAllClose(self.x.linear(self.w, self.b, 'relu'), (self.x * self.w + self.b).relu())
+        self.assertAllClose(self.x.linear(self.w.transpose().contiguous().transpose(), None, 'gelu'), (self.x * self.w).gelu())
+        with self.assertRaises(ValueError):
+            self.x.linear(self.w, Matrix([[1.0, 2.0]]))
+        with self.assertRaises(ValueError):
+            self.x.linear(self.w, activation='softmax')
+
+    def test_epilogue_runs_once_after_every_k_panel(self):
+        step = kernels.epilogue(self.b._flat(), 'silu')
+        result, shape = kernels.matmul(self.x._flat(), self.x.shape(), self.w._flat(), self.w.shape(),
+                                       block_size=4, k_block=5, step=step)
+
+        self.assertAllClose(Matrix.from_buffer(result, shape), (self.x * self.w + self.b).silu())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import math
+import unittest
+from tools.matrix.matrix import Matrix
+from transformer.core.autograd import Tensor
+from transformer.core.optimizers import AdamW, Momentum, SGD
+
+
+GRADIENTS = [[[0.5, -1.0, 0.25]], [[-0.2, 0.4, 1.5]], [[0.1, 0.0, -0.3]]]
+
+
+class TestOptimizers(unittest.TestCase):
+
+    def setUp(self):
+        self.start = [[1.0, -2.0, 0.5]]
+        self.param = Tensor(Matrix([row[:] for row in self.start]), requires_grad=True)
+
+    def run_steps(self, optimizer, buffers):
+        # every step must update the parameter and state in place
+        data = self.param.data
+        objects = [list(group) for group in buffers]
+        for grad in GRADIENTS:
+            self.param.grad = Matrix(grad)
+            optimizer.step()
+            self.assertIs(self.param.data, data)
+            for group, before in zip(buffers, objects):
+                for buffer, original in zip(group, before):
+                    self.assertIs(buffer, original)
+        return self.param.data._flat().tolist()
+
+    def assertListAlmostEqual(self, got, expected):
+        for a, b in zip(got, expected):
+            self.assertAlmostEqual(a, b, places=12)
+
+    def test_sgd(self):
+        got = self.run_steps(SGD([self.param], lr=0.1), [])
+
+        expected = self.start[0][:]
+        for grad in GRADIENTS:
+            expected = [p - 0.1 * g for p, g in zip(expected, grad[0])]
+        self.assertListAlmostEqual(got, expected)
+
+    def test_momentum(self):
+        optimizer = Momentum([self.param], lr=0.1, momentum=0.9)
+        got = self.run_steps(optimizer, [optimizer.velocity])
+
+        expected = self.start[0][:]
+        velocity = [0.0] * 3
+        for grad in GRADIENTS:
+            velocity = [0.9 * u + 0.1 * g for u, g in zip(velocity, grad[0])]
+            expected = [p - u for p, u in zip(expected, velocity)]
+        self.assertListAlmostEqual(got, expected)
+
+    def test_adamw_matches_textbook_update(self):
+        lr, beta1, beta2, eps, weight_decay = 0.01, 0.9, 0.999, 1e-8, 0.1
+        optimizer = AdamW([self.param], lr=lr, beta1=beta1, beta2=beta2, eps=eps, weight_decay=weight_decay)
+        got = self.run_steps(optimizer, [optimizer.m, optimizer.v, optimizer.denom])
+
+        # decoupled weight decay, then Adam with bias-corrected m_hat and v_hat
+        expected = self.start[0][:]
+        m = [0.0] * 3
+        v = [0.0] * 3
+        for t, grad in enumerate(GRADIENTS, start=1):
+            expected = [p * (1 - lr * weight_decay) for p in expected]
+            m = [beta1 * a + (1 - beta1) * g for a, g in zip(m, grad[0])]
+            v = [beta2 * a + (1 - beta2) * g * g for a, g in zip(v, grad[0])]
+            m_hat = [a / (1 - beta1 ** t) for a in m]
+            v_hat = [a / (1 - beta2 ** t) for a in v]
+            expected = [p - lr * a / (math.sqrt(b) + eps) for p, a, b in zip(expected, m_hat, v_hat)]
+        self.assertListAlmostEqual(got, expected)
+        self.assertListAlmostEqual(optimizer.m[0]._flat().tolist(), m)
+        self.assertListAlmostEqual(optimizer.v[0]._flat().tolist(), v)
+        self.assertEqual(optimizer.t, len(GRADIENTS))
+
+    def test_parameters_without_gradients_are_skipped(self):
+        self.param.grad = None
+        AdamW([self.param]).step()
+
+        self.assertEqual(self.param.data._flat().tolist(), self.start[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+from tools.matrix.attention import AttentionPattern, MatrixAttention
+from tools.matrix.matrix import Matrix
+from tools.matrix.packing import PackedSequence
+from tools.matrix.random import MatrixRandom
+from tools.matrix.rng import Generator, manual_seed
+from transformer.layers.transformer_block import TransformerBlock
+
+
+class TestPackedSequence(unittest.TestCase):
+
+    def setUp(self):
+        generator = Generator(seed=12)
+        self.sequences = [MatrixRandom.normal(length, 4, generator=generator) for length in (3, 0, 5, 1)]
+        self.packed = PackedSequence.pack(self.sequences)
+
+    def test_pack_unpack_and_padding(self):
+        self.assertEqual(self.packed.cu_seqlens, [0, 3, 3, 8, 9])
+        self.assertEqual(self.packed.tokens.shape(), (1, 9, 4))
+        for sequence, view in zip(self.sequences, self.packed.unpack()):
+            self.assertEqual(view.shape(), sequence.shape())
+            self.assertEqual(view._flat().tolist(), sequence._flat().tolist())
+
+        padded = self.packed.to_padded()
+        self.assertEqual(padded.shape(), (4, 5, 4))
+        self.assertEqual(padded.data[0][3:], [[0.0] * 4] * 2)
+        repacked = PackedSequence.from_padded(padded, self.packed.lengths)
+        self.assertEqual(repacked.tokens.data, self.packed.tokens.data)
+        self.assertEqual(repacked.cu_seqlens, self.packed.cu_seqlens)
+        with self.assertRaises(ValueError):
+            PackedSequence(self.packed.tokens, [0, 3, 10])
+
+    def test_residual_add(self):
+        doubled = self.packed + self.packed
+
+        self.assertEqual(doubled.cu_seqlens, self.packed.cu_seqlens)
+        self.assertEqual(doubled.tokens.data, (self.packed.tokens * 2.0).data)
+        with self.assertRaises(ValueError):
+            self.packed + PackedSequence.pack(self.sequences[:2])
+
+    def test_attention_stays_within_sequences(self):
+        q, k, v = (MatrixRandom.normal(9, 4, generator=Generator(seed=seed)).reshape(1, 1, 9, 4) for seed in (1, 2, 3))
+        pattern = AttentionPattern.sliding_window(1, causal=True)
+
+        for inner in (None, pattern):
+            out = MatrixAttention.sparse(q, k, v, self.packed.attention_pattern(inner))
+            for start, end in zip(self.packed.cu_seqlens, self.packed.cu_seqlens[1:]):
+                if start == end:
+                    continue
+                rows = [Matrix(x.data[0][0][start:end]).reshape(1, 1, end - start, 4) for x in (q, k, v)]
+                if inner is None:
+                    expected = MatrixAttention.scaled_dot_product(*rows)
+                else:
+                    expected = MatrixAttention.sparse(*rows, pattern)
+                for got, want in zip(Matrix(out.data[0][0][start:end])._flat(), expected._flat()):
+                    self.assertAlmostEqual(got, want)
+
+    def test_transformer_block_matches_per_sequence(self):
+        manual_seed(5)
+        block = TransformerBlock(embed_size=4, num_heads=2, ff_hidden_size=8, dropout=0.0)
+
+        out = block.forward(self.packed)
+
+        self.assertIsInstance(out, PackedSequence)
+        self.assertEqual(out.cu_seqlens, self.packed.cu_seqlens)
+        for sequence, got in zip(self.sequences, out.unpack()):
+            if sequence.rows == 0:
+                continue
+            expected = block.forward(sequence.reshape(1, sequence.rows, 4))
+            for a, b in zip(got._flat(), expected._flat()):
+                self.assertAlmostEqual(a, b)
+
+    def test_transformer_block_dropout(self):
+        manual_seed(6)
+        block = TransformerBlock(embed_size=4, num_heads=2, ff_hidden_size=8, dropout=0.5)
+        padded = self.packed.to_padded()
+
+        block.training = False
+        expected = block.forward(self.packed).tokens.data
+        self.assertEqual(block.forward(self.packed).tokens.data, expected)
+
+        block.training = True
+        self.assertNotEqual(block.forward(self.packed).tokens.data, expected)
+        self.assertNotEqual(block.forward(padded).data, block.forward(padded).data)
+        with self.assertRaises(ValueError):
+            TransformerBlock(embed_size=4, num_heads=2, ff_hidden_size=8, dropout=1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+from tools.matrix.matrix import Matrix
+from tools.matrix.quantization import MatrixQuantization, PostTrainingQuantizer, QuantizedMatrix
+from tools.matrix.random import MatrixRandom
+from tools.matrix.rng import Generator
+
+
+class TinyLinear:
+    # smallest layer following the PostTrainingQuantizer protocol
+    QUANTIZABLE = ('weight',)
+
+    def __init__(self, weight):
+        self.weight = weight
+        self.quantized = {}
+        self.observers = {}
+
+    def forward(self, x):
+        if 'weight' in self.observers:
+            self.observers['weight'].observe(x)
+        if 'weight' in self.quantized:
+            return MatrixQuantization.matmul(x, *self.quantized['weight'])
+        return x * self.weight
+
+
+class TestQuantization(unittest.TestCase):
+
+    def setUp(self):
+        self.weight = MatrixRandom.normal(16, 8, generator=Generator(seed=4))
+        self.inputs = [MatrixRandom.normal(5, 16, batch_size=2, generator=Generator(seed=i)) for i in range(3)]
+
+    def test_per_channel_weights(self):
+        weight = Matrix([[0.5, -4.0, 0.0], [-1.0, 2.0, 0.0]])
+
+        quantized = QuantizedMatrix.from_matrix(weight)
+
+        self.assertEqual(quantized.values.dtype, 'int8')
+        self.assertEqual(quantized.values.data, [[[64, -127, 0], [-127, 64, 0]]])
+        self.assertEqual(quantized.scales.data, [[[1.0 / 127, 4.0 / 127, 1.0]]])
+        self.assertEqual(quantized.nbytes, 6 + 3 * 8)
+        for got, want in zip(quantized.dequantize()._flat(), weight._flat()):
+            self.assertAlmostEqual(got, want, delta=0.02)
+
+    def test_stacked_weights_get_their_own_scales(self):
+        weight = Matrix([[[1.0, -2.0], [0.5, 1.0]], [[4.0, 0.0], [-8.0, 0.25]]])
+        x = Matrix([[2.0, -1.0]])
+
+        quantized = QuantizedMatrix.from_matrix(weight)
+
+        self.assertEqual(quantized.scales.shape(), (2, 1, 2))
+        self.assertEqual(quantized.scales.data, [[[1.0 / 127, 2.0 / 127]], [[8.0 / 127, 0.25 / 127]]])
+        result = MatrixQuantization.matmul(x, quantized, 2.0 / 127)
+        for got, want in zip(result._flat(), (x * weight)._flat()):
+            self.assertAlmostEqual(got, want, delta=0.2)
+
+    def test_int8_matmul_is_exact_on_the_grid(self):
+        x = Matrix([[[1, -2, 3]], [[-127, 127, 0]]])
+        weight = QuantizedMatrix.from_matrix(Matrix([[1.0, 2.0], [-1.0, 0.5], [0.25, -2.0]]))
+
+        result = MatrixQuantization.matmul(x, weight, 1.0)
+
+        self.assertEqual(result.shape(), (2, 1, 2))
+        self.assertEqual(result.data, (x * weight.dequantize()).data)
+        with self.assertRaises(ValueError):
+            MatrixQuantization.matmul(Matrix([[1, 2]]), weight, 1.0)
+
+    def test_overflowed_activations_saturate(self):
+        x = Matrix([[float('inf'), -float('inf'), 0.5, 1000.0]])
+
+        self.assertEqual(MatrixQuantization.quantize_activations(x, 1.0 / 127).data, [[[127, -128, 64, 127]]])
+
+    def test_calibration_and_report(self):
+        layer = TinyLinear(self.weight)
+        reference = [x * self.weight for x in self.inputs]
+
+        report = PostTrainingQuantizer(keep_float=False).quantize(layer, self.inputs)
+
+        self.assertIsNone(layer.weight)
+        self.assertEqual(layer.observers, {})
+        self.assertEqual(layer.quantized['weight'][1], max(x.abs().max() for x in self.inputs) / 127)
+        self.assertEqual((report['float_bytes'], report['int8_bytes']), (16 * 8 * 8, 16 * 8 + 8 * 8))
+        self.assertLess(report['relative_error'], 0.02)
+        self.assertEqual(MatrixQuantization.report(reference, [layer.forward(x) for x in self.inputs]),
+                         {key: report[key] for key in ('max_abs_error', 'mean_abs_error', 'relative_error')})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import random
+import unittest
+from tools.matrix.matrix import Matrix
+from tools.matrix.sparse import SparseMatrix
+
+
+class TestSparseMatrix(unittest.TestCase):
+
+    def setUp(self):
+        self.dense = Matrix([[0, 2, 0, 0], [0, 0, 0, 0], [1, 0, 0, 3]])
+        self.sparse = SparseMatrix.from_dense(self.dense)
+
+    def test_conversions(self):
+        self.assertEqual(self.sparse.nnz, 3)
+        self.assertEqual(list(self.sparse.indptr), [0, 1, 1, 3])
+        self.assertEqual(self.sparse.to_dense().data, self.dense.data)
+        self.assertEqual(self.sparse.to_coo(), ([0, 2, 2], [1, 0, 3], [2.0, 1.0, 3.0]))
+        rebuilt = SparseMatrix.from_coo([2, 0, 2, 2], [3, 1, 0, 3], [1.0, 2.0, 1.0, 2.0], (3, 4))
+        self.assertEqual(rebuilt.to_dense().data, self.dense.data)
+        self.assertEqual(self.sparse.transpose().to_dense().data, self.dense.transpose().data)
+        with self.assertRaises(ValueError):
+            SparseMatrix.from_coo([3], [0], [1.0], (3, 4))
+        with self.assertRaises(ValueError):
+            SparseMatrix([0, 1], [10], [1.0], (1, 5))
+
+    def test_matmul_matches_dense(self):
+        other = Matrix([[[random.uniform(-1, 1) for _ in range(5)] for _ in range(4)] for _ in range(2)])
+
+        result = self.sparse * other
+        expected = self.dense * other
+
+        self.assertEqual(result.shape(), (2, 3, 5))
+        for got, want in zip(result._flat(), expected._flat()):
+            self.assertAlmostEqual(got, want)
+        self.assertEqual((2 * self.sparse).to_dense().data, (self.dense * 2).data)
+
+    def test_sampled_matmul_and_mask(self):
+        a = Matrix([[random.uniform(-1, 1) for _ in range(2)] for _ in range(3)])
+        b = Matrix([[random.uniform(-1, 1) for _ in range(4)] for _ in range(2)])
+        full = a * b
+
+        sampled = self.sparse.sampled_matmul(a, b).to_dense()._flat()
+        masked = self.sparse.apply_mask(Matrix([full.data[0], full.data[0]]))
+
+        for pos, (got, want) in enumerate(zip(sampled, full._flat())):
+            self.assertAlmostEqual(got, want if pos in (1, 8, 11) else 0.0)
+        self.assertEqual(masked.shape(), (2, 3, 4))
+        self.assertEqual(masked.data[1][2][3], full.data[0][2][3])
+        self.assertEqual(masked.data[1][1][1], float('-inf'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+from tools.matrix.matrix import Matrix
+from tools.matrix.rng import Generator
+from tools.matrix.random import MatrixRandom
+from tools.matrix.storage import MatrixStorage
+
+
+class TestMatrixStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'matrix.bin')
+        self.matrix = MatrixRandom.normal(6, 4, batch_size=3, generator=Generator(seed=1))
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_round_trip_of_a_view(self):
+        view = self.matrix.transpose()
+        MatrixStorage.save(view, self.path, chunk_rows=3)
+
+        shape, strides, typecode, offset = MatrixStorage.read_header(self.path)
+        loaded = MatrixStorage.load(self.path)
+
+        self.assertEqual((shape, strides, typecode), ((3, 4, 6), (24, 6, 1), 'd'))
+        self.assertEqual(offset % 64, 0)
+        self.assertIsInstance(loaded._buffer, memoryview)
+        self.assertEqual(loaded.data, view.data)
+
+    def test_modes(self):
+        MatrixStorage.save(self.matrix, self.path)
+
+        read_only = MatrixStorage.load(self.path)
+        read_only += 1
+        private = MatrixStorage.load(self.path, 'c')
+        private *= 0
+        self.assertIsInstance(private._buffer, memoryview)
+        self.assertEqual(MatrixStorage.load(self.path).data, self.matrix.data)
+
+        shared = MatrixStorage.load(self.path, 'r+')
+        shared *= 0
+        MatrixStorage.flush(shared)
+        self.assertEqual(MatrixStorage.load(self.path).sum(), 0.0)
+        with self.assertRaises(ValueError):
+            MatrixStorage.load(self.path, 'w')
+
+    def test_chunked_iterators(self):
+        MatrixStorage.save(self.matrix, self.path)
+        mapped = MatrixStorage.load(self.path)
+
+        rows = list(MatrixStorage.iter_rows(mapped, 4))
+        batches = list(MatrixStorage.iter_batches(mapped, 2))
+
+        self.assertEqual([chunk.shape() for chunk in rows], [(3, 4, 4), (3, 2, 4)])
+        self.assertEqual([chunk.shape() for chunk in batches], [(2, 6, 4), (1, 6, 4)])
+        self.assertTrue(all(chunk._buffer is mapped._buffer for chunk in rows + batches))
+        self.assertEqual(batches[1].data, [self.matrix.data[2]])
+
+    def test_reductions_over_a_mapped_buffer(self):
+        MatrixStorage.save(self.matrix, self.path)
+        mapped = MatrixStorage.load(self.path)
+
+        self.assertIsInstance(mapped._buffer, memoryview)
+        self.assertEqual(mapped.argmax(), self.matrix.argmax())
+        for axis in (-1, 1, 0):
+            self.assertEqual(mapped.argmax(axis=axis).data, self.matrix.argmax(axis=axis).data)
+            self.assertEqual(mapped.max(axis=axis).data, self.matrix.max(axis=axis).data)
+
+        # ties keep the first index
+        MatrixStorage.save(Matrix([[1.0, 3.0, 3.0, 2.0]]), self.path)
+        self.assertEqual(MatrixStorage.load(self.path).argmax(), 1.0)
+
+    def test_create_fills_in_place(self):
+        out = MatrixStorage.create(self.path, (2, 3, 5))
+        out += Matrix([[1, 2, 3, 4, 5]])
+        MatrixStorage.flush(out)
+
+        self.assertEqual(MatrixStorage.load(self.path).sum(), 2 * 3 * 15)
+        with open(self.path, 'r+b') as f:
+            f.write(b'NOTAMTRX')
+        with self.assertRaises(ValueError):
+            MatrixStorage.load(self.path)
+
+    def test_reduced_precision_files(self):
+        half = self.matrix.astype('float16')
+        MatrixStorage.save(half, self.path)
+
+        loaded = MatrixStorage.load(self.path)
+
+        self.assertEqual(MatrixStorage.read_header(self.path)[2], 'e')
+        self.assertEqual(os.path.getsize(self.path) - MatrixStorage.read_header(self.path)[3], half.nbytes)
+        self.assertEqual((loaded.dtype, loaded.data), ('float16', half.data))
+        self.assertEqual(MatrixStorage.create(self.path, (2, 3, 4), dtype='int8').nbytes, 24)
+
+
+if __name__ == '__main__':
+    unittest.main()
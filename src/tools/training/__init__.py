@@ -1,14 +1,13 @@
-from .ipc import IPC
 from .memory_management import MemoryManager
-from .fixed_precision import FixedPrecisionHandler  
-from .parallelization import Parallelizer  
+from .fixed_precision import FixedPrecision
+from .mixed_precision import MixedPrecision
+from .parallelization import Parallelization
 from .gradient_checkpointing import GradientCheckpointing
 
 __all__ = [
-    'IPC',
     'MemoryManager',
-    'FixedPrecisionHandler',
-    'Optimizer',
-    'Parallelizer',
+    'FixedPrecision',
+    'MixedPrecision',
+    'Parallelization',
     'GradientCheckpointing'
 ]
@@ -1,5 +1,5 @@
 import gc
-from matrix import Matrix  
+from ..matrix import Matrix
 
 class MemoryManager:
     @staticmethod
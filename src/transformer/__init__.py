@@ -1,28 +1,28 @@
 # Importing from the matrix module
-from ..tools.matrix.matrix import Matrix
-from ..tools.matrix.core import *
-from ..tools.matrix.algebra import *
-from ..tools.matrix.random import *
-from ..tools.matrix.statistics import *
-from ..tools.matrix.utils import *
+from tools.matrix.matrix import Matrix
+from tools.matrix.core import *
+from tools.matrix.algebra import *
+from tools.matrix.random import *
+from tools.matrix.statistics import *
+from tools.matrix.utils import *
 
-from ..transformer.core.advanced import ActivationFunctions, Dropout, MatrixNormalization, GradientDescent
+from .core.advanced import ActivationFunctions, Dropout, MatrixNormalization, GradientDescent
 
-from ..transformer.core.autograd import Tensor
+from .core.autograd import Tensor
 
-from ..transformer.core.optimizers import AdamW, SGD, Momentum
+from .core.optimizers import AdamW, SGD, Momentum
 
-from ..transformer.core.parallelization import parallel_map, distribute_matrices
+from .core.parallelization import parallel_map
 
-from ..transformer.core.memory_management import gradient_checkpointing, memory_efficient_attention, out_of_core_processing
+from .core.memory_management import memory_efficient_attention, out_of_core_processing
 
-from ..transformer.layers.multihead_attention import MultiHeadAttention
-from ..transformer.layers.feedforward import FeedForward
-from ..transformer.layers.normalization import LayerNormalization
-from ..transformer.layers.transformer_block import TransformerBlock
+from .layers.multihead_attention import MultiHeadSelfAttention
+from .layers.feedforward import FeedForwardLayer
+from .layers.normalization import LayerNormalization
+from .layers.transformer_block import TransformerBlock
 
-from .core.encoding import PositionalEncoding
-from .core.tokenizer import Tokenizer
+from .core.encoding import get_positional_encoding
+from .core.tokenizer import AdvancedTokenizer
 
 __all__ = [
     'Matrix',
@@ -33,12 +33,12 @@ __all__ = [
     
     'AdamW', 'SGD', 'Momentum',
     
-    'parallel_map', 'distribute_matrices',
+    'parallel_map',
     
-    'gradient_checkpointing', 'memory_efficient_attention', 'out_of_core_processing',
+    'memory_efficient_attention', 'out_of_core_processing',
     
-    'MultiHeadAttention', 'FeedForward', 'LayerNormalization', 'TransformerBlock',
+    'MultiHeadSelfAttention', 'FeedForwardLayer', 'LayerNormalization', 'TransformerBlock',
 
-    'PositionalEncoding', 'Tokenizer',
+    'get_positional_encoding', 'AdvancedTokenizer',
 ]
 
@@ -1,37 +1,48 @@
-from ....tools.matrix.matrix import Matrix
-from ....tools.matrix.algebra import MatrixAlgebra
+from tools.matrix.matrix import Matrix
+from tools.matrix.algebra import MatrixAlgebra
 import math
-import random
-from ....tools.matrix.statistics import Statistics
+from tools.matrix.rng import default_generator
+from tools.matrix.statistics import MatrixStatistics
 
 class ActivationFunctions:
+    # thin aliases of the Matrix activation kernels shared with tools.activation
+
     @staticmethod
     def relu(matrix):
-        return Matrix([[max(0, val) for val in row] for row in matrix.data])
+        return matrix.relu()
 
     @staticmethod
     def sigmoid(matrix):
-        return Matrix([[1 / (1 + math.exp(-val)) for val in row] for row in matrix.data])
+        return matrix.sigmoid()
 
     @staticmethod
     def tanh(matrix):
-        return Matrix([[math.tanh(val) for val in row] for row in matrix.data])
+        return matrix.tanh()
+
+    @staticmethod
+    def gelu(matrix, approximate=False):
+        return matrix.gelu(approximate)
+
+    @staticmethod
+    def silu(matrix):
+        return matrix.silu()
 
 class Dropout:
-    def __init__(self, drop_prob):
+    def __init__(self, drop_prob, generator=None):
         self.drop_prob = drop_prob
+        self.generator = generator
 
     def apply(self, matrix):
-        mask = [[1 if random.random() > self.drop_prob else 0 for _ in range(matrix.cols)] for _ in range(matrix.rows)]
-        return Matrix([[val * mask[i][j] for j, val in enumerate(row)] for i, row in enumerate(matrix.data)])
+        # keep each element with probability 1 - drop_prob, drawn in one bulk call
+        mask = (self.generator or default_generator()).bernoulli(matrix.size, 1 - self.drop_prob)
+        return matrix.multiply(Matrix.from_buffer(mask, matrix.shape()))
 
 class MatrixNormalization:
     @staticmethod
     def layer_norm(matrix, eps=1e-5):
-        mean = Statistics.mean(matrix)
-        variance = Statistics.variance(matrix)
-        normalized = Matrix([[(val - mean) / math.sqrt(variance + eps) for val in row] for row in matrix.data])
-        return normalized
+        mean = MatrixStatistics.mean(matrix)
+        variance = MatrixStatistics.variance(matrix)
+        return (matrix - mean) / math.sqrt(variance + eps)
 
 class GradientDescent:
     def __init__(self, learning_rate=0.01):
@@ -1,4 +1,4 @@
-from ....tools.matrix.matrix import Matrix
+from tools.matrix.matrix import Matrix
 class Tensor:
     def __init__(self, data, requires_grad=False):
         self.data = data
@@ -1,5 +1,5 @@
 from typing import Optional
-from ...tools.matrix.matrix import Matrix
+from tools.matrix.matrix import Matrix
 
 def get_positional_encoding(seq_len: int, d_model: int, batch_size: Optional[int] = None, mode: str = 'sin_cos') -> Matrix:
     """
@@ -1,3 +1,3 @@
-from .memory_management import gradient_checkpointing, memory_efficient_attention, out_of_core_processing
+from .memory_management import memory_efficient_attention, out_of_core_processing
 
-__all__ = ['gradient_checkpointing', 'memory_efficient_attention', 'out_of_core_processing']
+__all__ = ['memory_efficient_attention', 'out_of_core_processing']
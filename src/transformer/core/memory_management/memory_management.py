@@ -1,39 +1,109 @@
-from ....tools.matrix.utils import MatrixUtils
-from ....tools.matrix import Matrix
-import math
+from tools.matrix.attention import MatrixAttention
+from tools.matrix.sparse import SparseMatrix
+from tools.matrix.storage import MatrixStorage
+from tools.matrix.kernels import ATTENTION_BLOCK_SIZE, TYPECODE
+from tools.matrix import Matrix
+from array import array
+import os
 
 def apply_mask(attention_scores, mask):
-    """Apply the given mask to the attention scores."""
-    masked_scores = []
-    for i, row in enumerate(attention_scores.data):
-        masked_row = []
-        for j, score in enumerate(row):
-            if mask.data[i][j] == 0:  # assuming the mask is 0 where attention should be blocked
-                masked_row.append(float('-inf'))  # assign -inf to prevent attention
+    """Apply the given mask to the attention scores.
+
+    The mask is 0 where attention should be blocked. A SparseMatrix mask is
+    used as is, so the work scales with its non-zeros; a dense mask is
+    converted first. Causal and padding masks need no mask matrix at all:
+    pass an AttentionMask to ``softmax`` instead.
+    """
+    if not isinstance(mask, SparseMatrix):
+        mask = SparseMatrix.from_dense(mask)
+    return mask.apply_mask(attention_scores)
+
+
+def memory_efficient_attention(Q, K, V, mask=None, causal=False, block_size=ATTENTION_BLOCK_SIZE):
+    """Attention that never builds the seq x seq score matrix.
+
+    Keys and values are walked in blocks of ``block_size`` with a running
+    max and sum (online softmax), so peak memory grows linearly with the
+    sequence length. Q, K and V may carry batch and head dimensions, e.g.
+    (batch, heads, seq, depth). ``mask`` is 0 where attention is blocked;
+    ``causal`` masks future positions without materializing a mask.
+    """
+    return MatrixAttention.scaled_dot_product(Q, K, V, mask=mask, causal=causal, block_size=block_size)
+
+def softmax(matrix, mask=None):
+    """ Softmax over the last axis of attention scores.
+
+    ``mask`` is an optional AttentionMask (causal, padding lengths and/or an
+    additive bias), applied while the softmax is computed so no masked copy
+    of the scores is made.
+    """
+    return MatrixAttention.softmax(matrix, mask)
+
+
+def log_softmax(matrix, mask=None):
+    """ Log-softmax over the last axis; masked positions are -inf. """
+    return MatrixAttention.log_softmax(matrix, mask)
+
+
+def _write_chunk(out, result, start, axis):
+    # copy one processed chunk into its place along the chunked axis of ``out``
+    flat = result._flat()
+    if axis == 0:
+        run = result.size
+        dest = start * (out.size // out.shape()[0])
+        out._buffer[dest:dest + run] = flat
+        return
+    run = result.rows * result.cols
+    for b in range(result.batch_size):
+        dest = (b * out.rows + start) * out.cols
+        out._buffer[dest:dest + run] = flat[b * run:(b + 1) * run]
+
+
+def out_of_core_processing(data, process_fn, chunk_size=1024, by='rows', output_path=None):
+    """
+    Streams a matrix through ``process_fn`` one chunk at a time.
+
+    Only the current chunk and its result are held in memory: the input can
+    be a memory-mapped file and the output can be written straight to one.
+
+    Args:
+        data (Matrix or str): Input matrix or the path of a matrix file, which
+            is mapped read-only.
+        process_fn (callable): Maps a chunk to a result with the same length
+            along the chunked axis, e.g. a layer's ``forward``.
+        chunk_size (int, optional): Rows or batch entries per chunk.
+        by (str, optional): ``'rows'`` chunks the rows of every batch;
+            ``'batches'`` chunks the leading axis.
+        output_path (str, optional): File to write the output to. When
+            omitted the output is collected in memory.
+
+    Returns:
+        Matrix: The output, memory-mapped when ``output_path`` is given.
+    """
+    if by not in ('rows', 'batches'):
+        raise ValueError("Chunking must be by 'rows' or 'batches'.")
+    source = MatrixStorage.load(data) if isinstance(data, (str, os.PathLike)) else data
+    axis = -2 if by == 'rows' else 0
+    chunks = MatrixStorage.iter_rows if by == 'rows' else MatrixStorage.iter_batches
+    out = None
+    start = 0
+    for chunk in chunks(source, chunk_size):
+        result = process_fn(chunk)
+        length = chunk.shape()[axis]
+        if result.shape()[axis] != length:
+            raise ValueError("process_fn must keep the length of the chunked axis ({} != {}).".format(result.shape()[axis], length))
+        if out is None:
+            shape = list(result.shape())
+            shape[axis] = source.shape()[axis]
+            if output_path is not None:
+                out = MatrixStorage.create(output_path, shape)
             else:
-                masked_row.append(score)
-        masked_scores.append(masked_row)
-    return Matrix(masked_scores)
-
-
-def memory_efficient_attention(Q, K, V, mask=None):
-    # compute attention matrix in chunks
-    attention_chunks = []
-    for i in range(Q.cols):  # process by columns or rows in chunks
-        q_chunk = Q[:, i:i+1]
-        attention_scores = q_chunk * K.transpose()  
-        if mask is not None:
-            attention_scores = apply_mask(attention_scores, mask)
-        attention_weights = softmax(attention_scores)  # apply softmax to get weights
-        context_chunk = attention_weights * V  # multiply by value matrix
-        attention_chunks.append(context_chunk)
-
-    # concatenate chunks to form the final attention matrix
-    return MatrixUtils.concatenate(*attention_chunks, axis=1)
-
-def softmax(matrix):
-    """ Simple softmax implementation for attention scores. """
-    max_vals = [[max(row) for row in matrix.data]]
-    exp_data = [[math.exp(val - max_vals[i]) for val in row] for i, row in enumerate(matrix.data)]
-    sum_exp_data = [sum(row) for row in exp_data]
-    return Matrix([[val / sum_exp_data[i] for val in row] for i, row in exp_data])
+                size = 1
+                for dim in shape:
+                    size *= dim
+                out = Matrix.from_buffer(array(TYPECODE, bytes(8 * size)), shape)
+        _write_chunk(out, result, start, axis)
+        start += length
+    if output_path is not None and out is not None:
+        MatrixStorage.flush(out)
+    return out
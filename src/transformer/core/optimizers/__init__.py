@@ -1,5 +1,5 @@
 from .sgd import SGD
 from .momentum import Momentum
-from .adam import Adam
+from .adam import AdamW
 
-__all__ = ['SGD', 'Momentum', 'Adam']
+__all__ = ['SGD', 'Momentum', 'AdamW']
@@ -1,4 +1,4 @@
-from ....tools.matrix.matrix import Matrix
+from tools.matrix.matrix import Matrix
 import math
 
 class AdamW:
@@ -11,6 +11,8 @@ class AdamW:
         self.weight_decay = weight_decay
         self.m = [Matrix.zeros_like(param.data) for param in params]
         self.v = [Matrix.zeros_like(param.data) for param in params]
+        # scratch buffers for sqrt(v_hat) + eps, reused every step
+        self.denom = [Matrix.zeros_like(param.data) for param in params]
         self.t = 0
 
     def step(self):
@@ -20,22 +22,29 @@ class AdamW:
                 continue
             
             # Apply weight decay
-            param.data -= self.lr * self.weight_decay * param.data
-            
+            param.data *= 1 - self.lr * self.weight_decay
+
             # Update biased first moment estimate
-            self.m[i] = self.beta1 * self.m[i] + (1 - self.beta1) * param.grad
-            
+            m = self.m[i]
+            m *= self.beta1
+            Matrix.axpy(1 - self.beta1, param.grad, m, out=m)
+
             # Update biased second moment estimate
-            self.v[i] = self.beta2 * self.v[i] + (1 - self.beta2) * (param.grad ** 2)
-            
-            # Compute bias-corrected first moment estimate
-            m_hat = self.m[i] / (1 - self.beta1 ** self.t)
-            
-            # Compute bias-corrected second moment estimate
-            v_hat = self.v[i] / (1 - self.beta2 ** self.t)
-            
+            v = self.v[i]
+            v *= self.beta2
+            Matrix.addcmul(v, 1 - self.beta2, param.grad, param.grad, out=v)
+
+            # Bias corrections are folded into scalars instead of m_hat / v_hat copies
+            bias_correction1 = 1 - self.beta1 ** self.t
+            bias_correction2 = 1 - self.beta2 ** self.t
+
+            # denom = sqrt(v_hat) + eps
+            denom = v.sqrt(out=self.denom[i])
+            denom /= math.sqrt(bias_correction2)
+            denom += self.eps
+
             # Update parameters
-            param.data -= self.lr * m_hat / (v_hat.sqrt() + self.eps)
+            Matrix.addcdiv(param.data, -self.lr / bias_correction1, m, denom, out=param.data)
 
     def zero_grad(self):
         for param in self.params:
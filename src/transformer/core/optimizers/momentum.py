@@ -1,4 +1,4 @@
-from ....tools.matrix.matrix import Matrix
+from tools.matrix.matrix import Matrix
 
 class Momentum:
     def __init__(self, params, lr=0.01, momentum=0.9):
@@ -10,8 +10,11 @@ class Momentum:
     def step(self):
         for i, param in enumerate(self.params):
             if param.grad is not None:
-                self.velocity[i] = self.momentum * self.velocity[i] + self.lr * param.grad
-                param.data -= self.velocity[i]
+                # velocity = momentum * velocity + lr * grad, updated in place
+                velocity = self.velocity[i]
+                velocity *= self.momentum
+                Matrix.axpy(self.lr, param.grad, velocity, out=velocity)
+                param.data -= velocity
 
     def zero_grad(self):
         for param in self.params:
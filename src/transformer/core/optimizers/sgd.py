@@ -1,4 +1,4 @@
-from ....tools.matrix.matrix import Matrix
+from tools.matrix.matrix import Matrix
 
 class SGD:
     def __init__(self, params, lr=0.01):
@@ -8,7 +8,8 @@ class SGD:
     def step(self):
         for param in self.params:
             if param.grad is not None:
-                param.data -= self.lr * param.grad
+                # param.data += -lr * grad, written in place
+                Matrix.axpy(-self.lr, param.grad, param.data, out=param.data)
 
     def zero_grad(self):
         for param in self.params:
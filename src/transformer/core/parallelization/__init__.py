@@ -0,0 +1,3 @@
+from .parallelization import parallel_map
+
+__all__ = ['parallel_map']
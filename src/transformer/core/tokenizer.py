@@ -1,5 +1,6 @@
 import re
 from collections import defaultdict, Counter
+from tools.matrix.sparse import SparseMatrix
 
 class BPE:
     def __init__(self, vocab_size):
@@ -158,3 +159,21 @@ class AdvancedTokenizer:
         """
         tokens = [self.reverse_vocab.get(id, '[UNK]') for id in token_ids]
         return ' '.join(tokens)
+
+    def one_hot(self, token_ids):
+        """
+        Encode token IDs as one-hot rows.
+
+        Args:
+            token_ids (list of int): The list of token IDs.
+
+        Returns:
+            SparseMatrix: A (len(token_ids), vocab size) matrix with a single
+            stored 1.0 per row. Multiplying it by an embedding table is an
+            embedding lookup. IDs outside the vocabulary raise ValueError.
+        """
+        vocab_size = max(len(self.vocab), self.bpe.vocab_size)
+        invalid = [token_id for token_id in token_ids if not 0 <= token_id < vocab_size]
+        if invalid:
+            raise ValueError("Token IDs {} are outside the vocabulary of {} tokens.".format(invalid, vocab_size))
+        return SparseMatrix(range(len(token_ids) + 1), token_ids, [1.0] * len(token_ids), (len(token_ids), vocab_size))
@@ -1,53 +1,46 @@
 # training/feed_forward_layer.py
-import random
 import math
-from tools.matrix import Matrix
-from tools.activation import ReLU
+from tools.matrix import Matrix, MatrixRandom, PackedSequence
+from tools.matrix.quantization import MatrixQuantization
 
 class FeedForwardLayer:
-    def __init__(self, input_dim, hidden_dim):
+    # weights PostTrainingQuantizer may replace with int8 copies
+    QUANTIZABLE = ('weights1', 'weights2')
+
+    def __init__(self, input_dim, hidden_dim, activation='relu'):
         self.input_dim = input_dim
         self.hidden_dim = hidden_dim
+        self.activation = activation
         
         self.weights1 = self.he_initialization(input_dim, hidden_dim)
         self.biases1 = Matrix([[0.0] * hidden_dim])
         self.weights2 = self.he_initialization(hidden_dim, input_dim)
         self.biases2 = Matrix([[0.0] * input_dim])
-        self.relu = ReLU()
+        self.quantized = {}
+        self.observers = {}
 
     def he_initialization(self, in_dim, out_dim):
+        # one bulk draw from the default stream; see tools.matrix.manual_seed
         stddev = math.sqrt(2 / in_dim)
-        return Matrix([[self.normal_random(0, stddev) for _ in range(out_dim)] for _ in range(in_dim)])
-    
-    def normal_random(self, mean, stddev):
-        return mean + stddev * random.gauss(0, 1)
+        return MatrixRandom.normal(in_dim, out_dim, std=stddev)
 
     def forward(self, x):
-       
-       
-        # first linear transformation (input_dim -> hidden_dim)
-        x = self._matrix_multiply(x, self.weights1)
-        x = self._matrix_add(x, self.biases1)
-        
-        # ReLU activation
-        x = self.relu.forward(x)
-        
-        # second linear transformation (hidden_dim -> input_dim)
-        x = self._matrix_multiply(x, self.weights2)
-        x = self._matrix_add(x, self.biases2)
-        
-        return x
+        # packed sequences are plain rows of tokens; only real tokens are computed
+        if isinstance(x, PackedSequence):
+            return x.with_tokens(self.forward(x.tokens))
 
-    def _matrix_multiply(self, matrix_a, matrix_b):
-        
-        # matrix multiplication n
-        result = [[0] * matrix_b.cols for _ in range(matrix_a.rows)]
-        for i in range(matrix_a.rows):
-            for j in range(matrix_b.cols):
-                result[i][j] = sum(matrix_a.data[i][k] * matrix_b.data[k][j] for k in range(matrix_a.cols))
-        return Matrix(result)
+        # first linear transformation (input_dim -> hidden_dim); bias and
+        # activation are applied inside the matmul, so only its output is allocated
+        x = self._project(x, 'weights1', self.biases1, self.activation)
+
+        # second linear transformation (hidden_dim -> input_dim)
+        return self._project(x, 'weights2', self.biases2)
 
-    def _matrix_add(self, matrix_a, matrix_b):
-        # matrix addition 
-        result = [[matrix_a.data[i][j] + matrix_b.data[i][j] for j in range(matrix_a.cols)] for i in range(matrix_a.rows)]
-        return Matrix(result)
+    def _project(self, x, name, bias=None, activation=None):
+        # int8 kernel once quantized; an observer records the input range during calibration
+        if name in self.observers:
+            self.observers[name].observe(x)
+        if name in self.quantized:
+            return MatrixQuantization.matmul(x, *self.quantized[name], bias=bias, activation=activation)
+        # fused blocked kernel; a 2D weight is broadcast over every batch of x
+        return x.linear(getattr(self, name), bias, activation)
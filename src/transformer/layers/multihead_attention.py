@@ -1,55 +1,94 @@
-from ...tools.matrix.matrix import Matrix
+from tools.matrix.attention import KVCache, MatrixAttention
+from tools.matrix.matrix import Matrix
+from tools.matrix.packing import PackedSequence
+from tools.matrix.quantization import MatrixQuantization
 
 class MultiHeadSelfAttention:
-    def __init__(self, d_model, num_heads):
+    # projections PostTrainingQuantizer may replace with int8 copies
+    QUANTIZABLE = ('Wqkv', 'Wo')
+
+    def __init__(self, d_model, num_heads, pattern=None):
         self.d_model = d_model
         self.num_heads = num_heads
         self.depth = d_model // num_heads
+        # optional AttentionPattern (sliding window, dilated, global tokens,
+        # block-sparse) for long sequences; None is full attention
+        self.pattern = pattern
 
-        self.Wq = Matrix.random(d_model, d_model) 
-        self.Wk = Matrix.random(d_model, d_model)
-        self.Wv = Matrix.random(d_model, d_model)
+        # packed query/key/value weights, one (d_model, depth) block per
+        # projection and head, shaped (3, 1, heads, d_model, depth) so a
+        # single matmul writes q, k and v already split into heads
+        self.Wqkv = Matrix.random(d_model, self.depth, batch_size=3 * num_heads).reshape(
+            3, 1, num_heads, d_model, self.depth)
         self.Wo = Matrix.random(d_model, d_model)
+        self.quantized = {}
+        self.observers = {}
 
-    def split_heads(self, x, batch_size):
-        # reshape and transpose using custom Matrix operations
-        x = x.reshape(batch_size, -1, self.num_heads, self.depth)
-        return x.transpose((0, 2, 1, 3))
+    def _project(self, x, name):
+        # int8 kernel once quantized; an observer records the input range during calibration
+        if name in self.observers:
+            self.observers[name].observe(x)
+        if name in self.quantized:
+            return MatrixQuantization.matmul(x, *self.quantized[name])
+        return x.linear(getattr(self, name))
 
-    def scaled_dot_product_attention(self, q, k, v):
-        # matrix multiplication using your custom library
-        matmul_qk = Matrix.matmul(q, k.transpose(-2, -1))
-        
-        # scale the attention scores
-        dk = k.shape[-1]
-        scaled_attention_logits = matmul_qk / Matrix.sqrt(dk)
+    def project_qkv(self, x):
+        # (batch, seq, d_model) -> q, k and v of shape (batch, heads, seq, depth)
+        # from one matmul; the (3, batch, heads, seq, depth) result is split into views
+        batch_size = x.shape()[0]
+        qkv = self._project(x.reshape(1, batch_size, 1, -1, self.d_model), 'Wqkv')
+        return qkv.unbind()
 
-        # apply softmax to the attention scores
-        attention_weights = Matrix.exp(scaled_attention_logits)
-        attention_weights = attention_weights / Matrix.sum(attention_weights, axis=-1, keepdims=True)
+    def scaled_dot_product_attention(self, q, k, v, mask=None):
+        # softmax(q k^T / sqrt(dk)) v with an online softmax over key blocks;
+        # the (seq, seq) attention weights are never materialized. The result
+        # is (batch, seq, heads, depth), i.e. the heads are already concatenated.
+        # With a sparse pattern only the allowed (query, key) pairs are scored
+        if self.pattern is not None and mask is None:
+            return MatrixAttention.sparse(q, k, v, self.pattern, heads_last=True)
+        return MatrixAttention.scaled_dot_product(q, k, v, mask=mask, heads_last=True)
 
-        output = Matrix.matmul(attention_weights, v)
-        return output
+    def init_cache(self, batch_size, max_length):
+        # empty key/value cache for decoding up to max_length positions with forward(x, cache)
+        return KVCache(batch_size, self.num_heads, max_length, self.depth)
+
+    def forward(self, x, cache=None):
+        """
+        Multi-head self-attention over ``x`` of shape (batch, seq, d_model).
+
+        With a ``cache`` (see ``init_cache``) this is a decoding step: only
+        the new positions in ``x`` are projected, their keys and values are
+        appended to the cache, and they attend causally to every cached
+        position, so each generated token costs O(seq) instead of
+        re-running the whole prefix. Feeding the prompt first fills the
+        cache in a single call.
 
-    def forward(self, x):
-        batch_size = x.shape[0]
+        ``x`` may also be a PackedSequence: the concatenated tokens of
+        sequences of different lengths are projected together and every
+        token attends only within its own sequence, so no padding is
+        computed. The result is packed the same way.
+        """
+        if isinstance(x, PackedSequence):
+            if cache is not None:
+                raise ValueError("Packed sequences cannot be decoded with a cache.")
+            q, k, v = self.project_qkv(x.tokens)
+            scaled_attention = MatrixAttention.sparse(q, k, v, x.attention_pattern(self.pattern), heads_last=True)
+            return x.with_tokens(self._project(scaled_attention.reshape(1, -1, self.d_model), 'Wo'))
 
-        # apply weight matrices to the input x
-        q = Matrix.matmul(x, self.Wq)
-        k = Matrix.matmul(x, self.Wk)
-        v = Matrix.matmul(x, self.Wv)
+        batch_size = x.shape()[0]
 
-        # split heads
-        q = self.split_heads(q, batch_size)
-        k = self.split_heads(k, batch_size)
-        v = self.split_heads(v, batch_size)
+        # project and split heads in one pass
+        q, k, v = self.project_qkv(x)
 
-        # scaled dot-product attention
-        scaled_attention = self.scaled_dot_product_attention(q, k, v)
-        scaled_attention = scaled_attention.transpose((0, 2, 1, 3))
+        # scaled dot-product attention, against the cached prefix when decoding
+        if cache is None:
+            scaled_attention = self.scaled_dot_product_attention(q, k, v)
+        else:
+            cache.append(k, v)
+            scaled_attention = cache.attend(q, heads_last=True, pattern=self.pattern)
 
-        # concatenate the attention heads and apply the final linear transformation
+        # the heads are laid out side by side, so merging them is a view
         concat_attention = scaled_attention.reshape(batch_size, -1, self.d_model)
-        output = Matrix.matmul(concat_attention, self.Wo)
+        output = self._project(concat_attention, 'Wo')
 
         return output
@@ -1,20 +1,26 @@
-from ...tools.matrix.matrix import Matrix
-import math
+from tools.matrix.matrix import Matrix
+from tools.matrix.packing import PackedSequence
 
 class LayerNormalization:
     def __init__(self, epsilon=1e-6):
         self.epsilon = epsilon
 
-    def forward(self, x: Matrix, gamma: Matrix, beta: Matrix):
-        # Calculate the mean and variance across the features (rows)
-        mean = Matrix([[sum(row) / len(row) for row in x.data]])
-        variance = Matrix([[(val - mean.data[i][0]) ** 2 for val in row] for i, row in enumerate(x.data)])
-        variance = Matrix([[sum(row) / len(row) for row in variance.data]])
-        
-        # Normalize
-        x_normalized = Matrix([[(x.data[i][j] - mean.data[i][0]) / math.sqrt(variance.data[i][0] + self.epsilon) for j in range(len(row))] for i, row in enumerate(x.data)])
-        
-        # Scale and shift
-        y = Matrix([[gamma.data[i][j] * x_normalized.data[i][j] + beta.data[i][j] for j in range(len(row))] for i, row in enumerate(x.data)])
-        
-        return y
+    def forward(self, x: Matrix, gamma: Matrix = None, beta: Matrix = None):
+        # each token is normalized on its own, so packed sequences need no padding
+        if isinstance(x, PackedSequence):
+            return x.with_tokens(self.forward(x.tokens, gamma, beta))
+
+        # mean and variance of every token's features, normalization, scale
+        # and shift in one fused pass; gamma and beta are optional
+        return x.layer_norm(gamma, beta, self.epsilon)
+
+
+class RMSNormalization:
+    def __init__(self, epsilon=1e-6):
+        self.epsilon = epsilon
+
+    def forward(self, x: Matrix, gamma: Matrix = None):
+        # x / sqrt(mean(x^2) + epsilon) * gamma per token, without centering
+        if isinstance(x, PackedSequence):
+            return x.with_tokens(self.forward(x.tokens, gamma))
+        return x.rms_norm(gamma, epsilon=self.epsilon)
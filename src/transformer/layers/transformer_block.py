@@ -1,8 +1,10 @@
-from .multihead_attention import MultiHeadAttention
-from .feedforward import FeedForward
+from .multihead_attention import MultiHeadSelfAttention
+from .feedforward import FeedForwardLayer
 from .normalization import LayerNormalization
-from ...tools.matrix import Matrix
-from ...tools.training.gradient_checkpointing import GradientCheckpointing
+from ..core.advanced import Dropout
+from tools.matrix import Matrix
+from tools.matrix.packing import PackedSequence
+from tools.training.gradient_checkpointing import GradientCheckpointing
 
 class TransformerBlock:
     """
@@ -20,7 +22,8 @@ class TransformerBlock:
     ff_hidden_size : int
         The number of hidden units in the feedforward network.
     dropout : float, optional
-        Dropout rate applied after attention and feedforward layers (default is 0.1).
+        Dropout rate applied after attention and feedforward layers while
+        ``training`` is set (default is 0.1).
     checkpointing : bool, optional
         Whether to use gradient checkpointing for the block (default is False).
     """
@@ -38,14 +41,21 @@ class TransformerBlock:
         ff_hidden_size : int
             The number of hidden units in the feedforward network.
         dropout : float, optional
-            Dropout rate applied after attention and feedforward layers (default is 0.1).
+            Dropout rate applied after attention and feedforward layers while
+            ``training`` is set (default is 0.1). Kept values are scaled by
+            1 / (1 - dropout), so inference needs no rescaling.
         checkpointing : bool, optional
             Whether to use gradient checkpointing for the block (default is False).
         """
-        self.attention = MultiHeadAttention(embed_size, num_heads)
+        if not 0 <= dropout < 1:
+            raise ValueError("Dropout rate must lie in [0, 1), got {}.".format(dropout))
+        self.attention = MultiHeadSelfAttention(embed_size, num_heads)
         self.norm1 = LayerNormalization()
         self.norm2 = LayerNormalization()
-        self.feed_forward = FeedForward(embed_size, ff_hidden_size, dropout)
+        self.feed_forward = FeedForwardLayer(embed_size, ff_hidden_size)
+        self.dropout = Dropout(dropout)
+        # set to False for inference, which skips dropout
+        self.training = True
         self.checkpointing = checkpointing
 
         if self.checkpointing:
@@ -57,21 +67,26 @@ class TransformerBlock:
 
         Parameters:
         -----------
-        x : Matrix
-            The input matrix representing the embedded input sequence.
+        x : Matrix or PackedSequence
+            The embedded input sequences, either a padded (batch, seq,
+            embed_size) matrix or a PackedSequence of variable-length
+            sequences. Packed input skips all work on padding: attention
+            stays within each sequence and the feedforward and norm layers
+            only see real tokens.
 
         Returns:
         --------
-        out : Matrix
-            The output matrix after passing through the Transformer block.
+        out : Matrix or PackedSequence
+            The output after passing through the Transformer block, in the
+            same form as ``x``.
         """
         # Multi-Head Self-Attention and Residual Connection
         if self.checkpointing:
-            attention, _ = self.checkpointer.checkpoint(self.attention.forward, x, x, x)
+            attention, _ = self.checkpointer.checkpoint(self.attention.forward, x)
         else:
-            attention = self.attention.forward(x, x, x)
+            attention = self.attention.forward(x)
 
-        x = self.norm1.forward(x + attention)
+        x = self.norm1.forward(x + self._dropout(attention))
 
         # Feedforward Network and Residual Connection
         if self.checkpointing:
@@ -79,6 +94,16 @@ class TransformerBlock:
         else:
             feedforward = self.feed_forward.forward(x)
 
-        out = self.norm2.forward(x + feedforward)
+        out = self.norm2.forward(x + self._dropout(feedforward))
 
         return out
+
+    def _dropout(self, x):
+        # inverted dropout on a sublayer's output; packed sequences only hold real tokens
+        rate = self.dropout.drop_prob
+        if not self.training or rate == 0:
+            return x
+        if isinstance(x, PackedSequence):
+            return x.with_tokens(self._dropout(x.tokens))
+        dropped = self.dropout.apply(x)
+        return dropped.multiply(1 / (1 - rate), out=dropped)
@@ -1,6 +1,6 @@
 
 from .distributed_training import DistributedTraining
-from ...tools.training.gradient_checkpointing import GradientCheckpointing
+from tools.training.gradient_checkpointing import GradientCheckpointing
 from .mixed_precision import MixedPrecision
 
 __all__ = [
@@ -3,7 +3,7 @@
 import socket
 import threading
 import pickle
-from ...tools.matrix.matrix import Matrix
+from tools.matrix.matrix import Matrix
 
 class DistributedTraining:
     def __init__(self, model, num_devices=1, backend='socket', host='localhost', port=12345):